@@ -14,11 +14,15 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from keyword_classifier import load_classifier
+
 class AdaptiveEngine:
     """自适应引擎"""
     
     def __init__(self, hub):
         self.hub = hub
+        # 注册到 Hub，便于统计失败记录的内存占用
+        self.hub.adaptive = self
         self.failure_patterns = []
         self.recovery_strategies = {
             "agent_unavailable": "find_alternative_agent",
@@ -27,6 +31,8 @@ class AdaptiveEngine:
             "timeout": "request_extension_or_help",
             "conflict": "hub_mediation"
         }
+        # 失败分类规则表（语义记忆中的 classifier_failure_type 优先）
+        self.failure_classifier = load_classifier("failure_type", hub.memory.semantic)
         print("🔄 Adaptive Engine 已初始化")
     
     def detect_failure(self, task_id: str, subtask: Dict, error: str) -> Dict:
@@ -39,7 +45,7 @@ class AdaptiveEngine:
             "failure_type": failure_type,
             "error": error,
             "timestamp": datetime.now().isoformat(),
-            "context": self.hub.memory.working.get_context()
+            "context": self.hub.memory.working.snapshot()
         }
         
         self.failure_patterns.append(failure_record)
@@ -51,18 +57,7 @@ class AdaptiveEngine:
     
     def _classify_failure(self, error: str) -> str:
         """失败分类"""
-        error_lower = error.lower()
-        
-        if "unavailable" in error_lower or "not found" in error_lower:
-            return "agent_unavailable"
-        elif "too complex" in error_lower or "timeout" in error_lower:
-            return "task_too_complex"
-        elif "skill" in error_lower or "cannot" in error_lower:
-            return "skill_mismatch"
-        elif "conflict" in error_lower or "disagree" in error_lower:
-            return "conflict"
-        else:
-            return "unknown"
+        return self.failure_classifier.classify(error)
     
     def generate_recovery_plan(self, failure: Dict) -> Dict:
         """生成恢复计划"""
@@ -199,6 +194,20 @@ class AdaptiveEngine:
         # 实际应该根据策略执行不同操作
         return True
     
+    def get_logged_failure_distribution(self, since: Optional[str] = None, limit: Optional[int] = None) -> Dict[str, int]:
+        """
+        按执行日志中的异常事件统计失败类型分布（流式查询，不加载完整历史）
+        
+        Args:
+            since: 只统计该时间之后的异常（ISO 格式）
+            limit: 最多统计条数
+        """
+        distribution: Dict[str, int] = {}
+        for entry in self.hub.logger.query(events=["exception"], since=since, limit=limit):
+            ftype = self._classify_failure(entry.get("error") or "")
+            distribution[ftype] = distribution.get(ftype, 0) + 1
+        return distribution
+    
     def get_adaptive_stats(self) -> Dict:
         """获取自适应统计"""
         total_failures = len(self.failure_patterns)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+🗜️ Olympus Context Compactor - 按 token 预算压缩提示词上下文
+
+工作记忆上下文包含完整的 Claw、全部子任务以及之前的执行结果，
+直接 json.dumps 会让每次调用的提示词随子任务数量增长。
+压缩器按相关性挑选字段并控制在预算内：
+
+1. 保留任务描述与当前子任务的位置
+2. 只保留当前子任务前后的相邻子任务（描述、Agent、状态、结果摘要）
+3. Claw 只保留主导 Agent 与成员 ID
+4. 超出预算时先截断长文本，再从低优先级字段开始丢弃
+
+统计中的 original_tokens 是估算值（偏低），不序列化完整上下文：
+首轮截断后的大小，加上未选入的子任务按已选子任务的平均大小外推。
+
+环境变量:
+    PROTEUS_LLM_CONTEXT_BUDGET: 每次调用上下文部分的 token 预算 (default: 800)
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from rate_limit import estimate_tokens
+
+# 对模型没有帮助的上下文字段
+IGNORED_KEYS = {"task_id", "created_at", "status"}
+
+
+class ContextCompactor:
+    """上下文压缩器"""
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        neighbors: int = 1,
+        max_field_chars: int = 300,
+    ):
+        self.token_budget = token_budget or int(
+            os.getenv("PROTEUS_LLM_CONTEXT_BUDGET", "800")
+        )
+        self.neighbors = neighbors
+        self.max_field_chars = max_field_chars
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "original_tokens": 0,
+            "compacted_tokens": 0,
+            "dropped_fields": 0,
+        }
+
+    def render(self, context: Optional[Dict], focus: Optional[str] = None) -> str:
+        """压缩并序列化上下文；没有上下文时返回空字符串"""
+        if not context:
+            return ""
+        compacted = self.compact(context, focus)
+        return json.dumps(compacted, ensure_ascii=False) if compacted else ""
+
+    def compact(self, context: Dict, focus: Optional[str] = None) -> Dict:
+        """
+        按预算压缩上下文
+
+        Args:
+            context: 工作记忆上下文
+            focus: 当前子任务描述（用于挑选相邻子任务）
+        """
+        sections, omitted = self._select(context, focus)
+
+        compacted: Dict[str, Any] = {}
+        tokens = 0
+        original = 0
+        for attempt, max_chars in enumerate(
+            (self.max_field_chars, self.max_field_chars // 3, 40)
+        ):
+            compacted = {
+                key: self._truncate(value, max_chars) for key, value in sections
+            }
+            tokens = self._tokens(compacted)
+            if attempt == 0:
+                original = tokens + self._omitted_tokens(compacted, omitted)
+            if tokens <= self.token_budget:
+                break
+
+        dropped = 0
+        while tokens > self.token_budget and len(compacted) > 1:
+            compacted.pop(next(reversed(compacted)))
+            tokens = self._tokens(compacted)
+            dropped += 1
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["original_tokens"] += original
+            self.stats["compacted_tokens"] += tokens
+            self.stats["dropped_fields"] += dropped
+        return compacted
+
+    def _select(
+        self, context: Dict, focus: Optional[str] = None
+    ) -> Tuple[List[Tuple[str, Any]], int]:
+        """按优先级挑选字段，返回 (字段, 未选入的子任务数)"""
+        sections: List[Tuple[str, Any]] = []
+        handled = set(IGNORED_KEYS) | {"task_desc", "subtasks", "claw"}
+
+        if context.get("task_desc"):
+            sections.append(("task_desc", context["task_desc"]))
+
+        subtasks = list(context.get("subtasks") or [])
+        if subtasks:
+            index = next(
+                (i for i, st in enumerate(subtasks) if st.get("desc") == focus), None
+            )
+            if index is None:
+                related = subtasks[: self.neighbors * 2 + 1]
+            else:
+                sections.append(("progress", f"{index + 1}/{len(subtasks)}"))
+                related = [
+                    st
+                    for i, st in enumerate(subtasks)
+                    if i != index and abs(i - index) <= self.neighbors
+                ]
+            if related:
+                sections.append(
+                    (
+                        "related_subtasks",
+                        [self._summarize_subtask(st) for st in related],
+                    )
+                )
+            omitted = len(subtasks) - len(related) - (index is not None)
+        else:
+            omitted = 0
+
+        claw = context.get("claw")
+        if claw:
+            sections.append(
+                (
+                    "claw",
+                    {
+                        "lead_agent": claw.get("lead_agent"),
+                        "members": [m.get("agent_id") for m in claw.get("members", [])],
+                    },
+                )
+            )
+
+        for key, value in context.items():
+            if key not in handled:
+                sections.append((key, value))
+        return sections, omitted
+
+    def _omitted_tokens(self, compacted: Dict, omitted: int) -> int:
+        """未选入的子任务按已选子任务的平均大小估算"""
+        related = compacted.get("related_subtasks")
+        if not related or not omitted:
+            return 0
+        return self._tokens(related) * omitted // len(related)
+
+    def _summarize_subtask(self, subtask: Dict) -> Dict:
+        summary = {
+            "desc": subtask.get("desc"),
+            "agent_type": subtask.get("agent_type"),
+            "status": subtask.get("status"),
+        }
+        result = subtask.get("result")
+        if isinstance(result, dict) and result.get("output"):
+            summary["result"] = result["output"]
+        return {k: v for k, v in summary.items() if v is not None}
+
+    def _truncate(self, value: Any, max_chars: int) -> Any:
+        if isinstance(value, str):
+            return value if len(value) <= max_chars else value[:max_chars] + "…"
+        if isinstance(value, dict):
+            return {k: self._truncate(v, max_chars) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._truncate(v, max_chars) for v in value]
+        return value
+
+    def _tokens(self, value: Any) -> int:
+        return estimate_tokens(json.dumps(value, ensure_ascii=False))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self.stats)
+        if stats["original_tokens"]:
+            stats["reduction"] = round(
+                1 - stats["compacted_tokens"] / stats["original_tokens"], 3
+            )
+        return stats
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+🧊 Proteus Context Snapshot - 不可变上下文快照
+
+工作记忆上下文以持久化映射的方式维护：
+- 每次更新生成新快照，旧快照保持不变
+- 未修改的值在快照之间共享（结构共享），无需深拷贝
+- 快照可直接交给 LLM 调用、失败记录或并发子任务
+- 快照是 dict 子类，可直接 json.dumps
+"""
+
+from typing import Any, Dict
+
+
+class ContextSnapshot(dict):
+    """
+    不可变上下文快照
+
+    所有修改操作都会抛出 TypeError，使用 set/delete 得到新快照。
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("ContextSnapshot 不可修改，请使用 set()/delete() 生成新快照")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def set(self, key: str, value: Any) -> "ContextSnapshot":
+        """返回设置了 key 的新快照（其余值共享）"""
+        snapshot = ContextSnapshot(self)
+        dict.__setitem__(snapshot, key, freeze(value))
+        return snapshot
+
+    def delete(self, key: str) -> "ContextSnapshot":
+        """返回删除了 key 的新快照"""
+        snapshot = ContextSnapshot(self)
+        dict.pop(snapshot, key, None)
+        return snapshot
+
+    def thaw(self) -> Dict:
+        """转换为可修改的普通 dict（深层）"""
+        return thaw(self)
+
+    def __copy__(self) -> "ContextSnapshot":
+        return self
+
+    def __deepcopy__(self, memo: Dict) -> "ContextSnapshot":
+        return self
+
+    def __reduce__(self):
+        return (ContextSnapshot, (dict(self),))
+
+    def __repr__(self) -> str:
+        return f"ContextSnapshot({dict.__repr__(self)})"
+
+
+def freeze(value: Any) -> Any:
+    """把值转换为不可变形式；已冻结的部分直接复用"""
+    if isinstance(value, ContextSnapshot):
+        return value
+    if isinstance(value, dict):
+        return ContextSnapshot({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """把冻结的值还原为普通 dict/list"""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    if isinstance(value, frozenset):
+        return set(value)
+    return value
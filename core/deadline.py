@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+⏰ Olympus Deadline - 截止时间与取消
+
+Deadline 沿调用链向下传递（Hub → LLMClient → 提供商插件）：
+- remaining() / timeout(): 剩余时间，作为每次请求的超时
+- sleep(): 可被取消打断的等待（限流、退避重试），超过剩余时间时直接抛出 DeadlineExceeded
+- cancel(): 取消并触发 on_cancel 回调（如关闭正在读取的连接），等待中的调用立即返回
+- child(seconds): 更短的子截止时间（如单个子任务的预算），父级取消时一并取消；
+  用完后 release()，从父级注销取消回调
+- result(future): 等待 Future，截止或取消时不再等待
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class CallAborted(Exception):
+    """调用因截止或取消而中止（不重试、不切换提供商、不 fallback）"""
+
+
+class DeadlineExceeded(CallAborted):
+    """已超过截止时间"""
+
+
+class Cancelled(CallAborted):
+    """任务已取消"""
+
+
+class Deadline:
+    """截止时间 + 取消信号"""
+
+    def __init__(
+        self, timeout: Optional[float] = None, parent: Optional["Deadline"] = None
+    ):
+        """
+        Args:
+            timeout: 距现在的秒数（None 为不限时，仅可取消）
+            parent: 父截止时间（取两者中更早的截止时间，父级取消时一并取消）
+        """
+        now = time.monotonic()
+        self.expires_at: Optional[float] = (
+            now + timeout if timeout is not None else None
+        )
+        if parent is not None and parent.expires_at is not None:
+            self.expires_at = (
+                parent.expires_at
+                if self.expires_at is None
+                else min(self.expires_at, parent.expires_at)
+            )
+
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], Any]] = []
+        self._detach: Optional[Callable[[], None]] = None
+        if parent is not None:
+            self._detach = parent.on_cancel(lambda: self.cancel(parent.reason))
+
+    def child(self, timeout: Optional[float] = None) -> "Deadline":
+        return Deadline(timeout, parent=self)
+
+    def release(self):
+        """不再随父级取消（子截止时间用完后调用，长期存在的父级不会累积回调）"""
+        detach, self._detach = self._detach, None
+        if detach:
+            detach()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数（不限时为 None）"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def check(self):
+        """已取消或已截止时抛出"""
+        if self.cancelled:
+            raise Cancelled(self.reason or "任务已取消")
+        if self.expired:
+            raise DeadlineExceeded("已超过任务截止时间")
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """本次请求可用的超时秒数（不超过 cap）；已截止时抛出"""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    def sleep(self, seconds: float):
+        """等待 seconds 秒；取消时立即抛出，等待会越过截止时间时直接抛出"""
+        self.check()
+        remaining = self.remaining()
+        if remaining is not None and seconds > remaining:
+            raise DeadlineExceeded(
+                f"需要等待 {seconds:.1f}s，超过剩余时间 {remaining:.1f}s"
+            )
+        if self._event.wait(seconds):
+            self.check()
+
+    def result(self, future: Future) -> Any:
+        """等待 Future 的结果；取消或截止时抛出，不再等待"""
+        waker = threading.Event()
+        future.add_done_callback(lambda _: waker.set())
+        unregister = self.on_cancel(waker.set)
+        try:
+            waker.wait(self.remaining())
+        finally:
+            unregister()
+        if future.done():
+            return future.result()
+        self.check()
+        raise DeadlineExceeded("已超过任务截止时间")
+
+    def on_cancel(self, callback: Callable[[], Any]) -> Callable[[], None]:
+        """
+        注册取消回调（已取消时立即执行）
+
+        Returns:
+            注销函数
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                registered = True
+            else:
+                registered = False
+        if not registered:
+            callback()
+
+        def unregister():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return unregister
+
+    def cancel(self, reason: Optional[str] = None):
+        """取消：唤醒等待并执行回调（只生效一次）"""
+        with self._lock:
+            if self.cancelled:
+                return
+            self.reason = reason or "任务已取消"
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        self.release()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"   ⚠️ 取消回调失败：{e}")
@@ -13,6 +13,9 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 from collections import defaultdict
 
+from keyword_classifier import KeywordClassifier, load_classifier
+from log_rotation import RotatingLog, RotationPolicy
+
 class EvolutionEngine:
     """
     进化引擎
@@ -20,13 +23,14 @@ class EvolutionEngine:
     负责分析任务执行记录，驱动系统进化
     """
     
-    def __init__(self, memory_path: Path, evolution_path: Path):
+    def __init__(self, memory_path: Path, evolution_path: Path, rotation: Optional[RotationPolicy] = None):
         self.memory_path = memory_path
         self.evolution_path = evolution_path
         self.evolution_path.mkdir(parents=True, exist_ok=True)
         
-        # 进化日志
+        # 进化日志（按大小 / 时间轮转，轮转段后台压缩，见 log_rotation）
         self.evolution_log = self.evolution_path / "evolution_log.jsonl"
+        self.log = RotatingLog(self.evolution_log, rotation)
         
         print("🧬 Evolution Engine 已初始化")
         print(f"   记忆路径：{memory_path}")
@@ -148,7 +152,7 @@ class EvolutionEngine:
             return []
         
         # 分析任务相似性
-        patterns = self._cluster_similar_tasks(successful_tasks)
+        patterns = self._cluster_similar_tasks(successful_tasks, load_classifier("task_cluster", semantic_memory))
         
         new_patterns = []
         for cluster in patterns:
@@ -169,26 +173,18 @@ class EvolutionEngine:
         
         return new_patterns
     
-    def _cluster_similar_tasks(self, tasks: List[Dict]) -> List[List[Dict]]:
+    def _cluster_similar_tasks(self, tasks: List[Dict], classifier: Optional[KeywordClassifier] = None) -> List[List[Dict]]:
         """
         聚类相似任务
         
-        简化版本：基于任务描述关键词聚类
+        简化版本：基于任务描述关键词聚类（规则表见 keyword_classifier 的 task_cluster）
         """
+        classifier = classifier or load_classifier("task_cluster")
         clusters = defaultdict(list)
         
         for task in tasks:
-            task_desc = task.get("context", {}).get("task_desc", "").lower()
-            
-            # 简单关键词分类
-            if "社交媒体" in task_desc or "内容" in task_desc:
-                clusters["social_media"].append(task)
-            elif "研究" in task_desc or "报告" in task_desc:
-                clusters["research"].append(task)
-            elif "代码" in task_desc or "编程" in task_desc:
-                clusters["coding"].append(task)
-            else:
-                clusters["generic"].append(task)
+            task_desc = task.get("context", {}).get("task_desc", "")
+            clusters[classifier.classify(task_desc)].append(task)
         
         return list(clusters.values())
     
@@ -315,20 +311,27 @@ class EvolutionEngine:
             "data": data,
             "timestamp": datetime.now().isoformat()
         }
-        with open(self.evolution_log, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+        self.log.append(json.dumps(log_entry, ensure_ascii=False) + '\n')
     
     def get_evolution_history(self, limit: int = 10) -> List[Dict]:
-        """获取进化历史"""
-        if not self.evolution_log.exists():
-            return []
+        """
+        获取最近的进化历史（按时间顺序）
         
+        从最新一条开始反向读取，只读取最近 limit 条所在的段；limit 为 0 时返回全部历史。
+        """
+        lines = self.log.reverse_lines() if limit else self.log.iter_lines()
         history = []
-        with open(self.evolution_log, 'r', encoding='utf-8') as f:
-            for line in f:
+        for line in lines:
+            try:
                 history.append(json.loads(line))
-        
-        return history[-limit:]
+            except ValueError:
+                continue
+            if limit and len(history) >= limit:
+                break
+        
+        if limit:
+            history.reverse()
+        return history
 
 
 if __name__ == "__main__":
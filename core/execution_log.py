@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+📝 Proteus Execution Log - 任务执行日志
+
+记录每个任务的执行事件（task_started / subtask_* / task_completed），供 Hub 查询与回放。
+
+- 写入：事件交给缓冲写入器（见 log_writer）在后台线程批量追加，记录事件不阻塞执行
+- 存储布局：
+  - files: 每个任务一个 <task_id>.jsonl
+  - segments: 所有任务追加到共享的段文件，按 task 索引读取（见 log_segments），文件数不随任务数增长
+- 读取：均为流式（见 log_reader），iter_task_logs / tail 按事件类型、时间范围过滤，
+  query 跨任务查询，不需要把整个历史读入内存
+- 轮转与保留（见 log_rotation）：maintain() 在任务结束时于后台定期执行
+  - files: 空闲超过 max_age 的任务日志压缩为 <task_id>.jsonl.gz，超过保留期的删除
+  - segments: 段按大小或时间切换，封存的段压缩，超过保留期的段连同索引删除
+  读取透明跨越压缩与未压缩的部分
+
+环境变量:
+    PROTEUS_LOG_LAYOUT: files | segments (default: files)
+    PROTEUS_LOG_MAINTENANCE_INTERVAL: 两次后台维护的最小间隔秒数 (default: 3600)
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from log_reader import (
+    COMPRESSED_SUFFIXES,
+    LogFilter,
+    TimeBound,
+    iter_lines,
+    resolve_log,
+    reverse_lines,
+)
+from log_rotation import RotationPolicy, compress_file, submit_background
+from log_segments import SegmentedLogStore
+from log_writer import BufferedLogWriter, get_log_writer
+
+
+class ExecutionLogger:
+    """
+    执行日志记录器
+
+    事件由缓冲写入器在后台线程批量追加，任务结束事件立即提交并关闭文件，
+    读取前先等待已记录的事件落盘。
+    """
+
+    LAYOUTS = ("files", "segments")
+    MAINTENANCE_INTERVAL = float(os.getenv("PROTEUS_LOG_MAINTENANCE_INTERVAL", "3600"))
+
+    def __init__(
+        self,
+        log_path: Path,
+        writer: Optional[BufferedLogWriter] = None,
+        layout: Optional[str] = None,
+        rotation: Optional[RotationPolicy] = None,
+    ):
+        self.log_path = log_path
+        self.log_path.mkdir(parents=True, exist_ok=True)
+        self.writer = writer or get_log_writer()
+        self.layout = layout or os.getenv("PROTEUS_LOG_LAYOUT", "files").lower()
+        if self.layout not in self.LAYOUTS:
+            raise ValueError(f"未知的日志布局：{self.layout}")
+        self.rotation = rotation or RotationPolicy()
+        self.store = (
+            SegmentedLogStore(log_path, policy=self.rotation)
+            if self.layout == "segments"
+            else None
+        )
+        self._next_maintenance = 0.0
+        print(f"📝 执行日志系统已初始化：{log_path}（{self.layout}）")
+
+    def start_task(self, task_id: str, task_desc: str, claw_info: Dict):
+        log_entry = {
+            "event": "task_start",
+            "task_id": task_id,
+            "task_desc": task_desc,
+            "claw_info": claw_info,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry)
+
+    def log_subtask_start(self, task_id: str, subtask: Dict, agent_id: str):
+        log_entry = {
+            "event": "subtask_start",
+            "subtask_id": subtask.get("subtask_id"),
+            "subtask_desc": subtask.get("desc"),
+            "agent_id": agent_id,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry)
+
+    def log_subtask_complete(self, task_id: str, subtask_id: str, result: Dict):
+        log_entry = {
+            "event": "subtask_complete",
+            "subtask_id": subtask_id,
+            "result": result,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry)
+
+    def log_decision(
+        self, task_id: str, decision_type: str, decision: str, rationale: str
+    ):
+        log_entry = {
+            "event": "decision",
+            "decision_type": decision_type,
+            "decision": decision,
+            "rationale": rationale,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry)
+
+    def log_exception(self, task_id: str, error: str, resolution: Optional[str] = None):
+        log_entry = {
+            "event": "exception",
+            "error": error,
+            "resolution": resolution,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry)
+
+    def complete_task(self, task_id: str, result: Dict, feedback: Optional[str] = None):
+        log_entry = {
+            "event": "task_complete",
+            "result": result,
+            "feedback": feedback,
+            "timestamp": datetime.now().isoformat(),
+        }
+        self._save_log(task_id, log_entry, final=True)
+        self._schedule_maintenance()
+
+    def _save_log(self, task_id: str, log_entry: Dict, final: bool = False):
+        # 在调用线程序列化（之后对 log_entry 中对象的修改不影响日志）
+        if self.store is not None:
+            # 共享段文件中的每条事件都要带 task_id（启动时据此补建索引）
+            log_entry = dict(log_entry, task_id=task_id)
+            self.writer.write(
+                self.store,
+                json.dumps(log_entry, ensure_ascii=False) + "\n",
+                final=final,
+                key=task_id,
+            )
+            return
+        self.writer.write(
+            self.log_path / f"{task_id}.jsonl",
+            json.dumps(log_entry, ensure_ascii=False) + "\n",
+            final=final,
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已记录的事件全部写入文件"""
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """写入剩余事件并关闭段文件"""
+        self.flush()
+        if self.store is not None:
+            self.store.close()
+
+    def _schedule_maintenance(self):
+        now = time.monotonic()
+        if now < self._next_maintenance:
+            return
+        self._next_maintenance = now + self.MAINTENANCE_INTERVAL
+        submit_background(self.maintain)
+
+    def maintain(self) -> Dict:
+        """
+        压缩空闲 / 封存的日志，按保留策略删除过期日志
+
+        Returns:
+            {"compressed": 压缩的文件数, "removed": 删除的文件数}
+        """
+        if self.store is not None:
+            compressed = self.store.stats["compressed"]
+            removed = self.store.maintain()
+            return {
+                "compressed": self.store.stats["compressed"] - compressed,
+                "removed": len(removed),
+            }
+
+        now = time.time()
+        plain = [
+            path
+            for path in self.log_path.glob("*.jsonl")
+            if not path.name.startswith("segment-")
+        ]
+        packed = [
+            path
+            for suffix in COMPRESSED_SUFFIXES.values()
+            for path in self.log_path.glob(f"*.jsonl{suffix}")
+        ]
+        removed = self.rotation.select_expired(plain + packed, now)
+        for path in removed:
+            with self.writer.detach(path):
+                path.unlink(missing_ok=True)
+
+        compressed = 0
+        if self.rotation.compression != "none" and self.rotation.max_age:
+            for path in plain:
+                if path in removed:
+                    continue
+                # 提交暂停期间再确认一次空闲时间，压缩时不会有新的追加
+                with self.writer.detach(path):
+                    try:
+                        idle = now - path.stat().st_mtime >= self.rotation.max_age
+                    except FileNotFoundError:
+                        continue
+                    if (
+                        idle
+                        and compress_file(path, self.rotation.compression) is not None
+                    ):
+                        compressed += 1
+        return {"compressed": compressed, "removed": len(removed)}
+
+    def _task_files(self, task_id: str) -> List[Path]:
+        """某个任务的日志文件：先是压缩的早期部分，最后是仍在追加的文件"""
+        log_file = self.log_path / f"{task_id}.jsonl"
+        parts = [
+            log_file.with_name(log_file.name + suffix)
+            for suffix in COMPRESSED_SUFFIXES.values()
+        ]
+        return [path for path in parts + [log_file] if path.exists()]
+
+    def _task_lines(self, task_id: str, reverse: bool = False) -> Iterator[bytes]:
+        if self.store is not None:
+            return self.store.read(task_id, reverse=reverse)
+        files = self._task_files(task_id)
+        if reverse:
+            return (line for path in reversed(files) for line in reverse_lines(path))
+        return (line for path in files for line in iter_lines(path))
+
+    def iter_task_logs(
+        self,
+        task_id: str,
+        events: Optional[Iterable[str]] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+    ) -> Iterator[Dict]:
+        """
+        逐条读取某个任务的事件
+
+        Args:
+            task_id: 任务 ID
+            events: 只返回这些事件类型（如 ["exception"]）
+            since / until: 时间范围 [since, until)，datetime 或 ISO 字符串
+        """
+        self.flush()
+        log_filter = LogFilter(events, since, until)
+        for line in self._task_lines(task_id):
+            entry = log_filter.parse(line)
+            # 分段布局的键是 task_id 的哈希，再按原值过滤一次
+            if entry is not None and entry.get("task_id", task_id) == task_id:
+                yield entry
+
+    def get_task_logs(
+        self,
+        task_id: str,
+        events: Optional[Iterable[str]] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+    ) -> List[Dict]:
+        return list(self.iter_task_logs(task_id, events, since, until))
+
+    def tail(
+        self, task_id: str, n: int = 10, events: Optional[Iterable[str]] = None
+    ) -> List[Dict]:
+        """某个任务最近的 n 条事件（按时间顺序；从文件末尾反向读取）"""
+        self.flush()
+        log_filter = LogFilter(events)
+        latest = []
+        if n > 0:
+            for line in self._task_lines(task_id, reverse=True):
+                entry = log_filter.parse(line)
+                if entry is not None and entry.get("task_id", task_id) == task_id:
+                    latest.append(entry)
+                    if len(latest) >= n:
+                        break
+        latest.reverse()
+        return latest
+
+    def query(
+        self,
+        events: Optional[Iterable[str]] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+        task_ids: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        跨任务查询（每条结果带 task_id）
+
+        指定 task_ids 时按任务逐个读取；否则扫描全部日志，
+        修改时间早于 since 的文件整个跳过。
+
+        Args:
+            events: 事件类型
+            since / until: 时间范围 [since, until)
+            task_ids: 只查询这些任务
+            limit: 最多返回条数
+        """
+        self.flush()
+        if limit is not None and limit <= 0:
+            return
+        log_filter = LogFilter(events, since, until)
+        count = 0
+        for task_id, line in self._scan(log_filter, task_ids):
+            entry = log_filter.parse(line)
+            if entry is None:
+                continue
+            if task_id is not None:
+                if entry.setdefault("task_id", task_id) != task_id:
+                    continue
+            yield entry
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+    def _scan(
+        self, log_filter: LogFilter, task_ids: Optional[Iterable[str]] = None
+    ) -> Iterator[tuple]:
+        """(task_id 或 None, 行)；task_id 为 None 时行内自带 task_id"""
+        if task_ids is not None:
+            for requested in task_ids:
+                for line in self._task_lines(requested):
+                    yield requested, line
+            return
+
+        since = log_filter.since_timestamp()
+        files: List[Tuple[Optional[str], Path]]
+        if self.store is not None:
+            files = [(None, path) for path in self.store.segments()]
+        else:
+            files = []
+            for suffix in [""] + list(COMPRESSED_SUFFIXES.values()):
+                pattern = f"*.jsonl{suffix}"
+                files.extend(
+                    (path.name[: -len(pattern) + 1], path)
+                    for path in self.log_path.glob(pattern)
+                    if not path.name.startswith("segment-")
+                )
+            # 同一任务先读压缩的早期部分
+            files.sort(key=lambda item: (item[0], item[1].suffix == ".jsonl"))
+        for task_id, path in files:
+            try:
+                # 文件修改时间按内核粗粒度时钟记录，留出余量（压缩后保留原修改时间）
+                if (
+                    since is not None
+                    and (resolve_log(path) or path).stat().st_mtime < since - 1
+                ):
+                    continue
+            except FileNotFoundError:
+                continue
+            for line in iter_lines(path):
+                yield task_id, line
@@ -9,21 +9,70 @@
 - 最终输出整合
 """
 
+import os
+import threading
 import uuid
+from concurrent.futures import Future
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 
+from deadline import CallAborted, Cancelled, Deadline
 from memory import MemorySystem
-from llm_integration import LLMClient, ExecutionLogger
+from llm_integration import LLMClient
+from execution_log import ExecutionLogger
 from evolution import EvolutionEngine
+from keyword_classifier import load_classifier
+from memory_accounting import StageTracer, layer_stats, traced_stage
+
+class _SubtaskGate:
+    """推测分解期间暂存流式子任务，open() 后按到达顺序放行给回调"""
+    
+    def __init__(self, callback: Optional[Callable[[Dict], None]]):
+        self.callback = callback
+        self._buffer: List[Dict] = []
+        self._open = False
+        self._lock = threading.Lock()
+    
+    def __call__(self, subtask: Dict):
+        if self.callback is None:
+            return
+        with self._lock:
+            if self._open:
+                self.callback(subtask)
+            else:
+                self._buffer.append(subtask)
+    
+    def open(self):
+        if self.callback is None:
+            return
+        with self._lock:
+            self._open = True
+            buffered, self._buffer = self._buffer, []
+            for subtask in buffered:
+                self.callback(subtask)
+
 
 class ProteusHub:
     """
     The Hub - 中央调度器
+    
+    每个任务有一个截止时间（Deadline），沿调用链传给每次 LLM 调用作为超时；
+    cancel_task 取消任务：撤销排队中的调用，中止进行中的请求。
+    
+    环境变量:
+        PROTEUS_DEADLINE_SCALE: 子任务预估 1 分钟对应的执行预算秒数 (default: 2)
+        PROTEUS_MIN_DEADLINE: 单个执行单元的最小预算秒数 (default: 60)
+        PROTEUS_PATTERN_THRESHOLD: 采用任务模式的最低匹配度 0~1 (default: 0，有模式即采用)
+        PROTEUS_SPECULATIVE_DECOMPOSE: 1 时模式匹配与 LLM 分解同时启动 (default: 0)
     """
     
-    def __init__(self, base_path: Path = None):
+    DEADLINE_SCALE = float(os.getenv("PROTEUS_DEADLINE_SCALE", "2"))
+    MIN_DEADLINE = float(os.getenv("PROTEUS_MIN_DEADLINE", "60"))
+    PATTERN_THRESHOLD = float(os.getenv("PROTEUS_PATTERN_THRESHOLD", "0"))
+    SPECULATIVE_DECOMPOSE = os.getenv("PROTEUS_SPECULATIVE_DECOMPOSE", "0").lower() in ("1", "true", "yes")
+    
+    def __init__(self, base_path: Optional[Path] = None, trace_memory: Optional[bool] = None):
         if base_path is None:
             base_path = Path(__file__).parent.parent
         
@@ -31,7 +80,11 @@ class ProteusHub:
         self.base_path = base_path
         
         # 初始化 LLM 客户端
-        self.llm = LLMClient()
+        self.llm = LLMClient(
+            cache_dir=base_path / "cache" / "llm",
+            profile_source=self.memory.semantic.get_agent_profile,
+            task_classifier=load_classifier("task_type", self.memory.semantic)
+        )
         
         # 初始化执行日志
         self.logger = ExecutionLogger(base_path / "logs" / "tasks")
@@ -46,6 +99,19 @@ class ProteusHub:
         self.active_tasks: Dict[str, Dict] = {}
         self.active_claws: Dict[str, Dict] = {}
         
+        # 任务截止时间与排队中的执行单元（用于取消）
+        self.deadlines: Dict[str, Deadline] = {}
+        self.task_futures: Dict[str, List[Future]] = {}
+        
+        # 任务解析统计（模式匹配 / LLM 分解 / 推测分解）
+        self.parse_stats = {"pattern": 0, "llm": 0, "speculative": 0, "speculation_cancelled": 0}
+        
+        # 自适应引擎（AdaptiveEngine 创建时注册）
+        self.adaptive = None
+        
+        # 内存追踪（默认关闭，PROTEUS_TRACEMALLOC=1 开启）
+        self.tracer = StageTracer(enabled=trace_memory)
+        
         # 初始化默认 Agent 和规则
         self.memory.initialize_default_agents()
         self.memory.initialize_default_rules()
@@ -63,7 +129,8 @@ class ProteusHub:
     
     # ========== 任务接收与解析 ==========
     
-    def receive_task(self, task_desc: str, user_id: str = "default", priority: str = "normal") -> str:
+    def receive_task(self, task_desc: str, user_id: str = "default", priority: str = "normal",
+                     timeout: Optional[float] = None) -> str:
         """
         接收新任务
         
@@ -71,6 +138,7 @@ class ProteusHub:
             task_desc: 任务描述
             user_id: 用户 ID
             priority: 优先级 (low/normal/high/urgent)
+            timeout: 整个任务的截止时间（秒），不设置时执行阶段按子任务预估时间推算
         
         Returns:
             task_id: 任务 ID
@@ -91,6 +159,7 @@ class ProteusHub:
         }
         
         self.active_tasks[task_id] = task
+        self.deadlines[task_id] = Deadline(timeout)
         
         # 初始化工作记忆
         self.memory.start_task(task_id, task_desc)
@@ -102,13 +171,23 @@ class ProteusHub:
         
         return task_id
     
-    def parse_task(self, task_id: str) -> Dict:
+    @traced_stage("parse")
+    def parse_task(self, task_id: str, on_subtask: Optional[Callable[[Dict], None]] = None,
+                   speculative: Optional[bool] = None) -> Dict:
         """
         解析任务
         
-        1. 在语义记忆中匹配类似任务模式
-        2. 如无匹配，使用 LLM 进行创造性分解
+        1. 在语义记忆中匹配类似任务模式（匹配度不低于 PATTERN_THRESHOLD 时采用）
+        2. 如无匹配，使用 LLM 进行创造性分解（流式，子任务生成后立即预匹配 Agent）
         3. 生成子任务列表
+        
+        推测模式下 LLM 分解与模式匹配同时启动：匹配到模式时取消 LLM 调用，
+        否则直接等待已在进行中的 LLM 分解，两段延迟不再串行相加。
+        
+        Args:
+            task_id: 任务 ID
+            on_subtask: 每个子任务就绪时的回调（可用于提前执行）
+            speculative: 是否推测分解（None 时取 PROTEUS_SPECULATIVE_DECOMPOSE）
         """
         task = self.active_tasks.get(task_id)
         if not task:
@@ -116,15 +195,71 @@ class ProteusHub:
         
         print(f"\n🎤 [Hub] 解析任务 {task_id[:8]}")
         
+        if speculative is None:
+            speculative = self.SPECULATIVE_DECOMPOSE
+        task_desc = task["task_desc"]
+        deadline = self._task_deadline(task_id)
+        prematched: Dict[str, List[Dict]] = {}
+        
+        def prematch(subtask: Dict):
+            prematched[subtask["subtask_id"]] = self.memory.semantic.match_agents(
+                subtask.get("required_skills", [])
+            )
+        
+        # 推测分解：流式子任务先暂存，确定采用 LLM 结果后再交给 on_subtask
+        speculation = None
+        if speculative:
+            spec_deadline = deadline.child() if deadline else Deadline()
+            gate = _SubtaskGate(on_subtask)
+            
+            def stream(subtask: Dict):
+                prematch(subtask)
+                gate(subtask)
+            
+            speculation = self.llm.submit(self.llm.decompose_task, task_desc, on_subtask=stream, deadline=spec_deadline)
+            self.parse_stats["speculative"] += 1
+        
         # 尝试匹配任务模式
-        pattern = self.memory.semantic.match_pattern(task["task_desc"])
+        pattern, score = self.memory.semantic.best_pattern(task_desc)
+        if pattern is not None and score < self.PATTERN_THRESHOLD:
+            print(f"   ⚠️  最佳模式 {pattern.get('pattern_id', 'N/A')} 匹配度 {score:.2f} 低于阈值 {self.PATTERN_THRESHOLD:.2f}")
+            pattern = None
         
         if pattern:
-            print(f"   ✅ 匹配到任务模式：{pattern.get('pattern_id', 'N/A')}")
+            print(f"   ✅ 匹配到任务模式：{pattern.get('pattern_id', 'N/A')}（匹配度 {score:.2f}）")
             subtasks = pattern.get("subtasks", [])
+            if speculation is not None:
+                spec_deadline.cancel("已匹配到任务模式")
+                speculation.cancel()
+                self.parse_stats["speculation_cancelled"] += 1
+                print(f"   🛑 已取消推测中的 LLM 分解")
+            if on_subtask:
+                for st in subtasks:
+                    on_subtask(st)
+            self.parse_stats["pattern"] += 1
         else:
-            print(f"   ⚠️  未匹配到模式，使用 LLM 创造性分解")
-            subtasks = self.llm.decompose_task(task["task_desc"])
+            if speculation is not None:
+                print(f"   ⚠️  未匹配到模式，采用推测启动的 LLM 分解")
+                gate.open()
+                try:
+                    subtasks = spec_deadline.result(speculation)
+                finally:
+                    spec_deadline.release()
+            else:
+                print(f"   ⚠️  未匹配到模式，使用 LLM 创造性分解")
+                
+                def stream(subtask: Dict):
+                    prematch(subtask)
+                    if on_subtask:
+                        on_subtask(subtask)
+                
+                subtasks = self.llm.decompose_task(task_desc, on_subtask=stream, deadline=deadline)
+            # 只保留最终子任务的预匹配结果（fallback 时流式子任务会被替换）
+            task["skill_matches"] = {
+                st["subtask_id"]: prematched[st["subtask_id"]]
+                for st in subtasks if st.get("subtask_id") in prematched
+            }
+            self.parse_stats["llm"] += 1
         
         # 更新任务
         task["subtasks"] = subtasks
@@ -138,7 +273,8 @@ class ProteusHub:
             task_id,
             "task_decomposition",
             f"分解为{len(subtasks)}个子任务",
-            "模式匹配" if pattern else "LLM 创造性分解"
+            f"模式匹配（匹配度 {score:.2f}）" if pattern
+            else "LLM 创造性分解" + ("（推测启动）" if speculative else "")
         )
         
         print(f"   分解为 {len(subtasks)} 个子任务:")
@@ -180,6 +316,7 @@ class ProteusHub:
     
     # ========== 规划与组队 ==========
     
+    @traced_stage("form")
     def form_claw(self, task_id: str) -> Dict:
         """
         组建动态工作小组（Claw）
@@ -202,8 +339,12 @@ class ProteusHub:
         
         print(f"   需要技能：{list(required_skills)}")
         
-        # 匹配 Agent
-        matched_agents = self.memory.semantic.match_agents(list(required_skills))
+        # 匹配 Agent（解析阶段已逐个子任务预匹配时直接合并，不再扫描 Agent 档案）
+        matches = task.get("skill_matches") or {}
+        if task["subtasks"] and all(st.get("subtask_id") in matches for st in task["subtasks"]):
+            matched_agents = self._merge_skill_matches(matches, required_skills)
+        else:
+            matched_agents = self.memory.semantic.match_agents(list(required_skills))
         
         if not matched_agents:
             print(f"   ❌ 未找到匹配的 Agent")
@@ -246,9 +387,27 @@ class ProteusHub:
         
         return claw
     
+    def _merge_skill_matches(self, matches: Dict[str, List[Dict]], required_skills: set) -> List[Dict]:
+        """
+        合并子任务的预匹配结果
+        
+        与整体技能集合有交集的 Agent 必然匹配到至少一个子任务，
+        因此合并后按整体匹配度重新排序即可得到相同的候选集合。
+        """
+        candidates: Dict[str, Dict] = {}
+        for agents in matches.values():
+            for agent in agents:
+                candidates.setdefault(agent["agent_id"], agent)
+        return sorted(
+            candidates.values(),
+            key=lambda agent: -len(required_skills & set(agent.get("skills", [])))
+        )
+    
     # ========== 执行与监控 ==========
     
-    def execute_task(self, task_id: str) -> Dict:
+    @traced_stage("execute")
+    def execute_task(self, task_id: str, parallel: bool = False, batch: bool = False,
+                     timeout: Optional[float] = None) -> Dict:
         """
         执行任务（真实 Agent 调用）
         
@@ -256,6 +415,14 @@ class ProteusHub:
         2. 调用对应 Agent 执行
         3. 记录执行日志
         4. 处理异常
+        
+        Args:
+            task_id: 任务 ID
+            parallel: 并发执行所有子任务（子任务之间无依赖时使用）
+            batch: 同一 Agent 的子任务合并为一次调用
+                   （串行时只合并相邻子任务，并行时合并该 Agent 的全部子任务）
+            timeout: 执行阶段的截止时间（秒），默认按子任务 estimated_time 推算；
+                     超时或取消的子任务标记为 timeout / cancelled
         """
         task = self.active_tasks.get(task_id)
         if not task:
@@ -277,26 +444,64 @@ class ProteusHub:
         task["status"] = "executing"
         claw["status"] = "executing"
         
-        self.memory.working.update_context("status", "executing")
-        self.memory.working.add_message("hub", "claw", "开始执行")
+        # 截止时间：调用方指定，或按全部子任务的预估时间推算；取消任务时一并取消。
+        # 取消时 cancel_task 已结束该任务的工作记忆（之后可能已开始下一个任务），
+        # 每次写入工作记忆前先检查，取消后不再写入
+        task_deadline = self._task_deadline(task_id)
+        
+        if not task_deadline.cancelled:
+            self.memory.working.update_context("status", "executing")
+            self.memory.working.add_message("hub", "claw", "开始执行")
+        
+        # 执行单元：每个单元是一次 Agent 调用（批量模式下可包含多个子任务）
+        subtasks = task["subtasks"]
+        units = self._execution_units(subtasks, batch, parallel)
+        unit_of = {i: unit for unit in units for i in unit}
+        pending: Dict[int, tuple] = {}  # 子任务下标 -> (Future, 在单元中的位置)
+        
+        deadline = task_deadline.child(timeout if timeout is not None else self._budget(subtasks))
+        futures = self.task_futures.setdefault(task_id, [])
+        
+        # 并行模式：先提交全部执行单元，让网络等待相互重叠
+        if parallel:
+            context = self.memory.working.snapshot()
+            for unit in units:
+                for j in unit:
+                    self.logger.log_subtask_start(task_id, subtasks[j], subtasks[j].get("agent_type", "content_agent"))
+                future = self.llm.submit(self._run_unit, subtasks, unit, context, deadline)
+                futures.append(future)
+                for position, j in enumerate(unit):
+                    pending[j] = (future, position)
         
         # 执行每个子任务
         execution_results = []
-        for i, subtask in enumerate(task["subtasks"]):
-            agent_type = subtask.get("agent_type", "content_agent")
+        for i, subtask in enumerate(subtasks):
+            if task_deadline.cancelled:
+                # 任务已取消：其余子任务不再执行
+                for rest in subtasks[i:]:
+                    if rest.get("status") != "completed":
+                        rest["status"] = "cancelled"
+                break
             
-            # 记录子任务开始
-            self.logger.log_subtask_start(task_id, subtask, agent_type)
+            # 串行模式：轮到单元的第一个子任务时执行整个单元
+            if i not in pending:
+                unit = unit_of[i]
+                for j in unit:
+                    self.logger.log_subtask_start(task_id, subtasks[j], subtasks[j].get("agent_type", "content_agent"))
+                future = Future()
+                try:
+                    future.set_result(self._run_unit(subtasks, unit, self.memory.working.snapshot(), deadline))
+                except Exception as e:
+                    future.set_exception(e)
+                for position, j in enumerate(unit):
+                    pending[j] = (future, position)
             
-            print(f"   执行子任务 {i+1}/{len(task['subtasks'])}: {subtask['desc'][:40]}...")
+            print(f"   执行子任务 {i+1}/{len(subtasks)}: {subtask['desc'][:40]}...")
             
             try:
-                # 真实调用 Agent
-                result = self.llm.execute_agent_task(
-                    agent_type,
-                    subtask["desc"],
-                    context=self.memory.working.get_context()
-                )
+                # 真实调用 Agent（截止或取消时不再等待）
+                future, position = pending[i]
+                result = deadline.result(future)[position]
                 
                 # 记录子任务完成
                 self.logger.log_subtask_complete(task_id, subtask["subtask_id"], result)
@@ -307,24 +512,143 @@ class ProteusHub:
                 
                 print(f"      ✅ 完成，产物：{result.get('artifacts', [])}")
                 
+            except CallAborted as e:
+                status = "cancelled" if isinstance(e, Cancelled) else "timeout"
+                self.logger.log_exception(task_id, str(e), "任务已取消" if status == "cancelled" else "超过截止时间")
+                subtask["status"] = status
+                subtask["error"] = str(e)
+                print(f"      ⏹️  {status}：{e}")
+                
             except Exception as e:
                 # 记录异常
                 self.logger.log_exception(task_id, str(e))
                 subtask["status"] = "failed"
                 subtask["error"] = str(e)
                 print(f"      ❌ 失败：{e}")
+            
+            if task_deadline.cancelled:
+                continue
+            if subtask["status"] == "completed":
+                self.memory.working.record_result(subtask["subtask_id"], subtask["result"])
+            # 上下文快照不随子任务字典变化，更新该子任务的状态与结果，后续 Agent 才能看到
+            self.memory.working.update_subtask(
+                subtask["subtask_id"], {k: subtask[k] for k in ("status", "result", "error") if k in subtask}
+            )
+        
+        # 撤销仍在排队的执行单元
+        for future in futures:
+            future.cancel()
+        self.task_futures.pop(task_id, None)
+        deadline.release()
         
-        # 所有子任务完成
-        task["status"] = "completed"
-        claw["status"] = "completed"
+        # 所有子任务完成（或已取消）
+        status = "cancelled" if task_deadline.cancelled else "completed"
+        task["status"] = status
+        claw["status"] = status
         task["execution_results"] = execution_results
         
-        print(f"   ✅ 任务执行完成")
+        print(f"   ✅ 任务执行完成" if status == "completed" else f"   ⏹️  任务已取消")
         
-        return {"task_id": task_id, "status": "completed", "results": execution_results}
+        return {"task_id": task_id, "status": status, "results": execution_results}
+    
+    def _budget(self, subtasks: List[Dict]) -> float:
+        """按子任务 estimated_time（分钟）推算执行预算（秒）"""
+        minutes = sum(st.get("estimated_time") or 30 for st in subtasks)
+        return max(self.MIN_DEADLINE, minutes * self.DEADLINE_SCALE)
+    
+    def _task_deadline(self, task_id: str) -> Deadline:
+        """任务的截止时间；已取消的任务不再登记，返回已取消的 Deadline"""
+        deadline = self.deadlines.get(task_id)
+        if deadline is None:
+            deadline = Deadline()
+            reason = self.active_tasks.get(task_id, {}).get("cancel_reason")
+            if reason is not None:
+                deadline.cancel(reason)
+            else:
+                self.deadlines[task_id] = deadline
+        return deadline
+    
+    def cancel_task(self, task_id: str, reason: str = "用户取消") -> Dict:
+        """
+        取消任务
+        
+        撤销排队中的执行单元（释放调度线程），中止进行中的 LLM 请求，
+        未完成的子任务标记为 cancelled，结束该任务的工作记忆（场景记录写入页脚）。
+        
+        Returns:
+            task_id / status / dequeued（撤销的排队单元数）
+        """
+        task = self.active_tasks.get(task_id)
+        if not task:
+            raise ValueError(f"任务 {task_id} 不存在")
+        
+        deadline = self.deadlines.pop(task_id, None)
+        if deadline is not None:
+            deadline.cancel(reason)
+        dequeued = sum(1 for future in self.task_futures.get(task_id, []) if future.cancel())
+        
+        for subtask in task["subtasks"]:
+            if subtask.get("status") == "pending":
+                subtask["status"] = "cancelled"
+        if task["status"] != "delivered":
+            task["status"] = "cancelled"
+            task["cancel_reason"] = reason
+        
+        self.logger.log_decision(task_id, "task_cancelled", reason, f"撤销 {dequeued} 个排队中的执行单元")
+        
+        # 取消的任务不会再交付：结束工作记忆，关闭场景记录文件
+        if self.memory.working.current_task_id == task_id:
+            self.memory.working.update_context("status", "cancelled")
+            self.memory.complete_task(success=False, feedback=reason)
+        print(f"\n🎤 [Hub] 任务 {task_id[:8]} 已取消：{reason}")
+        
+        return {"task_id": task_id, "status": "cancelled", "dequeued": dequeued}
+    
+    def _execution_units(self, subtasks: List[Dict], batch: bool, parallel: bool) -> List[List[int]]:
+        """
+        划分执行单元（子任务下标列表）
+        
+        非批量模式每个子任务一个单元；批量模式下合并同一 Agent 的子任务，
+        串行时只合并相邻的子任务以保持执行顺序，每个单元不超过 MAX_BATCH_SIZE。
+        """
+        if not batch:
+            return [[i] for i in range(len(subtasks))]
+        
+        units: List[List[int]] = []
+        open_units: Dict[str, List[int]] = {}
+        for i, subtask in enumerate(subtasks):
+            agent_type = subtask.get("agent_type", "content_agent")
+            unit = open_units.get(agent_type)
+            if unit is None or len(unit) >= self.llm.MAX_BATCH_SIZE or (not parallel and unit[-1] != i - 1):
+                unit = []
+                units.append(unit)
+                open_units[agent_type] = unit
+            unit.append(i)
+        return units
+    
+    def _run_unit(self, subtasks: List[Dict], unit: List[int], context: Dict,
+                  deadline: Optional[Deadline] = None) -> List[Dict]:
+        """执行一个单元，返回与单元内子任务顺序一致的结果（单元预算不超过任务截止时间）"""
+        agent_type = subtasks[unit[0]].get("agent_type", "content_agent")
+        members = [subtasks[i] for i in unit]
+        if deadline is not None:
+            deadline = deadline.child(self._budget(members))
+        try:
+            if deadline is not None:
+                deadline.check()
+            if len(unit) == 1:
+                return [self.llm.execute_agent_task(agent_type, members[0]["desc"], context=context,
+                                                    subtask=members[0], deadline=deadline)]
+            return self.llm.execute_agent_batch(
+                agent_type, [st["desc"] for st in members], context=context, subtasks=members, deadline=deadline
+            )
+        finally:
+            if deadline is not None:
+                deadline.release()
     
     # ========== 整合与交付 ==========
     
+    @traced_stage("deliver")
     def deliver_task(self, task_id: str, result: str, feedback: str = None) -> Dict:
         """
         交付任务
@@ -347,6 +671,7 @@ class ProteusHub:
         task["result"] = result
         task["feedback"] = feedback
         task["status"] = "delivered"
+        self.deadlines.pop(task_id, None)
         
         # 记录任务完成
         self.logger.complete_task(task_id, {"result": result, "success": success}, feedback)
@@ -406,6 +731,52 @@ class ProteusHub:
             "available_agents": len(self._list_agents())
         }
     
+    def get_parse_stats(self) -> Dict:
+        """任务解析统计：模式匹配 / LLM 分解次数，推测分解启动与取消次数"""
+        return dict(self.parse_stats)
+    
+    def get_memory_stats(self) -> Dict:
+        """
+        获取内存占用统计
+        
+        Returns:
+            layers: 各层条目数与估算字节数
+            tracemalloc: 各阶段分配热点（未开启时 enabled=False）
+        """
+        layers = {
+            "hub_active_tasks": layer_stats(self.active_tasks),
+            "hub_active_claws": layer_stats(self.active_claws)
+        }
+        layers.update(self.memory.get_memory_stats())
+        
+        if self.adaptive is not None:
+            layers["adaptive_failures"] = layer_stats(self.adaptive.failure_patterns)
+        
+        return {
+            "layers": layers,
+            "total_bytes": sum(layer["bytes"] for layer in layers.values()),
+            "tracemalloc": self.tracer.get_report()
+        }
+    
+    def get_llm_telemetry(self, group_by: Optional[List[str]] = None) -> List[Dict]:
+        """
+        获取 LLM 调用遥测
+
+        Args:
+            group_by: 聚合维度，provider / model / agent_type 的子集（默认全部）
+
+        Returns:
+            每组的调用计数与耗时 / 首 token / token / 费用直方图
+        """
+        return self.llm.get_telemetry(group_by)
+
+    def export_llm_telemetry(self, path: Optional[Path] = None, group_by: Optional[List[str]] = None) -> Path:
+        """导出 LLM 调用遥测为 JSON（默认 logs/llm_telemetry.json）"""
+        path = path or self.base_path / "logs" / "llm_telemetry.json"
+        if group_by is None:
+            return self.llm.telemetry.export(path)
+        return self.llm.telemetry.export(path, group_by)
+
     def get_task_status(self, task_id: str) -> Optional[Dict]:
         """获取任务状态"""
         return self.active_tasks.get(task_id)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+🔤 Olympus Keyword Classifier - 多关键词分类器
+
+把「if 关键词 in 文本 ... elif ...」链改为数据驱动的规则表：
+- 所有规则的关键词编译进一个 Aho-Corasick 自动机，一次扫描找出全部命中
+- mode=priority：按规则优先级取第一个命中的规则（与原 if/elif 顺序一致）
+- mode=score：按命中关键词权重之和取最高分，同分按优先级
+
+规则表格式（可保存在语义记忆的规则库中，rule_id 为 classifier_<name>）：
+{
+    "default": "generic",
+    "mode": "priority",
+    "rules": [
+        {"label": "coding", "keywords": ["代码", {"keyword": "编程", "weight": 2}], "priority": 0}
+    ]
+}
+priority 省略时按规则在表中的顺序。
+"""
+
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# 内置规则表（语义记忆中没有对应规则时使用）
+DEFAULT_TABLES = {
+    # LLMClient._mock_decompose：模拟分解的任务类型
+    "task_type": {
+        "default": "generic",
+        "rules": [
+            {"label": "social_media", "keywords": ["社交媒体", "内容计划"]},
+            {"label": "research", "keywords": ["研究", "报告"]},
+            {"label": "coding", "keywords": ["代码", "编程"]},
+            {"label": "web_development", "keywords": ["网站", "开发"]},
+        ],
+    },
+    # EvolutionEngine._cluster_similar_tasks：模式发现的任务聚类
+    "task_cluster": {
+        "default": "generic",
+        "rules": [
+            {"label": "social_media", "keywords": ["社交媒体", "内容"]},
+            {"label": "research", "keywords": ["研究", "报告"]},
+            {"label": "coding", "keywords": ["代码", "编程"]},
+        ],
+    },
+    # AdaptiveEngine._classify_failure：失败分类
+    "failure_type": {
+        "default": "unknown",
+        "rules": [
+            {"label": "agent_unavailable", "keywords": ["unavailable", "not found"]},
+            {"label": "task_too_complex", "keywords": ["too complex", "timeout"]},
+            {"label": "skill_mismatch", "keywords": ["skill", "cannot"]},
+            {"label": "conflict", "keywords": ["conflict", "disagree"]},
+        ],
+    },
+}
+
+
+class KeywordClassifier:
+    """基于 Aho-Corasick 自动机的关键词分类器"""
+
+    def __init__(
+        self,
+        rules: List[Dict],
+        default: str = "generic",
+        mode: str = "priority",
+        case_insensitive: bool = True,
+    ):
+        if mode not in ("priority", "score"):
+            raise ValueError(f"未知的分类模式：{mode}")
+        self.default = default
+        self.mode = mode
+        self.case_insensitive = case_insensitive
+
+        # 规则：(label, priority)；关键词：(文本, 规则序号, 权重)
+        self.rules: List[Tuple[str, float]] = []
+        self.keywords: List[Tuple[str, int, float]] = []
+        for position, rule in enumerate(rules):
+            self.rules.append((rule["label"], rule.get("priority", position)))
+            for keyword in rule.get("keywords", []):
+                if isinstance(keyword, dict):
+                    text, weight = keyword["keyword"], keyword.get("weight", 1.0)
+                else:
+                    text, weight = keyword, rule.get("weight", 1.0)
+                if text:
+                    self.keywords.append(
+                        (self._normalize(text), len(self.rules) - 1, weight)
+                    )
+
+        self._build()
+
+    @classmethod
+    def from_table(cls, table: Dict) -> "KeywordClassifier":
+        return cls(
+            table.get("rules", []),
+            default=table.get("default", "generic"),
+            mode=table.get("mode", "priority"),
+            case_insensitive=table.get("case_insensitive", True),
+        )
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.case_insensitive else text
+
+    def _build(self):
+        """构建 goto / fail / output 表"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[int]] = [[]]
+        for index, (text, _, _) in enumerate(self.keywords):
+            node = 0
+            for char in text:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._output.append([])
+                node = nxt
+            self._output[node].append(index)
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                # 后缀上的关键词同样命中
+                self._output[child] = (
+                    self._output[child] + self._output[self._fail[child]]
+                )
+
+    def find(self, text: str) -> List[int]:
+        """一次扫描返回命中的关键词序号（去重，按首次出现顺序）"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        seen = set()
+        found = []
+        for char in self._normalize(text or ""):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                if index not in seen:
+                    seen.add(index)
+                    found.append(index)
+        return found
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        """各规则命中的关键词"""
+        matched: Dict[str, List[str]] = {}
+        for index in self.find(text):
+            keyword, rule, _ = self.keywords[index]
+            matched.setdefault(self.rules[rule][0], []).append(keyword)
+        return matched
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """各规则的命中权重之和"""
+        totals: Dict[str, float] = {}
+        for index in self.find(text):
+            _, rule, weight = self.keywords[index]
+            label = self.rules[rule][0]
+            totals[label] = totals.get(label, 0.0) + weight
+        return totals
+
+    def classify(self, text: str) -> str:
+        """返回分类标签，无命中时返回 default"""
+        best: Optional[Tuple] = None
+        totals: Dict[int, float] = {}
+        for index in self.find(text):
+            _, rule, weight = self.keywords[index]
+            totals[rule] = totals.get(rule, 0.0) + weight
+
+        for rule, total in totals.items():
+            priority = self.rules[rule][1]
+            key = (priority,) if self.mode == "priority" else (-total, priority)
+            if best is None or key < best[0]:
+                best = (key, rule)
+        return self.rules[best[1]][0] if best else self.default
+
+
+def load_classifier(name: str, semantic_memory=None) -> KeywordClassifier:
+    """
+    加载分类器：优先读取语义记忆中的 classifier_<name> 规则，否则使用内置规则表
+
+    Args:
+        name: 规则表名称（task_type / task_cluster / failure_type 或自定义）
+        semantic_memory: 语义记忆对象（可选）
+    """
+    table = None
+    if semantic_memory is not None:
+        rule = semantic_memory.get_rule(f"classifier_{name}")
+        if rule:
+            table = rule.get("classifier")
+    if table is None:
+        if name not in DEFAULT_TABLES:
+            raise KeyError(f"未知的分类器：{name}")
+        table = DEFAULT_TABLES[name]
+    return KeywordClassifier.from_table(table)
+
+
+def save_classifier(semantic_memory, name: str, table: Dict, description: str = ""):
+    """把规则表保存到语义记忆的规则库（下次 load_classifier 生效）"""
+    KeywordClassifier.from_table(table)  # 先校验
+    semantic_memory.save_rule(
+        f"classifier_{name}",
+        {
+            "rule_id": f"classifier_{name}",
+            "name": f"关键词分类：{name}",
+            "description": description or f"{name} 关键词分类规则表",
+            "classifier": table,
+        },
+    )
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+💾 Olympus LLM Cache - 持久化 LLM 响应缓存
+
+- 内容寻址：键 = sha256(provider, model, system_prompt, user_prompt)
+- 磁盘存储：<cache_dir>/<key[:2]>/<key>.json，进程重启后仍然有效
+- LRU 容量限制（条目数 / 字节数），命中时刷新 mtime 作为最近使用时间
+- TTL 过期
+- 命中 / 未命中 / 淘汰计数
+
+环境变量:
+    PROTEUS_LLM_CACHE: on | off (default: on)
+    PROTEUS_LLM_CACHE_DIR: 缓存目录
+    PROTEUS_LLM_CACHE_TTL: 过期秒数 (default: 604800)
+    PROTEUS_LLM_CACHE_MAX_ENTRIES: 最大条目数 (default: 5000)
+    PROTEUS_LLM_CACHE_MAX_BYTES: 最大字节数 (default: 104857600)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class LLMResponseCache:
+    """磁盘持久化、内容寻址的 LLM 响应缓存"""
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_entries: int = 5000,
+        max_bytes: int = 100 * 1024 * 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+        # 启动时扫描一次，恢复容量统计
+        self._entries = 0
+        self._bytes = 0
+        for path in self._iter_entries():
+            self._entries += 1
+            self._bytes += path.stat().st_size
+
+    @classmethod
+    def from_env(cls, default_dir: Path) -> Optional["LLMResponseCache"]:
+        """根据环境变量创建缓存；PROTEUS_LLM_CACHE=off 时返回 None"""
+        if os.getenv("PROTEUS_LLM_CACHE", "on").lower() in ("0", "off", "false", "no"):
+            return None
+        return cls(
+            Path(os.getenv("PROTEUS_LLM_CACHE_DIR", str(default_dir))),
+            max_entries=int(os.getenv("PROTEUS_LLM_CACHE_MAX_ENTRIES", "5000")),
+            max_bytes=int(
+                os.getenv("PROTEUS_LLM_CACHE_MAX_BYTES", str(100 * 1024 * 1024))
+            ),
+            ttl_seconds=float(os.getenv("PROTEUS_LLM_CACHE_TTL", str(7 * 24 * 3600))),
+        )
+
+    @staticmethod
+    def make_key(
+        provider: str, model: str, system_prompt: str, user_prompt: str
+    ) -> str:
+        """生成内容寻址的缓存键"""
+        payload = json.dumps(
+            [provider, model, system_prompt, user_prompt], ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _iter_entries(self):
+        return self.cache_dir.glob("??/*.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存；未命中或已过期返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        if entry.get("expires_at", 0) < time.time():
+            self._remove(path)
+            with self._lock:
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+            return None
+
+        try:
+            os.utime(path)  # 刷新最近使用时间
+        except OSError:
+            pass
+        with self._lock:
+            self._counters["hits"] += 1
+        return entry["response"]
+
+    def put(self, key: str, response: str, metadata: Optional[Dict] = None):
+        """写入缓存（原子替换），超出容量时按 LRU 淘汰"""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "response": response,
+            "metadata": metadata or {},
+            "created_at": time.time(),
+            "expires_at": time.time() + self.ttl_seconds,
+        }
+        data = json.dumps(entry, ensure_ascii=False)
+
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        old_size = path.stat().st_size if path.exists() else None
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._counters["writes"] += 1
+            if old_size is None:
+                self._entries += 1
+            else:
+                self._bytes -= old_size
+            self._bytes += path.stat().st_size
+            over_limit = (
+                self._entries > self.max_entries or self._bytes > self.max_bytes
+            )
+
+        if over_limit:
+            self._evict()
+
+    def delete(self, key: str):
+        """删除一条缓存（如无法解析的响应）"""
+        self._remove(self._path(key))
+
+    def _remove(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._entries -= 1
+            self._bytes -= size
+
+    def _evict(self):
+        """淘汰最久未使用的条目，直到回到容量限制的 90%"""
+        entries = sorted(
+            ((p.stat().st_mtime_ns, p) for p in self._iter_entries()),
+            key=lambda x: x[0],
+        )
+        target_entries = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        for _, path in entries:
+            if self._entries <= target_entries and self._bytes <= target_bytes:
+                break
+            self._remove(path)
+            with self._lock:
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        """清空缓存"""
+        for path in list(self._iter_entries()):
+            self._remove(path)
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["entries"] = self._entries
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
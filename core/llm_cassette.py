@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+📼 Olympus LLM Cassette - LLM 调用录制与回放
+
+录制：LLMClient 每次成功调用提供商后，把请求 / 响应写入磁带文件（JSONL，一行一条）：
+    {"key", "provider", "model", "stream", "response", "usage", "latency", "ttft", "recorded_at", "prompt"}
+键 = sha256(系统提示词, 用户提示词)，计算前把 UUID、8 位十六进制 ID（子任务、Claw）
+与 ISO 时间戳替换为占位符，任务 ID、时间不同的同一请求在回放时仍能命中。
+
+回放：replay 提供商按提示词哈希返回录制的响应，并按录制时的耗时（可缩放）等待，
+流式请求先等首 token 时间再分块送出。同一键录制了多次时按顺序轮流返回。
+离线复现线上负载、比较不同版本的 Hub 吞吐时不再依赖真实提供商。
+没有录制的请求抛出 CassetteMiss：不重试、不计入熔断、不切换提供商，也不 fallback 到模拟模式，
+回放不会悄悄退化成模拟输出；未命中次数见回放统计。
+
+环境变量:
+    PROTEUS_LLM_RECORD: 录制到该磁带文件
+    PROTEUS_REPLAY_CASSETTE: replay 提供商读取的磁带文件 (default: cache/llm/cassette.jsonl)
+    PROTEUS_REPLAY_LATENCY_SCALE: 回放耗时倍数，0 为不等待 (default: 1)
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from deadline import Deadline
+from llm_pool import get_shared_client
+from llm_providers import LLMProvider, UnservableRequest, register_provider
+
+_VOLATILE = [
+    (
+        re.compile(
+            r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I
+        ),
+        "<uuid>",
+    ),
+    # 子任务 ID、Claw ID（UUID 的前 8 位）
+    (re.compile(r"(?<![0-9A-Za-z])[0-9a-f]{8}(?![0-9A-Za-z])"), "<id>"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?"), "<time>"),
+]
+
+# 回放流式响应时每块的字符数
+STREAM_CHUNK = 32
+
+
+class CassetteMiss(UnservableRequest, LookupError):
+    """磁带中没有该请求的录制"""
+
+
+class Cassette:
+    """录制 / 回放 LLM 请求与响应的磁带文件"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        self.stats = {"recorded": 0, "loaded": 0, "replayed": 0, "misses": 0}
+
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+                        self.stats["loaded"] += 1
+
+    @staticmethod
+    def make_key(system_prompt: str, user_prompt: str) -> str:
+        """提示词哈希（UUID、8 位 ID、时间戳归一化）"""
+        prompts = []
+        for text in (system_prompt, user_prompt):
+            for pattern, placeholder in _VOLATILE:
+                text = pattern.sub(placeholder, text)
+            prompts.append(text)
+        payload = json.dumps(prompts, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def record(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response: str,
+        usage: Dict,
+        provider: str,
+        model: str,
+        latency: float,
+        ttft: Optional[float] = None,
+        stream: bool = False,
+    ):
+        """追加一条录制"""
+        entry: Dict[str, Any] = {
+            "key": self.make_key(system_prompt, user_prompt),
+            "provider": provider,
+            "model": model,
+            "stream": stream,
+            "response": response,
+            "usage": usage,
+            "latency": round(latency, 4),
+            "ttft": round(ttft, 4) if ttft is not None else None,
+            "recorded_at": datetime.now().isoformat(),
+            "prompt": user_prompt[:200],
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._entries.setdefault(entry["key"], []).append(entry)
+            self.stats["recorded"] += 1
+
+    def lookup(self, system_prompt: str, user_prompt: str) -> Dict:
+        """取出该请求的下一条录制（多条时轮流返回）；没有时抛出 CassetteMiss"""
+        key = self.make_key(system_prompt, user_prompt)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.stats["misses"] += 1
+                raise CassetteMiss(
+                    f"磁带 {self.path.name} 中没有该请求的录制：{user_prompt[:50]}"
+                )
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.stats["replayed"] += 1
+            return entries[index % len(entries)]
+
+
+@register_provider
+class ReplayProvider(LLMProvider):
+    """按录制的响应与耗时回放（client 为 Cassette）"""
+
+    name = "replay"
+    label = "Replay"
+    default_model = "cassette"
+    requires_key = False
+    cache_responses = False
+
+    def __init__(
+        self,
+        client: Any = None,
+        model: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+    ):
+        super().__init__(client, model)
+        if latency_scale is None:
+            latency_scale = float(os.getenv("PROTEUS_REPLAY_LATENCY_SCALE", "1"))
+        self.latency_scale = latency_scale
+
+    @classmethod
+    def build_client(cls, api_key: Optional[str] = None) -> Any:
+        return Cassette(cls.cassette_path())
+
+    @staticmethod
+    def cassette_path() -> Path:
+        default = Path(__file__).parent.parent / "cache" / "llm" / "cassette.jsonl"
+        return Path(os.getenv("PROTEUS_REPLAY_CASSETTE", str(default)))
+
+    @classmethod
+    def create(cls, api_key: Optional[str] = None) -> "LLMProvider":
+        # 按磁带路径区分共享实例（同一进程内的回放顺序一致）
+        path = cls.cassette_path()
+        return cls(
+            client=get_shared_client(
+                f"{cls.name}:{path}", None, lambda: cls.build_client(api_key)
+            )
+        )
+
+    def _wait(self, seconds: float, deadline: Optional[Deadline] = None):
+        seconds = max(0.0, seconds or 0.0) * self.latency_scale
+        if deadline:
+            deadline.sleep(seconds)
+        elif seconds:
+            time.sleep(seconds)
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: Any = None,
+        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, Dict]:
+        entry = self.client.lookup(system_prompt, user_prompt)
+        text = entry["response"]
+        latency = entry.get("latency") or 0.0
+        if not stream:
+            self._wait(latency, deadline)
+            return text, dict(entry.get("usage") or {})
+
+        # 流式：先等首 token 时间，剩余耗时均摊到各块之间
+        ttft = entry.get("ttft")
+        ttft = latency if ttft is None else min(ttft, latency)
+        chunks = [
+            text[i : i + STREAM_CHUNK] for i in range(0, len(text), STREAM_CHUNK)
+        ] or [""]
+        self._wait(ttft, deadline)
+        gap = (latency - ttft) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                self._wait(gap, deadline)
+            if chunk:
+                stream.feed(chunk)
+        return text, dict(entry.get("usage") or {})
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """PROTEUS_LLM_RECORD 设置时返回录制用的磁带"""
+    path = os.getenv("PROTEUS_LLM_RECORD")
+    return Cassette(Path(path)) if path else None
@@ -7,18 +7,52 @@
 - Anthropic API (Claude)
 - 本地模拟模式（无 API key 时）
 
+一次调用依次经过：
+- context_compactor: 按 token 预算裁剪上下文
+- model_routing: 按子任务复杂度选择模型档位与输出 token 上限
+- llm_cache: 持久化响应缓存，只缓存能解析的响应
+- llm_router: 多提供商熔断、切换与对冲请求
+- rate_limit: 令牌桶限流与退避重试
+- llm_providers: 提供商插件，统一返回 (文本, token 用量)
+另有 llm_telemetry（遥测直方图）、llm_cassette（录制与回放）、deadline（截止与取消）。
+
+本模块实现：
+- 系统提示词拆分为稳定前缀与可变的用户提示词，同一 Agent 的前缀逐字节不变，
+  可命中提供商侧的提示词缓存，命中率见 get_prompt_cache_stats
+- 相同的分解请求同时在途时只请求一次提供商，其余调用共享解析结果
+- 传入 on_subtask 时任务分解使用流式响应（见 stream_json），每个子任务生成完整后立即回调
+- execute_agent_batch 把同一 Agent 的多个独立子任务合并成一次调用，响应无法拆分时退回逐个调用
+
 安全提示：
 - API key 通过环境变量获取
 - 不会硬编码在代码中
 - 支持 fallback 到模拟模式
 """
 
+import copy
 import json
 import os
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Sequence
+
+from context_compactor import ContextCompactor
+from deadline import CallAborted, Deadline
+from keyword_classifier import KeywordClassifier, load_classifier
+from llm_cache import LLMResponseCache
+from llm_cassette import Cassette, ReplayProvider, cassette_from_env
+from llm_pool import LLMDispatcher, SingleFlight, get_dispatcher
+from llm_providers import LLMProvider, UnservableRequest, get_provider_class
+from llm_router import ProviderRouter
+from llm_telemetry import CallRecord, LLMTelemetry
+from model_routing import ModelRoute, ModelRoutingPolicy
+from stream_json import JSONArrayStream
+from rate_limit import (
+    RetryPolicy, estimate_tokens, get_rate_limiter, is_retryable, is_throttle, retry_after_seconds
+)
 
 
 class LLMClient:
@@ -27,172 +61,601 @@ class LLMClient:
     
     支持多种 LLM 提供商，自动 fallback 到模拟模式
     
+    截止或取消（CallAborted）与无法完成的请求（UnservableRequest，如回放未命中）直接向上抛出，
+    不重试、不切换提供商、不 fallback。
+    
     环境变量:
-        OLYMPUS_LLM_PROVIDER: openai | anthropic | mock (default: mock)
+        PROTEUS_LLM_PROVIDER: openai | anthropic | local | replay | mock (default: mock)
+            （旧名 OLYMPUS_LLM_PROVIDER 仍然有效）
+        PROTEUS_LLM_PROVIDERS: 提供商顺序，如 "anthropic,openai"（可选）
         OPENAI_API_KEY: OpenAI API key
         ANTHROPIC_API_KEY: Anthropic API key
+        PROTEUS_LLM_CACHE: on | off (default: on)
+        PROTEUS_LLM_CONTEXT_BUDGET: 上下文 token 预算 (default: 800)
+        PROTEUS_MODEL_ROUTING: on | off | 路由配置文件路径 (default: on)
+        PROTEUS_PROMPT_CACHE: on | off 提供商侧提示词缓存 (default: on)
+        PROTEUS_LLM_RECORD: 录制磁带文件路径（可选）
     """
     
-    def __init__(self, provider: str = None, api_key: str = None):
+    MAX_TOKENS = 2000
+    
+    # 批量执行：每批最多子任务数
+    MAX_BATCH_SIZE = int(os.getenv("PROTEUS_LLM_BATCH_SIZE", "4"))
+    
+    # 系统提示词的静态部分（不含任何随调用变化的内容，保证前缀缓存命中）
+    SYSTEM_PROMPTS = {
+        "decompose": """你是一个专业的任务规划专家。请将复杂任务分解为可执行的子任务。
+
+每个子任务必须包含：
+- desc: 任务描述（清晰具体）
+- required_skills: 所需技能列表
+- agent_type: 适合的 Agent 类型 (athena/hermes/apollo/hephaestus/muse/hestia/themis/aphrodite/echo/daedalus)
+- estimated_time: 预估时间（分钟）
+
+只返回 JSON 数组，不要其他内容。""",
+        "execute": """请根据任务描述完成工作，并返回结构化的结果。
+
+返回格式（JSON）：
+{
+    "success": true/false,
+    "output": "任务输出的详细描述",
+    "execution_time": 执行时间（分钟）,
+    "artifacts": ["产出的文件列表"],
+    "logs": ["执行日志"],
+    "confidence": 置信度 (0.0-1.0)
+}
+
+请确保输出专业、详细且可执行。""",
+        "batch": """你将一次收到多个相互独立的任务，请分别完成，并返回结构化的结果。
+
+返回格式（JSON 数组，每个任务一个元素，按任务编号顺序）：
+[
+    {
+        "index": 任务编号,
+        "success": true/false,
+        "output": "任务输出的详细描述",
+        "execution_time": 执行时间（分钟）,
+        "artifacts": ["产出的文件列表"],
+        "logs": ["执行日志"],
+        "confidence": 置信度 (0.0-1.0)
+    }
+]
+
+请确保每个任务的输出专业、详细且可执行。只返回 JSON 数组。"""
+    }
+    
+    def __init__(self, provider: Optional[str] = None, api_key: Optional[str] = None,
+                 cache: Optional[LLMResponseCache] = None,
+                 cache_dir: Optional[Path] = None, dispatcher: Optional[LLMDispatcher] = None,
+                 compactor: Optional[ContextCompactor] = None, routing: Optional[ModelRoutingPolicy] = None,
+                 telemetry: Optional[LLMTelemetry] = None,
+                 profile_source: Optional[Callable[[str], Optional[Dict]]] = None,
+                 task_classifier: Optional[KeywordClassifier] = None, cassette: Optional[Cassette] = None):
         """
         初始化 LLM 客户端
         
         Args:
-            provider: LLM 提供商 (openai/anthropic/mock)
+            provider: LLM 提供商（已注册的插件名称或 mock）
             api_key: API key (优先使用环境变量)
+            cache: 响应缓存（默认按环境变量创建）
+            cache_dir: 默认缓存目录
+            dispatcher: 并发调度器（默认使用进程内共享实例）
+            compactor: 上下文压缩器
+            routing: 模型路由策略（默认按环境变量创建）
+            telemetry: 调用遥测
+            profile_source: 按 agent_id 读取 Agent 画像（写入系统提示词前缀）
+            task_classifier: 模拟分解使用的任务类型分类器（默认内置 task_type 规则表）
+            cassette: 录制提供商调用的磁带（默认按 PROTEUS_LLM_RECORD 创建）
         """
         # 从环境变量获取配置
-        self.provider = provider or os.getenv("OLYMPUS_LLM_PROVIDER", "mock")
+        self.provider: str = (provider or os.getenv("PROTEUS_LLM_PROVIDER")
+                              or os.getenv("OLYMPUS_LLM_PROVIDER") or "mock")
         self.api_key = api_key or self._get_api_key()
         
-        # 客户端实例
-        self.openai_client = None
-        self.anthropic_client = None
+        # 提供商插件实例
+        self.providers: Dict[str, LLMProvider] = {}
+        
+        # 备用提供商（PROTEUS_LLM_PROVIDERS 中除主提供商外的部分）
+        self.fallback_providers = [
+            p.strip() for p in os.getenv("PROTEUS_LLM_PROVIDERS", "").split(",")
+            if get_provider_class(p.strip()) and p.strip() != self.provider
+        ]
+        self.router: Optional[ProviderRouter] = None
         
         # 初始化对应的客户端
         self._initialize_client()
         
+        # 响应缓存（模拟模式、回放不需要）
+        provider_cls = get_provider_class(self.provider)
+        if cache is None and provider_cls and provider_cls.cache_responses:
+            cache = LLMResponseCache.from_env(
+                cache_dir or Path(__file__).parent.parent / "cache" / "llm"
+            )
+        self.cache = cache
+        
+        # 并发调度器
+        self.dispatcher = dispatcher or get_dispatcher()
+        
+        # 退避重试策略（SDK 自带重试已关闭，由这里统一处理）
+        self.retry_policy = RetryPolicy()
+        
+        # 上下文压缩与提示词大小统计
+        self.compactor = compactor or ContextCompactor()
+        self._prompt_lock = threading.Lock()
+        self.prompt_stats = {"calls": 0, "total_tokens": 0, "max_tokens": 0, "last_tokens": 0}
+        
+        # 在途请求合并
+        self.inflight = SingleFlight()
+        
+        # 批量执行统计
+        self.batch_stats = {"batches": 0, "batched_subtasks": 0, "fallbacks": 0}
+        
+        # 模型路由
+        self.routing = routing or ModelRoutingPolicy.from_env()
+        
+        # 调用遥测
+        self.telemetry = telemetry or LLMTelemetry()
+        
+        # 系统提示词前缀
+        self.profile_source = profile_source
+        self._prefixes: Dict[tuple, str] = {}
+        self.prefix_stats = {"built": 0, "reused": 0}
+        
+        # 模拟分解的任务类型分类
+        self.task_classifier = task_classifier or load_classifier("task_type")
+        
+        # 调用录制
+        self.cassette = cassette or cassette_from_env()
+        
         print(f"🧠 LLM Client 已初始化")
         print(f"   提供商：{self.provider}")
-        print(f"   API Key: {'已配置' if self.api_key else '未配置 (使用模拟模式)'}")
+        print(f"   API Key: {'已配置' if self.api_key else '未配置 (使用模拟模式)' if not self._is_live() else '不需要'}")
     
-    def _get_api_key(self) -> Optional[str]:
+    def _get_api_key(self, provider: Optional[str] = None) -> Optional[str]:
         """安全获取 API key"""
-        if self.provider == "openai":
-            return os.getenv("OPENAI_API_KEY")
-        elif self.provider == "anthropic":
-            return os.getenv("ANTHROPIC_API_KEY")
-        return None
+        cls = get_provider_class(provider or self.provider)
+        return cls.api_key_from_env() if cls else None
+    
+    def _has_credentials(self, provider: str, api_key: Optional[str]) -> bool:
+        cls = get_provider_class(provider)
+        return cls is not None and (bool(api_key) or not cls.requires_key)
+    
+    def _is_live(self) -> bool:
+        """主提供商是否为真实提供商（否则使用模拟模式）"""
+        return self._has_credentials(self.provider, self.api_key)
     
     def _initialize_client(self):
         """初始化 LLM 客户端"""
-        if self.provider == "openai" and self.api_key:
-            try:
-                import openai
-                self.openai_client = openai.OpenAI(api_key=self.api_key)
-                print("   ✅ OpenAI 客户端已初始化")
-            except ImportError:
-                print("   ⚠️  openai 包未安装，使用模拟模式")
+        if self._is_live():
+            if not self._create_client(self.provider, self.api_key):
                 self.provider = "mock"
         
-        elif self.provider == "anthropic" and self.api_key:
-            try:
-                import anthropic
-                self.anthropic_client = anthropic.Anthropic(api_key=self.api_key)
-                print("   ✅ Anthropic 客户端已初始化")
-            except ImportError:
-                print("   ⚠️  anthropic 包未安装，使用模拟模式")
-                self.provider = "mock"
+        # 备用提供商：缺少 key 或依赖时直接跳过
+        for provider in list(self.fallback_providers):
+            api_key = self._get_api_key(provider)
+            if not self._has_credentials(provider, api_key) or not self._create_client(provider, api_key):
+                self.fallback_providers.remove(provider)
+    
+    def _create_client(self, provider: str, api_key: Optional[str]) -> bool:
+        """创建（或复用进程内共享的）提供商客户端"""
+        cls = get_provider_class(provider)
+        if cls is None:
+            return False
+        try:
+            self.providers[provider] = cls.create(api_key)
+        except ImportError as e:
+            print(f"   ⚠️  {e}，使用模拟模式")
+            return False
+        print(f"   ✅ {cls.label} 客户端已初始化")
+        return True
     
-    def decompose_task(self, task_desc: str, context: Dict = None) -> List[Dict]:
+    def attach_client(self, provider: str, client: Any):
+        """直接挂载一个客户端实例（如自定义配置的 SDK 客户端或测试替身）"""
+        if client is None:
+            self.providers.pop(provider, None)
+            return
+        cls = get_provider_class(provider)
+        if cls is None:
+            raise ValueError(f"未知的 LLM 提供商：{provider}")
+        self.providers[provider] = cls(client=client)
+    
+    @property
+    def openai_client(self) -> Any:
+        return self._client_for("openai")
+    
+    @openai_client.setter
+    def openai_client(self, client: Any):
+        self.attach_client("openai", client)
+    
+    @property
+    def anthropic_client(self) -> Any:
+        return self._client_for("anthropic")
+    
+    @anthropic_client.setter
+    def anthropic_client(self, client: Any):
+        self.attach_client("anthropic", client)
+    
+    def _model_for(self, provider: str, route: Optional[ModelRoute] = None) -> str:
+        """解析某提供商在本次路由下使用的模型"""
+        instance = self.providers.get(provider)
+        if instance:
+            default = instance.model
+        else:
+            cls = get_provider_class(provider)
+            default = cls.default_model if cls else ""
+        return route.model_for(provider, default) if route else default
+    
+    def decompose_task(self, task_desc: str, context: Optional[Dict] = None, use_cache: bool = True,
+                       on_subtask: Optional[Callable[[Dict], None]] = None,
+                       deadline: Optional[Deadline] = None) -> List[Dict]:
         """
         使用 LLM 智能分解任务
         
         Args:
             task_desc: 任务描述
             context: 上下文信息
+            use_cache: 是否使用响应缓存（False 时强制请求提供商并刷新缓存）
+            on_subtask: 每个子任务就绪时的回调（流式分解）
+            deadline: 截止时间与取消信号
         
         Returns:
-            子任务列表
+            子任务列表（以返回值为准：fallback 时回调过的子任务可能不在其中）
         """
-        if self.provider in ["openai", "anthropic"] and self.api_key:
+        if self._is_live():
             try:
-                return self._llm_decompose(task_desc, context)
+                return self._coalesced_decompose(task_desc, context, use_cache, on_subtask, deadline)
+            except (CallAborted, UnservableRequest):
+                raise
             except Exception as e:
                 print(f"   ⚠️  LLM 调用失败：{e}")
                 print("   🔄 Fallback 到模拟模式")
-                return self._mock_decompose(task_desc)
+                self.telemetry.count("fallbacks", self.provider, "mock", "decompose")
+                return self._emit_all(self._mock_decompose(task_desc), on_subtask)
         else:
-            return self._mock_decompose(task_desc)
+            return self._emit_all(self._mock_decompose(task_desc), on_subtask)
+    
+    def _emit_all(self, subtasks: List[Dict], on_subtask: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        if on_subtask:
+            for st in subtasks:
+                on_subtask(st)
+        return subtasks
     
-    def _llm_decompose(self, task_desc: str, context: Dict = None) -> List[Dict]:
+    def _coalesced_decompose(self, task_desc: str, context: Optional[Dict] = None, use_cache: bool = True,
+                             on_subtask: Optional[Callable[[Dict], None]] = None,
+                             deadline: Optional[Deadline] = None) -> List[Dict]:
+        """合并相同的在途分解请求；每个调用方拿到独立的深拷贝，共享方分配新的 subtask_id"""
+        normalized = " ".join(task_desc.split())
+        key = LLMResponseCache.make_key(
+            self.provider,
+            self._model_for(self.provider),
+            "decompose",
+            normalized + json.dumps(context, ensure_ascii=False, sort_keys=True, default=str)
+        )
+        def decompose() -> List[Dict]:
+            return self._llm_decompose(normalized, context, use_cache=use_cache,
+                                       on_subtask=on_subtask, deadline=deadline)
+        
+        try:
+            subtasks, shared = self.inflight.do(key, decompose)
+        except CallAborted:
+            # 中止的是共享的另一个调用方时，自己重新请求
+            if deadline:
+                deadline.check()
+            subtasks, shared = decompose(), False
+        subtasks = copy.deepcopy(subtasks)
+        if shared:
+            for st in subtasks:
+                st["subtask_id"] = str(uuid.uuid4())[:8]
+            self._emit_all(subtasks, on_subtask)
+        return subtasks
+    
+    def _llm_decompose(self, task_desc: str, context: Optional[Dict] = None, use_cache: bool = True,
+                       on_subtask: Optional[Callable[[Dict], None]] = None,
+                       deadline: Optional[Deadline] = None) -> List[Dict]:
         """使用真实 LLM 分解任务"""
         
         # 构建提示词
-        system_prompt = """你是一个专业的任务规划专家。请将复杂任务分解为可执行的子任务。
-
-每个子任务必须包含：
-- desc: 任务描述（清晰具体）
-- required_skills: 所需技能列表
-- agent_type: 适合的 Agent 类型 (athena/hermes/apollo/hephaestus/muse/hestia/themis/aphrodite/echo/daedalus)
-- estimated_time: 预估时间（分钟）
-
-只返回 JSON 数组，不要其他内容。"""
-
+        system_prompt = self._system_prompt("decompose")
         user_prompt = f"""请分解以下任务：
 
 任务：{task_desc}
 
-{'上下文：' + json.dumps(context, ensure_ascii=False) if context else ''}
+{self._render_context(context, task_desc)}
 
 请返回子任务列表（JSON 数组格式）："""
 
-        if self.provider == "openai" and self.openai_client:
-            return self._call_openai(system_prompt, user_prompt)
-        elif self.provider == "anthropic" and self.anthropic_client:
-            return self._call_anthropic(system_prompt, user_prompt)
-        else:
-            return self._mock_decompose(task_desc)
+        if not self._has_client():
+            return self._emit_all(self._mock_decompose(task_desc), on_subtask)
+        
+        stream = None
+        emitted: List[Dict] = []
+        if on_subtask:
+            def emit(item: Dict):
+                subtask = self._validate_subtasks([item])[0]
+                emitted.append(subtask)
+                on_subtask(subtask)
+            stream = JSONArrayStream(emit)
+        
+        route = self.routing.route(prompt_tokens=estimate_tokens(user_prompt), purpose="decompose")
+        subtasks = self._complete(
+            system_prompt, user_prompt, use_cache=use_cache, stream=stream, route=route,
+            agent_type="decompose", deadline=deadline,
+            parse=lambda content: self._validate_subtasks(self._parse_json(content, "decompose", route))
+        )
+        # 流式解析与完整解析一致时沿用已回调的子任务（保持 subtask_id 一致）；
+        # 重试或切换提供商后新响应与已回调的不同，以最终响应为准
+        if stream and len(emitted) == len(subtasks) and stream.consistent():
+            return emitted
+        return subtasks
+    
+    def _has_client(self) -> bool:
+        return bool(self._routed_providers())
+    
+    def _client_for(self, provider: str) -> Any:
+        instance = self.providers.get(provider)
+        return instance.client if instance else None
+    
+    def _routed_providers(self) -> List[str]:
+        """主提供商 + 备用提供商中已初始化客户端的部分"""
+        return [p for p in [self.provider] + self.fallback_providers if self._client_for(p)]
+    
+    def _get_router(self) -> ProviderRouter:
+        providers = self._routed_providers()
+        if self.router is None or self.router.providers != providers:
+            self.router = ProviderRouter(providers)
+        return self.router
+    
+    def _render_context(self, context: Optional[Dict], task_desc: str) -> str:
+        """按 token 预算压缩上下文，生成提示词中的上下文段落"""
+        rendered = self.compactor.render(context, focus=task_desc)
+        return '上下文：' + rendered if rendered else ''
+    
+    def _system_prompt(self, kind: str, agent_type: Optional[str] = None) -> str:
+        """
+        系统提示词 = 静态说明（所有 Agent 相同）+ Agent 画像（同一 Agent 不变）
+        
+        共享部分放在最前面，使不同 Agent 的请求也能共用最长的缓存前缀；
+        画像只取稳定字段，统计数据与更新时间不进入提示词。
+        """
+        profile = self._agent_profile_block(agent_type) if agent_type else ""
+        key = (kind, profile)
+        with self._prompt_lock:
+            prompt = self._prefixes.get(key)
+            if prompt is None:
+                prompt = self.SYSTEM_PROMPTS[kind] + ("\n\n" + profile if profile else "")
+                self._prefixes[key] = prompt
+                self.prefix_stats["built"] += 1
+            else:
+                self.prefix_stats["reused"] += 1
+        return prompt
+    
+    def _agent_profile_block(self, agent_type: str) -> str:
+        lines = [f"你是一个专业的 {agent_type} Agent。"]
+        profile = self.profile_source(agent_type) if self.profile_source else None
+        if profile:
+            if profile.get("role"):
+                lines.append(f"角色：{profile['role']}")
+            if profile.get("skills"):
+                lines.append(f"技能：{', '.join(profile['skills'])}")
+            if profile.get("description"):
+                lines.append(f"擅长：{profile['description']}")
+        return "\n".join(lines)
     
-    def _call_openai(self, system_prompt: str, user_prompt: str) -> List[Dict]:
-        """调用 OpenAI API"""
+    def _record_prompt(self, system_prompt: str, user_prompt: str):
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        with self._prompt_lock:
+            self.prompt_stats["calls"] += 1
+            self.prompt_stats["total_tokens"] += tokens
+            self.prompt_stats["max_tokens"] = max(self.prompt_stats["max_tokens"], tokens)
+            self.prompt_stats["last_tokens"] = tokens
+    
+    def _complete(self, system_prompt: str, user_prompt: str, use_cache: bool = True,
+                  stream: Optional[JSONArrayStream] = None, route: Optional[ModelRoute] = None,
+                  agent_type: Optional[str] = None, deadline: Optional[Deadline] = None,
+                  parse: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        经路由请求提供商并返回 parse(原始文本)（未传 parse 时返回原始文本；经过响应缓存）
+        
+        只有 parse 成功的响应才写入缓存；缓存中无法解析的响应被删除后重新请求。
+        缓存键按请求的主提供商计算，备用提供商的响应同样可以命中。
+        use_cache=False 时跳过读取，但仍写入最新响应。
+        传入 stream 时使用流式响应，文本边到达边送入解析器。
+        route 决定模型档位与输出 token 上限（默认 standard）。
+        agent_type 为遥测维度（任务分解为 decompose）。
+        deadline 的剩余时间作为请求超时，已截止或已取消时直接抛出。
+        """
+        if deadline:
+            deadline.check()
+        self._record_prompt(system_prompt, user_prompt)
+        if route is None:
+            route = ModelRoute(tier="standard", max_tokens=self.MAX_TOKENS, models={}, reasons=[])
+        model = self._model_for(self.provider, route)
+        key = LLMResponseCache.make_key(self.provider, model, system_prompt, user_prompt)
+        
+        record = self.telemetry.start(agent_type)
+        record.provider, record.model = self.provider, model
+        
+        if self.cache and use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    result = parse(cached) if parse else cached
+                except Exception as e:
+                    print(f"   ⚠️  缓存的响应无法解析，重新请求：{e}")
+                    self.cache.delete(key)
+                else:
+                    if stream:
+                        stream.feed(cached)
+                    self.telemetry.finish(record, cache_hit=True)
+                    return result
+        
+        router = self._get_router()
+        # 有备用提供商时少重试、尽快切换
+        max_retries = self.retry_policy.max_retries if len(router.providers) == 1 else 1
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=2000
+            provider, content = router.call(
+                lambda p: self._call_with_retry(p, system_prompt, user_prompt, max_retries, stream, route,
+                                                record, deadline),
+                hedge=stream is None
             )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # 提取 JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            subtasks = json.loads(content)
-            
-            # 确保格式正确
-            return self._validate_subtasks(subtasks)
-            
         except Exception as e:
-            print(f"OpenAI API 调用失败：{e}")
+            self.telemetry.finish(record, error=e)
             raise
+        
+        model = self._model_for(provider, route)
+        record.provider, record.model = provider, model
+        self.telemetry.finish(record)
+        
+        result = parse(content) if parse else content
+        if self.cache:
+            self.cache.put(key, content, {"provider": provider, "model": model, "tier": route["tier"]})
+        return result
     
-    def _call_anthropic(self, system_prompt: str, user_prompt: str) -> List[Dict]:
-        """调用 Anthropic API"""
-        try:
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=2000,
-                system=system_prompt,
-                messages=[
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            
-            content = response.content[0].text.strip()
-            
-            # 提取 JSON
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
-            subtasks = json.loads(content)
-            
-            # 确保格式正确
-            return self._validate_subtasks(subtasks)
+    def _call_with_retry(self, provider: str, system_prompt: str, user_prompt: str,
+                         max_retries: Optional[int] = None, stream: Optional[JSONArrayStream] = None,
+                         route: Optional[ModelRoute] = None, record: Optional[CallRecord] = None,
+                         deadline: Optional[Deadline] = None) -> str:
+        """
+        限流 + 重试地调用指定提供商（record 记录重试次数、首 token 时间与用量）
+        
+        有 deadline 时限流等待与退避都可被取消打断，等待会越过截止时间时直接放弃。
+        """
+        if max_retries is None:
+            max_retries = self.retry_policy.max_retries
+        max_tokens = route["max_tokens"] if route else self.MAX_TOKENS
+        model = self._model_for(provider, route)
+        limiter = get_rate_limiter(provider)
+        estimated = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + max_tokens
+        call = self.providers[provider].complete
+        if record:
+            stream = record.wrap_stream(stream)
+        sleep = deadline.sleep if deadline else time.sleep
+        
+        attempt = 0
+        while True:
+            limiter.acquire(estimated, sleep)
+            if stream:
+                stream.restart()
+            started = time.monotonic()
+            try:
+                content, usage = call(system_prompt, user_prompt, stream=stream, max_tokens=max_tokens,
+                                      model=model, deadline=deadline)
+            except (CallAborted, UnservableRequest):
+                raise
+            except Exception as e:
+                if deadline:
+                    deadline.check()
+                if attempt >= max_retries or not is_retryable(e):
+                    raise
+                retry_after = retry_after_seconds(e)
+                if is_throttle(e):
+                    limiter.throttled(retry_after)
+                delay = self.retry_policy.delay(attempt, retry_after)
+                attempt += 1
+                if record:
+                    record.retries += 1
+                print(f"   ⏳ {provider} 请求失败（{type(e).__name__}），"
+                      f"{delay:.1f}s 后重试 ({attempt}/{max_retries})")
+                sleep(delay)
+                continue
             
-        except Exception as e:
-            print(f"Anthropic API 调用失败：{e}")
+            actual = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+            limiter.settle(estimated, actual or None)
+            if record and not record.usage:
+                # 对冲请求共享同一记录，以先返回的为准
+                record.usage = usage
+            if self.cassette and provider != ReplayProvider.name:
+                first_token = record.first_token if record else None
+                self.cassette.record(
+                    system_prompt, user_prompt, content, usage, provider, model,
+                    latency=time.monotonic() - started,
+                    ttft=first_token - started if first_token and first_token >= started else None,
+                    stream=stream is not None
+                )
+            return content
+    
+    def _extract_json(self, content: str) -> Any:
+        """从响应文本中提取 JSON（兼容 ``` 代码块）"""
+        if "```json" in content:
+            content = content.split("```json")[1].split("```")[0].strip()
+        elif "```" in content:
+            content = content.split("```")[1].split("```")[0].strip()
+        
+        return json.loads(content)
+    
+    def _parse_json(self, content: str, agent_type: str, route: ModelRoute) -> Any:
+        """提取 JSON，失败时记录解析失败后抛出"""
+        try:
+            return self._extract_json(content)
+        except ValueError:
+            self.telemetry.count("parse_failures", self.provider, self._model_for(self.provider, route), agent_type)
             raise
     
+    def get_provider_stats(self) -> Dict:
+        """获取各提供商的熔断状态、延迟与对冲统计"""
+        if not self._has_client():
+            return {}
+        return self._get_router().get_stats()
+    
+    def get_rate_limit_stats(self) -> Dict:
+        """获取当前提供商的限流统计"""
+        return get_rate_limiter(self.provider).get_stats()
+    
+    def get_prompt_stats(self) -> Dict:
+        """获取提示词大小与上下文压缩统计（token 为估算值）"""
+        with self._prompt_lock:
+            stats: Dict[str, Any] = dict(self.prompt_stats)
+        stats["avg_tokens"] = round(stats["total_tokens"] / stats["calls"], 1) if stats["calls"] else 0.0
+        stats["context"] = self.compactor.get_stats()
+        return stats
+    
+    def get_cassette_stats(self) -> Dict:
+        """录制 / 回放统计（录制条数、回放命中与未命中）"""
+        stats = {}
+        if self.cassette:
+            stats["record"] = dict(self.cassette.stats, path=str(self.cassette.path))
+        replay = self.providers.get(ReplayProvider.name)
+        if isinstance(replay, ReplayProvider):
+            stats["replay"] = dict(replay.client.stats, path=str(replay.client.path),
+                                   latency_scale=replay.latency_scale)
+        return stats
+    
+    def get_prompt_cache_stats(self) -> Dict:
+        """
+        获取提示词前缀缓存统计
+        
+        Returns:
+            prefixes: 本地构建的不同前缀数与复用次数
+            hit_rate: 提供商侧缓存命中的调用占比
+            cached_ratio: 输入 token 中命中缓存的比例
+        """
+        with self._prompt_lock:
+            prefixes = dict(self.prefix_stats)
+        totals = (self.telemetry.snapshot([]) or [{}])[0]
+        calls = totals.get("input_tokens", {}).get("count", 0)
+        hits = totals.get("prompt_cache_hits", 0)
+        input_tokens = totals.get("input_tokens", {}).get("sum", 0)
+        cached_tokens = totals.get("cached_tokens", {}).get("sum", 0)
+        return {
+            "prefixes": prefixes,
+            "calls": calls,
+            "hits": hits,
+            "hit_rate": round(hits / calls, 3) if calls else 0.0,
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "cached_ratio": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0
+        }
+    
+    def get_inflight_stats(self) -> Dict:
+        """获取请求合并统计"""
+        return self.inflight.get_stats()
+    
+    def get_cache_stats(self) -> Dict:
+        """获取响应缓存统计"""
+        if not self.cache:
+            return {"enabled": False}
+        return dict(self.cache.get_stats(), enabled=True)
+    
     def _validate_subtasks(self, subtasks: List[Dict]) -> List[Dict]:
         """验证子任务格式"""
         validated = []
@@ -209,19 +672,15 @@ class LLMClient:
         return validated
     
     def _mock_decompose(self, task_desc: str) -> List[Dict]:
-        """模拟任务分解（fallback）"""
-        task_lower = task_desc.lower()
-        
-        if "社交媒体" in task_desc or "内容计划" in task_desc:
-            return self._decompose_social_media(task_desc)
-        elif "研究" in task_desc or "报告" in task_desc:
-            return self._decompose_research(task_desc)
-        elif "代码" in task_desc or "编程" in task_desc:
-            return self._decompose_coding(task_desc)
-        elif "网站" in task_desc or "开发" in task_desc:
-            return self._decompose_web_development(task_desc)
-        else:
-            return self._decompose_generic(task_desc)
+        """模拟任务分解（fallback），任务类型由关键词分类器决定"""
+        decomposers = {
+            "social_media": self._decompose_social_media,
+            "research": self._decompose_research,
+            "coding": self._decompose_coding,
+            "web_development": self._decompose_web_development
+        }
+        task_type = self.task_classifier.classify(task_desc)
+        return decomposers.get(task_type, self._decompose_generic)(task_desc)
     
     def _decompose_social_media(self, task_desc: str) -> List[Dict]:
         """社交媒体任务分解"""
@@ -446,7 +905,9 @@ class LLMClient:
             }
         ]
     
-    def execute_agent_task(self, agent_type: str, task_desc: str, context: Dict = None) -> Dict:
+    def execute_agent_task(self, agent_type: str, task_desc: str, context: Optional[Dict] = None,
+                           use_cache: bool = True, subtask: Optional[Dict] = None,
+                           deadline: Optional[Deadline] = None) -> Dict:
         """
         执行 Agent 任务
         
@@ -454,6 +915,9 @@ class LLMClient:
             agent_type: Agent 类型
             task_desc: 任务描述
             context: 上下文信息
+            use_cache: 是否使用响应缓存
+            subtask: 子任务（用于按 estimated_time / required_skills 选择模型档位）
+            deadline: 截止时间与取消信号
         
         Returns:
             执行结果
@@ -461,112 +925,210 @@ class LLMClient:
         print(f"   🤖 [{agent_type}] 执行：{task_desc[:50]}...")
         
         # 如果有真实 LLM，可以调用它生成内容
-        if self.provider in ["openai", "anthropic"] and self.api_key:
+        if self._is_live():
             try:
-                return self._llm_execute(agent_type, task_desc, context)
+                return self._llm_execute(agent_type, task_desc, context, use_cache=use_cache,
+                                         subtask=subtask, deadline=deadline)
+            except (CallAborted, UnservableRequest):
+                raise
             except Exception as e:
                 print(f"   ⚠️  LLM 执行失败：{e}")
+                print("   🔄 Fallback 到模拟执行")
+                self.telemetry.count("fallbacks", self.provider, "mock", agent_type)
         
         # Fallback 到模拟执行
         return self._mock_execute(agent_type, task_desc)
     
-    def _llm_execute(self, agent_type: str, task_desc: str, context: Dict = None) -> Dict:
+    def _llm_execute(self, agent_type: str, task_desc: str, context: Optional[Dict] = None,
+                     use_cache: bool = True, subtask: Optional[Dict] = None,
+                     deadline: Optional[Deadline] = None) -> Dict:
         """使用真实 LLM 执行任务"""
         
         # 构建提示词
-        system_prompt = f"""你是一个专业的 {agent_type} Agent。
-请根据任务描述完成工作，并返回结构化的结果。
-
-返回格式（JSON）：
-{{
-    "success": true/false,
-    "output": "任务输出的详细描述",
-    "execution_time": 执行时间（分钟）,
-    "artifacts": ["产出的文件列表"],
-    "logs": ["执行日志"],
-    "confidence": 置信度 (0.0-1.0)
-}}
-
-请确保输出专业、详细且可执行。"""
-
+        system_prompt = self._system_prompt("execute", agent_type)
         user_prompt = f"""请完成以下任务：
 
 任务描述：{task_desc}
-{'上下文：' + json.dumps(context, ensure_ascii=False) if context else ''}
+{self._render_context(context, task_desc)}
 
 请返回 JSON 格式的执行结果："""
 
-        if self.provider == "openai" and self.openai_client:
+        if not self._has_client():
+            return self._mock_execute(agent_type, task_desc)
+        
+        route = self.routing.route(agent_type, subtask, estimate_tokens(system_prompt) + estimate_tokens(user_prompt))
+        return self._complete(
+            system_prompt, user_prompt, use_cache=use_cache, route=route, agent_type=agent_type,
+            deadline=deadline,
+            parse=lambda content: self._normalize_result(self._parse_json(content, agent_type, route),
+                                                         agent_type, task_desc)
+        )
+    
+    # ========== 批量执行 ==========
+    
+    def execute_agent_batch(self, agent_type: str, task_descs: List[str], context: Optional[Dict] = None,
+                            use_cache: bool = True, subtasks: Optional[Sequence[Optional[Dict]]] = None,
+                            deadline: Optional[Deadline] = None) -> List[Dict]:
+        """
+        在一次调用中执行同一 Agent 的多个独立子任务
+        
+        Args:
+            agent_type: Agent 类型
+            task_descs: 子任务描述列表（彼此独立）
+            context: 上下文信息
+            use_cache: 是否使用响应缓存
+            subtasks: 与 task_descs 对应的子任务（用于模型路由）
+            deadline: 截止时间与取消信号
+        
+        Returns:
+            与 task_descs 顺序一致的执行结果
+        """
+        subtasks = subtasks or [None] * len(task_descs)
+        
+        def one_by_one() -> List[Dict]:
+            return [
+                self.execute_agent_task(agent_type, desc, context, use_cache=use_cache, subtask=st, deadline=deadline)
+                for desc, st in zip(task_descs, subtasks)
+            ]
+        
+        if len(task_descs) <= 1 or not self._is_live():
+            return one_by_one()
+        
+        print(f"   🤖 [{agent_type}] 批量执行 {len(task_descs)} 个子任务")
+        try:
+            results = self._llm_execute_batch(agent_type, task_descs, context, use_cache=use_cache,
+                                              subtasks=subtasks, deadline=deadline)
+        except (CallAborted, UnservableRequest):
+            raise
+        except Exception as e:
+            print(f"   ⚠️  批量响应无法拆分：{e}")
+            print("   🔄 Fallback 到逐个执行")
+            with self._prompt_lock:
+                self.batch_stats["fallbacks"] += 1
+            return one_by_one()
+        
+        with self._prompt_lock:
+            self.batch_stats["batches"] += 1
+            self.batch_stats["batched_subtasks"] += len(task_descs)
+        return results
+    
+    def _llm_execute_batch(self, agent_type: str, task_descs: List[str], context: Optional[Dict] = None,
+                           use_cache: bool = True, subtasks: Optional[Sequence[Optional[Dict]]] = None,
+                           deadline: Optional[Deadline] = None) -> List[Dict]:
+        """使用真实 LLM 批量执行，按 index 拆分响应"""
+        system_prompt = self._system_prompt("batch", agent_type)
+        tasks = "\n".join(f"{i}. {desc}" for i, desc in enumerate(task_descs, 1))
+        user_prompt = f"""请完成以下 {len(task_descs)} 个任务：
+
+{tasks}
+{self._render_context(context, task_descs[0])}
+
+请返回 JSON 数组格式的执行结果："""
+
+        if not self._has_client():
+            return [self._mock_execute(agent_type, desc) for desc in task_descs]
+        
+        prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        route = self.routing.combine([
+            self.routing.route(agent_type, st, prompt_tokens) for st in (subtasks or [None] * len(task_descs))
+        ])
+        
+        def parse(content: str) -> List[Dict]:
+            results = self._parse_json(content, agent_type, route)
             try:
-                response = self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=2000
-                )
-                
-                content = response.choices[0].message.content.strip()
-                result = json.loads(content)
-                
-                # 确保必要字段存在
-                if "success" not in result:
-                    result["success"] = True
-                if "output" not in result:
-                    result["output"] = f"[{agent_type}] 完成任务：{task_desc[:50]}"
-                if "execution_time" not in result:
-                    result["execution_time"] = 30
-                if "artifacts" not in result:
-                    result["artifacts"] = []
-                if "logs" not in result:
-                    result["logs"] = [f"执行 {task_desc[:30]}..."]
-                if "confidence" not in result:
-                    result["confidence"] = 0.9
-                
-                return result
-                
-            except Exception as e:
-                print(f"   ⚠️  LLM 执行失败：{e}")
-                print("   🔄 Fallback 到模拟执行")
-                return self._mock_execute(agent_type, task_desc)
+                return self._split_batch(results, agent_type, task_descs)
+            except ValueError:
+                self.telemetry.count("parse_failures", self.provider, self._model_for(self.provider, route), agent_type)
+                raise
+        
+        return self._complete(system_prompt, user_prompt, use_cache=use_cache, route=route,
+                              agent_type=agent_type, deadline=deadline, parse=parse)
+    
+    def _split_batch(self, results: Any, agent_type: str, task_descs: List[str]) -> List[Dict]:
+        """把批量响应拆分为逐个子任务的结果；数量或编号不符时抛出 ValueError"""
+        if not isinstance(results, list) or not all(isinstance(r, dict) for r in results):
+            raise ValueError("批量响应不是对象数组")
         
-        elif self.provider == "anthropic" and self.anthropic_client:
+        by_index = {}
+        for position, result in enumerate(results, 1):
             try:
-                response = self.anthropic_client.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=2000,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": user_prompt}]
-                )
-                
-                content = response.content[0].text.strip()
-                result = json.loads(content)
-                
-                # 确保必要字段存在
-                if "success" not in result:
-                    result["success"] = True
-                if "output" not in result:
-                    result["output"] = f"[{agent_type}] 完成任务：{task_desc[:50]}"
-                if "execution_time" not in result:
-                    result["execution_time"] = 30
-                if "artifacts" not in result:
-                    result["artifacts"] = []
-                if "logs" not in result:
-                    result["logs"] = [f"执行 {task_desc[:30]}..."]
-                if "confidence" not in result:
-                    result["confidence"] = 0.9
-                
-                return result
-                
-            except Exception as e:
-                print(f"   ⚠️  LLM 执行失败：{e}")
-                print("   🔄 Fallback 到模拟执行")
-                return self._mock_execute(agent_type, task_desc)
+                index = int(result.pop("index", position))
+            except (TypeError, ValueError):
+                index = position
+            by_index[index] = result
         
-        else:
-            return self._mock_execute(agent_type, task_desc)
+        if sorted(by_index) != list(range(1, len(task_descs) + 1)):
+            raise ValueError(f"批量响应包含 {len(results)} 个结果，期望 {len(task_descs)} 个")
+        
+        return [
+            self._normalize_result(by_index[i], agent_type, desc)
+            for i, desc in enumerate(task_descs, 1)
+        ]
+    
+    def get_routing_stats(self) -> Dict:
+        """获取模型路由统计（各档位调用次数与最近决策）"""
+        return self.routing.get_stats()
+    
+    def get_telemetry(self, group_by: Optional[List[str]] = None) -> List[Dict]:
+        """
+        获取调用遥测（计数与直方图）
+        
+        Args:
+            group_by: 聚合维度，provider / model / agent_type 的子集（默认全部）
+        """
+        if group_by is None:
+            return self.telemetry.snapshot()
+        return self.telemetry.snapshot(group_by)
+    
+    def get_batch_stats(self) -> Dict:
+        """获取批量执行统计"""
+        with self._prompt_lock:
+            return dict(self.batch_stats)
+    
+    # ========== 并发执行 ==========
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        并发提交一次调用（受当前 provider 的并发上限约束）
+        
+        例：llm.submit(llm.execute_agent_task, "apollo", "撰写文案", context=ctx)
+        """
+        return self.dispatcher.submit(self.provider, fn, *args, **kwargs)
+    
+    def map_agent_tasks(self, calls: List[Dict]) -> List[Dict]:
+        """
+        并发执行多个 Agent 任务，按输入顺序返回结果
+        
+        Args:
+            calls: [{"agent_type": ..., "task_desc": ..., "context": ...}, ...]
+        """
+        futures = [
+            self.submit(
+                self.execute_agent_task,
+                call["agent_type"],
+                call["task_desc"],
+                context=call.get("context")
+            )
+            for call in calls
+        ]
+        return [future.result() for future in futures]
+    
+    def _normalize_result(self, result: Dict, agent_type: str, task_desc: str) -> Dict:
+        """确保执行结果包含必要字段"""
+        if "success" not in result:
+            result["success"] = True
+        if "output" not in result:
+            result["output"] = f"[{agent_type}] 完成任务：{task_desc[:50]}"
+        if "execution_time" not in result:
+            result["execution_time"] = 30
+        if "artifacts" not in result:
+            result["artifacts"] = []
+        if "logs" not in result:
+            result["logs"] = [f"执行 {task_desc[:30]}..."]
+        if "confidence" not in result:
+            result["confidence"] = 0.9
+        
+        return result
     
     def _mock_execute(self, agent_type: str, task_desc: str) -> Dict:
         """模拟执行"""
@@ -594,88 +1156,6 @@ class LLMClient:
         }
 
 
-class ExecutionLogger:
-    """执行日志记录器"""
-    
-    def __init__(self, log_path: Path):
-        self.log_path = log_path
-        self.log_path.mkdir(parents=True, exist_ok=True)
-        print(f"📝 执行日志系统已初始化：{log_path}")
-    
-    def start_task(self, task_id: str, task_desc: str, claw_info: Dict):
-        log_entry = {
-            "event": "task_start",
-            "task_id": task_id,
-            "task_desc": task_desc,
-            "claw_info": claw_info,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def log_subtask_start(self, task_id: str, subtask: Dict, agent_id: str):
-        log_entry = {
-            "event": "subtask_start",
-            "subtask_id": subtask.get("subtask_id"),
-            "subtask_desc": subtask.get("desc"),
-            "agent_id": agent_id,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def log_subtask_complete(self, task_id: str, subtask_id: str, result: Dict):
-        log_entry = {
-            "event": "subtask_complete",
-            "subtask_id": subtask_id,
-            "result": result,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def log_decision(self, task_id: str, decision_type: str, decision: str, rationale: str):
-        log_entry = {
-            "event": "decision",
-            "decision_type": decision_type,
-            "decision": decision,
-            "rationale": rationale,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def log_exception(self, task_id: str, error: str, resolution: str = None):
-        log_entry = {
-            "event": "exception",
-            "error": error,
-            "resolution": resolution,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def complete_task(self, task_id: str, result: Dict, feedback: str = None):
-        log_entry = {
-            "event": "task_complete",
-            "result": result,
-            "feedback": feedback,
-            "timestamp": datetime.now().isoformat()
-        }
-        self._save_log(task_id, log_entry)
-    
-    def _save_log(self, task_id: str, log_entry: Dict):
-        log_file = self.log_path / f"{task_id}.jsonl"
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-    
-    def get_task_logs(self, task_id: str) -> List[Dict]:
-        log_file = self.log_path / f"{task_id}.jsonl"
-        if not log_file.exists():
-            return []
-        
-        logs = []
-        with open(log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                logs.append(json.loads(line))
-        return logs
-
-
 if __name__ == "__main__":
     # 测试 LLM 集成
     print("🧠 Olympus LLM Integration Test")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+🌊 Olympus LLM Pool - 并发调度与共享连接池
+
+- 进程级共享的 SDK 客户端：同一 provider + API key 只创建一个客户端，
+  多个 Hub / LLMClient 复用其 keep-alive 连接池
+- 进程级共享的线程池：submit/map 多个 Agent 调用，重叠网络等待
+- 每个 provider 独立的并发上限
+- 请求合并（single-flight）：相同键的并发调用只执行一次，其余调用等待并共享结果
+
+环境变量:
+    PROTEUS_LLM_CONCURRENCY: 每个 provider 的最大并发请求数 (default: 8)
+    PROTEUS_LLM_WORKERS: 调度线程数 (default: 32)
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_clients_lock = threading.Lock()
+_shared_clients: Dict[Tuple[str, str], Any] = {}
+
+_dispatcher_lock = threading.Lock()
+_dispatcher = None
+
+
+def get_shared_client(
+    provider: str, api_key: Optional[str], factory: Callable[[], Any]
+) -> Any:
+    """
+    获取进程内共享的 SDK 客户端
+
+    Args:
+        provider: 提供商名称
+        api_key: API key（只用其哈希作为键）
+        factory: 首次创建客户端的工厂函数
+    """
+    key = (provider, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest())
+    with _clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = factory()
+            _shared_clients[key] = client
+        return client
+
+
+class LLMDispatcher:
+    """
+    LLM 调用调度器
+
+    所有 LLMClient 共用一个线程池，按 provider 限制同时进行的请求数。
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        per_provider_limit: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or int(os.getenv("PROTEUS_LLM_WORKERS", "32"))
+        self.per_provider_limit = per_provider_limit or int(
+            os.getenv("PROTEUS_LLM_CONCURRENCY", "8")
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="olympus-llm"
+        )
+        self._limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._limits_lock = threading.Lock()
+        self._in_flight: Dict[str, int] = {}
+
+    def set_limit(self, provider: str, limit: int):
+        """设置某个 provider 的并发上限（对之后提交的调用生效）"""
+        with self._limits_lock:
+            self._limits[provider] = threading.BoundedSemaphore(limit)
+
+    def _semaphore(self, provider: str) -> threading.BoundedSemaphore:
+        with self._limits_lock:
+            if provider not in self._limits:
+                self._limits[provider] = threading.BoundedSemaphore(
+                    self.per_provider_limit
+                )
+            return self._limits[provider]
+
+    def submit(self, provider: str, fn: Callable, *args, **kwargs) -> Future:
+        """提交一次调用，返回 Future"""
+        semaphore = self._semaphore(provider)
+
+        def run():
+            with semaphore:
+                with self._limits_lock:
+                    self._in_flight[provider] = self._in_flight.get(provider, 0) + 1
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    with self._limits_lock:
+                        self._in_flight[provider] -= 1
+
+        return self._executor.submit(run)
+
+    def get_stats(self) -> Dict:
+        """当前各 provider 的在途请求数"""
+        with self._limits_lock:
+            return {
+                "max_workers": self.max_workers,
+                "per_provider_limit": self.per_provider_limit,
+                "in_flight": dict(self._in_flight),
+            }
+
+
+class SingleFlight:
+    """
+    请求合并
+
+    同一时刻相同 key 只有一个调用在执行（leader），
+    其余并发调用等待 leader 完成并共享其结果或异常。
+    调用完成后立即移除，不做缓存。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或等待相同 key 的在途调用
+
+        Returns:
+            (结果, 是否为共享结果)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self.stats["leaders"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
+
+
+def get_dispatcher() -> LLMDispatcher:
+    """获取进程内共享的调度器"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = LLMDispatcher()
+        return _dispatcher
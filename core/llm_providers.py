@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+🔌 Olympus LLM Providers - 提供商插件接口
+
+每个提供商实现 LLMProvider：
+- build_client(): 创建 SDK / HTTP 客户端（缺少依赖时抛出 ImportError）
+- complete(): 发送请求，返回统一格式的 (文本, {"input_tokens", "output_tokens", "cached_tokens"})
+  传入 stream 时使用流式响应，文本增量送入解析器；
+  input_tokens 为全部输入，cached_tokens 为其中命中提供商提示词缓存的部分；
+  传入 deadline 时以剩余时间作为请求超时，流式响应在块之间检查取消；
+  SDK 的普通请求无法从其他线程中止，有 deadline 时改用流式接口读取，取消时关闭响应；
+  请求本身无法完成（换提供商或重试也无济于事）时抛出 UnservableRequest
+
+内置提供商：
+- openai: OpenAI SDK
+- anthropic: Anthropic SDK
+- local: 任意 OpenAI 兼容的 HTTP 服务（如 scripts/llm_standin_server.py），
+  只依赖标准库，线程内复用 keep-alive 连接
+
+自定义提供商用 @register_provider 注册后即可通过 PROTEUS_LLM_PROVIDER 选择。
+
+环境变量:
+    PROTEUS_<PROVIDER>_MODEL: 覆盖默认模型
+    PROTEUS_LOCAL_BASE_URL: local 提供商地址 (default: http://127.0.0.1:8765/v1)
+    PROTEUS_LOCAL_API_KEY: local 提供商 API key（可选）
+    PROTEUS_LOCAL_TIMEOUT: local 提供商请求超时秒数 (default: 120)
+    PROTEUS_PROMPT_CACHE: on | off，Anthropic 系统提示词是否标记 cache_control (default: on)
+"""
+
+import http.client
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+from urllib.parse import urlparse
+
+from deadline import Deadline
+from llm_pool import get_shared_client
+
+_registry: Dict[str, Type["LLMProvider"]] = {}
+
+
+class UnservableRequest(Exception):
+    """请求本身无法完成（如回放磁带中没有该请求）：不重试、不计入熔断、不切换提供商、不 fallback"""
+
+
+def register_provider(cls: Type["LLMProvider"]) -> Type["LLMProvider"]:
+    """注册提供商插件（可用作装饰器）"""
+    _registry[cls.name] = cls
+    return cls
+
+
+def get_provider_class(name: str) -> Optional[Type["LLMProvider"]]:
+    return _registry.get(name)
+
+
+def available_providers() -> List[str]:
+    return list(_registry)
+
+
+def _usage(input_tokens: Any, output_tokens: Any, cached_tokens: Any = 0) -> Dict:
+    """统一 token 用量格式"""
+    return {
+        "input_tokens": input_tokens or 0,
+        "output_tokens": output_tokens or 0,
+        "cached_tokens": cached_tokens or 0,
+    }
+
+
+def _openai_usage(usage: Any) -> Dict:
+    """OpenAI 用量（自动前缀缓存的命中数在 prompt_tokens_details.cached_tokens）"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return _usage(
+        getattr(usage, "prompt_tokens", 0),
+        getattr(usage, "completion_tokens", 0),
+        getattr(details, "cached_tokens", 0),
+    )
+
+
+def _local_usage(usage: Optional[Dict]) -> Dict:
+    """OpenAI 兼容 HTTP 服务的用量（JSON 字典）"""
+    usage = usage or {}
+    return _usage(
+        usage.get("prompt_tokens"),
+        usage.get("completion_tokens"),
+        (usage.get("prompt_tokens_details") or {}).get("cached_tokens"),
+    )
+
+
+def _anthropic_usage(usage: Any) -> Dict:
+    """Anthropic 用量（input_tokens 不含缓存读写部分，这里合并为全部输入）"""
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return _usage(
+        (getattr(usage, "input_tokens", 0) or 0) + cache_read + cache_write,
+        getattr(usage, "output_tokens", 0),
+        cache_read,
+    )
+
+
+class LLMProvider:
+    """提供商插件基类"""
+
+    name = ""
+    label = ""
+    default_model = ""
+    api_key_env: Optional[str] = None
+    requires_key = True
+    # 响应是否写入 LLMClient 的响应缓存（回放类提供商关闭）
+    cache_responses = True
+
+    def __init__(self, client: Any = None, model: Optional[str] = None):
+        self.client = client
+        self.model: str = (
+            model
+            or os.getenv(f"PROTEUS_{self.name.upper()}_MODEL")
+            or self.default_model
+        )
+
+    @classmethod
+    def api_key_from_env(cls) -> Optional[str]:
+        return os.getenv(cls.api_key_env) if cls.api_key_env else None
+
+    @classmethod
+    def create(cls, api_key: Optional[str] = None) -> "LLMProvider":
+        """创建（或复用进程内共享的）客户端并返回提供商实例"""
+        return cls(
+            client=get_shared_client(
+                cls.name, api_key, lambda: cls.build_client(api_key)
+            )
+        )
+
+    @classmethod
+    def build_client(cls, api_key: Optional[str] = None) -> Any:
+        raise NotImplementedError
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: Any = None,
+        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, Dict]:
+        """
+        发送一次请求
+
+        Args:
+            system_prompt: 系统提示词
+            user_prompt: 用户提示词
+            stream: 流式解析器（提供 feed(text)），为 None 时使用普通请求
+            max_tokens: 输出 token 上限
+            model: 本次调用使用的模型（默认 self.model）
+            deadline: 截止时间（剩余时间作为请求超时，取消时尽快中止）
+
+        Returns:
+            (响应文本, token 用量)
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _consume(
+        chunks: Any,
+        deadline: Optional[Deadline] = None,
+        close: Optional[Callable[[], Any]] = None,
+    ) -> Iterator[Any]:
+        """逐块读取 SDK 流式响应；取消时关闭响应（默认 chunks.close），块之间检查截止时间"""
+        close = close or getattr(chunks, "close", None)
+        unregister = deadline.on_cancel(close) if deadline and close else None
+        try:
+            for chunk in chunks:
+                if deadline:
+                    deadline.check()
+                yield chunk
+            if deadline and deadline.cancelled:
+                # 被取消回调关闭的响应可能正常结束，不能当作完整响应返回
+                deadline.check()
+        except Exception:
+            if deadline:
+                deadline.check()
+            raise
+        finally:
+            if unregister:
+                unregister()
+
+
+@register_provider
+class OpenAIProvider(LLMProvider):
+    """OpenAI Chat Completions"""
+
+    name = "openai"
+    label = "OpenAI"
+    default_model = "gpt-4o"
+    api_key_env = "OPENAI_API_KEY"
+
+    @classmethod
+    def build_client(cls, api_key: Optional[str] = None) -> Any:
+        try:
+            import openai
+        except ImportError:
+            raise ImportError("openai 包未安装")
+        return openai.OpenAI(api_key=api_key, max_retries=0)
+
+    def _request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        model: Optional[str] = None,
+    ) -> Dict:
+        return {
+            "model": model or self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens,
+        }
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: Any = None,
+        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, Dict]:
+        request = self._request(system_prompt, user_prompt, max_tokens, model)
+        if deadline:
+            # 不限时的 deadline 不传 timeout，保留 SDK 自带的默认超时（传 None 会关闭它）
+            timeout = deadline.timeout()
+            if timeout is not None:
+                request["timeout"] = timeout
+        try:
+            if stream or deadline:
+                # 有 deadline 的普通请求也走流式接口，取消时可以关闭响应、释放调度名额
+                return self._complete_stream(request, stream, deadline)
+            response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            print(f"{self.label} API 调用失败：{e}")
+            raise
+
+        return response.choices[0].message.content.strip(), _openai_usage(
+            getattr(response, "usage", None)
+        )
+
+    def _complete_stream(
+        self, request: Dict, stream: Any = None, deadline: Optional[Deadline] = None
+    ) -> Tuple[str, Dict]:
+        chunks = self.client.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        parts = []
+        usage = None
+        for chunk in self._consume(chunks, deadline):
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if stream:
+                    stream.feed(delta)
+
+        return "".join(parts).strip(), _openai_usage(usage)
+
+
+@register_provider
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages"""
+
+    name = "anthropic"
+    label = "Anthropic"
+    default_model = "claude-3-5-sonnet-20241022"
+    api_key_env = "ANTHROPIC_API_KEY"
+
+    @classmethod
+    def build_client(cls, api_key: Optional[str] = None) -> Any:
+        try:
+            import anthropic
+        except ImportError:
+            raise ImportError("anthropic 包未安装")
+        return anthropic.Anthropic(api_key=api_key, max_retries=0)
+
+    def __init__(self, client: Any = None, model: Optional[str] = None):
+        super().__init__(client, model)
+        self.prompt_cache = os.getenv("PROTEUS_PROMPT_CACHE", "on").lower() not in (
+            "0",
+            "off",
+            "false",
+            "no",
+        )
+
+    def _system(self, system_prompt: str) -> Any:
+        """系统提示词标记为可缓存前缀（短于模型最小缓存长度时提供商会忽略标记）"""
+        if not self.prompt_cache:
+            return system_prompt
+        return [
+            {
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: Any = None,
+        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, Dict]:
+        request = {
+            "model": model or self.model,
+            "max_tokens": max_tokens,
+            "system": self._system(system_prompt),
+            "messages": [{"role": "user", "content": user_prompt}],
+        }
+        if deadline:
+            # 不限时的 deadline 不传 timeout，保留 SDK 自带的默认超时（传 None 会关闭它）
+            timeout = deadline.timeout()
+            if timeout is not None:
+                request["timeout"] = timeout
+        try:
+            if stream or deadline:
+                # 有 deadline 的普通请求也走流式接口，取消时可以关闭响应、释放调度名额
+                return self._complete_stream(request, stream, deadline)
+            response = self.client.messages.create(**request)
+        except Exception as e:
+            print(f"{self.label} API 调用失败：{e}")
+            raise
+
+        return response.content[0].text.strip(), _anthropic_usage(
+            getattr(response, "usage", None)
+        )
+
+    def _complete_stream(
+        self, request: Dict, stream: Any = None, deadline: Optional[Deadline] = None
+    ) -> Tuple[str, Dict]:
+        parts = []
+        with self.client.messages.stream(**request) as response:
+            # text_stream 是生成器，不能从其他线程关闭；取消时关闭底层响应
+            for text in self._consume(
+                response.text_stream, deadline, close=getattr(response, "close", None)
+            ):
+                parts.append(text)
+                if stream:
+                    stream.feed(text)
+            usage = getattr(response.get_final_message(), "usage", None)
+
+        return "".join(parts).strip(), _anthropic_usage(usage)
+
+
+# ========== 本地 OpenAI 兼容 HTTP 提供商 ==========
+
+
+class LocalHTTPError(Exception):
+    """HTTP 错误响应（与 SDK 异常一样带 status_code 与 response.headers，便于重试判断）"""
+
+    def __init__(self, status_code: int, headers: Any, body: str):
+        super().__init__(f"HTTP {status_code}: {body[:200]}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+
+class LocalConnectionError(Exception):
+    """连接失败"""
+
+
+class LocalTimeoutError(Exception):
+    """请求超时"""
+
+
+class LocalHTTPClient:
+    """
+    最小的 OpenAI 兼容 HTTP 客户端（仅标准库）
+
+    每个线程持有一个 keep-alive 连接，连接被服务端关闭时自动重连一次。
+    传入 deadline 时以剩余时间作为套接字超时，取消时关闭套接字使阻塞的读取立即返回。
+    """
+
+    def __init__(
+        self, base_url: str, api_key: Optional[str] = None, timeout: float = 120.0
+    ):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port
+        self.path = parsed.path.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if self.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        # 只关闭套接字，保留连接对象（下次请求自动重连，取消回调持有的引用仍然有效）
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _abort(conn: http.client.HTTPConnection):
+        sock = conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @contextmanager
+    def _guard(self, deadline: Optional[Deadline] = None):
+        """设置本次请求的超时，注册取消回调；中止后统一抛出 Cancelled / DeadlineExceeded"""
+        conn = self._connection()
+        timeout = deadline.timeout(self.timeout) if deadline else self.timeout
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        unregister = deadline.on_cancel(lambda: self._abort(conn)) if deadline else None
+        try:
+            yield
+            if deadline:
+                deadline.check()
+        except Exception:
+            if deadline and (deadline.cancelled or deadline.expired):
+                self._reset()
+                deadline.check()
+            raise
+        finally:
+            if unregister:
+                unregister()
+
+    def _post(
+        self, endpoint: str, payload: Dict, deadline: Optional[Deadline] = None
+    ) -> http.client.HTTPResponse:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", self.path + endpoint, body=body, headers=headers)
+                if deadline and deadline.cancelled:
+                    # 取消发生在连接建立之前，取消回调没有可关闭的套接字
+                    self._reset()
+                    deadline.check()
+                response = conn.getresponse()
+                break
+            except socket.timeout as e:
+                self._reset()
+                raise LocalTimeoutError(str(e))
+            except (
+                http.client.RemoteDisconnected,
+                ConnectionResetError,
+                BrokenPipeError,
+            ) as e:
+                # keep-alive 连接被服务端关闭，重连重试一次（被取消回调关闭的不重连）
+                self._reset()
+                if attempt or (deadline and deadline.cancelled):
+                    raise LocalConnectionError(str(e))
+            except OSError as e:
+                self._reset()
+                raise LocalConnectionError(str(e))
+
+        if response.status >= 400:
+            text = response.read().decode("utf-8", errors="replace")
+            raise LocalHTTPError(response.status, response.headers, text)
+        return response
+
+    def chat(self, payload: Dict, deadline: Optional[Deadline] = None) -> Dict:
+        with self._guard(deadline):
+            response = self._post("/chat/completions", payload, deadline)
+            try:
+                return json.loads(response.read().decode("utf-8"))
+            except socket.timeout as e:
+                self._reset()
+                raise LocalTimeoutError(str(e))
+
+    def chat_stream(
+        self, payload: Dict, deadline: Optional[Deadline] = None
+    ) -> Iterator[Dict]:
+        """按 SSE 逐条产出 chunk"""
+        with self._guard(deadline):
+            response = self._post(
+                "/chat/completions", dict(payload, stream=True), deadline
+            )
+            try:
+                while True:
+                    line = response.readline()
+                    if not line:
+                        break
+                    text = line.decode("utf-8").strip()
+                    if not text.startswith("data:"):
+                        continue
+                    data = text[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    yield json.loads(data)
+            except socket.timeout as e:
+                self._reset()
+                raise LocalTimeoutError(str(e))
+            finally:
+                # 读完剩余内容，连接才能复用（已中止的连接直接关闭）
+                try:
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    self._reset()
+
+
+@register_provider
+class LocalProvider(LLMProvider):
+    """本地 OpenAI 兼容 HTTP 服务"""
+
+    name = "local"
+    label = "Local"
+    default_model = "standin"
+    api_key_env = "PROTEUS_LOCAL_API_KEY"
+    requires_key = False
+
+    @classmethod
+    def build_client(cls, api_key: Optional[str] = None) -> Any:
+        return LocalHTTPClient(
+            os.getenv("PROTEUS_LOCAL_BASE_URL", "http://127.0.0.1:8765/v1"),
+            api_key=api_key,
+            timeout=float(os.getenv("PROTEUS_LOCAL_TIMEOUT", "120")),
+        )
+
+    @classmethod
+    def create(cls, api_key: Optional[str] = None) -> "LLMProvider":
+        # 同一 key 可能指向不同地址，按地址区分共享客户端
+        base_url = os.getenv("PROTEUS_LOCAL_BASE_URL", "http://127.0.0.1:8765/v1")
+        return cls(
+            client=get_shared_client(
+                f"{cls.name}:{base_url}", api_key, lambda: cls.build_client(api_key)
+            )
+        )
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        stream: Any = None,
+        max_tokens: int = 2000,
+        model: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Tuple[str, Dict]:
+        payload = {
+            "model": model or self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens,
+        }
+        if not stream:
+            response = self.client.chat(payload, deadline)
+            return response["choices"][0]["message"]["content"].strip(), _local_usage(
+                response.get("usage")
+            )
+
+        parts = []
+        usage: Dict = {}
+        for chunk in self.client.chat_stream(
+            dict(payload, stream_options={"include_usage": True}), deadline
+        ):
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices", []):
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    stream.feed(delta)
+        return "".join(parts).strip(), _local_usage(usage)
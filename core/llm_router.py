@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+🔀 Olympus LLM Router - 多提供商路由、熔断与对冲请求
+
+- 每个提供商一个熔断器：连续失败达到阈值后打开，冷却后半开试探
+- 记录每个提供商最近的调用延迟（p50 / p95）
+- 对冲请求：主提供商 p95 超过阈值时，若主请求在阈值内未返回，
+  同时向下一个提供商发出请求，采用先返回的有效结果
+- 主提供商失败或熔断时按顺序切换到备用提供商
+- 截止或取消（CallAborted）与无法完成的请求（UnservableRequest）不计入熔断，也不切换提供商
+
+环境变量:
+    PROTEUS_LLM_PROVIDERS: 提供商顺序，如 "anthropic,openai"（第一个为主提供商）
+    PROTEUS_LLM_HEDGE_AFTER: 对冲阈值（秒），不设置则关闭对冲
+    PROTEUS_LLM_BREAKER_FAILURES: 熔断失败次数阈值 (default: 5)
+    PROTEUS_LLM_BREAKER_RESET: 熔断冷却秒数 (default: 30)
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from deadline import CallAborted
+from llm_providers import UnservableRequest
+
+_hedge_executor_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    """对冲请求使用独立线程池，避免与调度线程池互相等待"""
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=16, thread_name_prefix="olympus-hedge"
+            )
+        return _hedge_executor
+
+
+class ProvidersUnavailable(Exception):
+    """所有提供商都处于熔断状态或调用失败"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    closed → (连续失败 failure_threshold 次) → open
+    open → (冷却 reset_timeout 秒) → half_open（放行一个试探请求）
+    half_open → 成功则 closed，失败则重新 open
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否允许发出请求"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if (
+                self.state == "open"
+                and time.monotonic() - self.opened_at >= self.reset_timeout
+            ):
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """滑动窗口延迟统计"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class ProviderRouter:
+    """多提供商路由器"""
+
+    def __init__(
+        self,
+        providers: List[str],
+        hedge_after: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        reset_timeout: Optional[float] = None,
+    ):
+        hedge_env = os.getenv("PROTEUS_LLM_HEDGE_AFTER")
+        if hedge_after is None and hedge_env:
+            hedge_after = float(hedge_env)
+        failure_threshold = failure_threshold or int(
+            os.getenv("PROTEUS_LLM_BREAKER_FAILURES", "5")
+        )
+        reset_timeout = reset_timeout or float(
+            os.getenv("PROTEUS_LLM_BREAKER_RESET", "30")
+        )
+
+        self.providers = list(providers)
+        self.hedge_after = hedge_after
+        self.breakers = {
+            p: CircuitBreaker(failure_threshold, reset_timeout) for p in self.providers
+        }
+        self.latencies = {p: LatencyTracker() for p in self.providers}
+        self._lock = threading.Lock()
+        self.stats = {
+            p: {"calls": 0, "failures": 0, "hedged": 0, "hedge_wins": 0}
+            for p in self.providers
+        }
+
+    def _count(self, provider: str, key: str):
+        with self._lock:
+            self.stats[provider][key] += 1
+
+    def _timed(self, provider: str, fn: Callable[[str], Any]) -> Any:
+        """执行一次调用并更新熔断器与延迟统计"""
+        self._count(provider, "calls")
+        started = time.monotonic()
+        try:
+            result = fn(provider)
+        except (CallAborted, UnservableRequest):
+            # 调用方放弃等待或请求本身无法完成，不代表提供商故障；释放半开试探名额
+            self.breakers[provider].release_probe()
+            raise
+        except Exception:
+            self.breakers[provider].record_failure()
+            self._count(provider, "failures")
+            raise
+        self.latencies[provider].record(time.monotonic() - started)
+        self.breakers[provider].record_success()
+        return result
+
+    def _should_hedge(self, provider: str) -> bool:
+        if self.hedge_after is None:
+            return False
+        p95 = self.latencies[provider].percentile(95)
+        return p95 is not None and p95 > self.hedge_after
+
+    def _next_available(self, remaining: List[str]) -> Optional[str]:
+        """从剩余提供商中取出下一个熔断器放行的提供商"""
+        while remaining:
+            provider = remaining.pop(0)
+            if self.breakers[provider].allow():
+                return provider
+        return None
+
+    def call(self, fn: Callable[[str], Any], hedge: bool = True) -> Tuple[str, Any]:
+        """
+        按路由策略执行 fn(provider)
+
+        Args:
+            fn: 调用函数
+            hedge: 是否允许对冲（流式调用共享同一个解析器，需要关闭）
+
+        Returns:
+            (实际返回结果的提供商, 结果)
+        """
+        remaining = list(self.providers)
+        last_error: Optional[Exception] = None
+        attempted = False
+
+        while True:
+            primary = self._next_available(remaining)
+            if primary is None:
+                break
+            attempted = True
+
+            try:
+                if hedge and remaining and self._should_hedge(primary):
+                    return self._hedged_call(primary, remaining, fn)
+                return primary, self._timed(primary, fn)
+            except (CallAborted, UnservableRequest):
+                raise
+            except Exception as e:
+                last_error = e
+                if remaining:
+                    print(f"   🔀 {primary} 调用失败，切换到 {remaining[0]}")
+
+        if not attempted:
+            raise ProvidersUnavailable("所有 LLM 提供商均处于熔断状态")
+        raise ProvidersUnavailable(
+            f"所有 LLM 提供商调用失败：{last_error}"
+        ) from last_error
+
+    def _hedged_call(
+        self, primary: str, remaining: List[str], fn: Callable[[str], Any]
+    ) -> Tuple[str, Any]:
+        """主请求超过 hedge_after 未返回时，向备用提供商发出对冲请求"""
+        executor = _get_hedge_executor()
+        futures: Dict[Future, str] = {
+            executor.submit(self._timed, primary, fn): primary
+        }
+        pending = set(futures)
+
+        def launch_backup() -> Optional[str]:
+            backup = self._next_available(remaining)
+            if backup:
+                future = executor.submit(self._timed, backup, fn)
+                futures[future] = backup
+                pending.add(future)
+            return backup
+
+        done, _ = wait(pending, timeout=self.hedge_after)
+        backup = None
+        if not done:
+            backup = launch_backup()
+            if backup:
+                self._count(primary, "hedged")
+
+        last_error: Optional[Exception] = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                provider = futures[future]
+                try:
+                    result = future.result()
+                except (CallAborted, UnservableRequest):
+                    raise
+                except Exception as e:
+                    last_error = e
+                    # 主请求在对冲前就失败时，立即改用备用提供商
+                    if provider == primary and backup is None:
+                        backup = launch_backup()
+                    continue
+                if provider != primary:
+                    self._count(provider, "hedge_wins")
+                return provider, result
+
+        # 所有请求都已失败
+        assert last_error is not None
+        raise last_error
+
+    def get_stats(self) -> Dict:
+        """各提供商的熔断状态、延迟与调用计数"""
+        with self._lock:
+            counters = {p: dict(c) for p, c in self.stats.items()}
+        return {
+            p: dict(
+                counters[p],
+                state=self.breakers[p].state,
+                p50=self.latencies[p].percentile(50),
+                p95=self.latencies[p].percentile(95),
+            )
+            for p in self.providers
+        }
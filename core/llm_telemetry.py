@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+📈 Olympus LLM Telemetry - LLM 调用遥测
+
+按 (provider, model, agent_type) 记录每次调用：
+- 直方图：耗时、首 token 时间、输入 / 输出 / 命中提示词缓存的 token、费用（美元）
+- 计数：调用、缓存命中、提示词缓存命中、重试、失败、fallback、解析失败
+
+直方图使用固定桶，可以跨维度合并；snapshot(group_by) 按任意维度聚合，
+export() 写出 JSON 供容量规划与慢 Agent 排查。
+
+环境变量:
+    PROTEUS_LLM_PRICES: 价格表 JSON 文件（模型 -> [输入, 输出, 缓存输入] 美元/百万 token，
+                        缓存输入可省略，默认按输入价格计），覆盖默认价格
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+INF = float("inf")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, INF)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, INF)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, INF)
+
+# 美元 / 百万 token（输入, 输出, 命中提示词缓存的输入）
+DEFAULT_PRICES = {
+    "gpt-4o": (2.5, 10.0, 1.25),
+    "gpt-4o-mini": (0.15, 0.6, 0.075),
+    "claude-3-5-sonnet-20241022": (3.0, 15.0, 0.3),
+    "claude-3-5-haiku-20241022": (0.8, 4.0, 0.08),
+}
+
+DIMENSIONS = ("provider", "model", "agent_type")
+COUNTERS = (
+    "calls",
+    "cache_hits",
+    "prompt_cache_hits",
+    "retries",
+    "errors",
+    "fallbacks",
+    "parse_failures",
+)
+HISTOGRAMS = {
+    "wall_time": LATENCY_BUCKETS,
+    "ttft": LATENCY_BUCKETS,
+    "input_tokens": TOKEN_BUCKETS,
+    "output_tokens": TOKEN_BUCKETS,
+    "cached_tokens": TOKEN_BUCKETS,
+    "cost_usd": COST_BUCKETS,
+}
+
+
+class Histogram:
+    """固定桶直方图"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * len(self.bounds)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value: float):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "Histogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and other.max is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """按桶上界估算分位数（不超过观测最大值）"""
+        if not self.count or self.max is None:
+            return None
+        target = p / 100.0 * self.count
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "buckets": {
+                ("+Inf" if b == INF else str(b)): n
+                for b, n in zip(self.bounds, self.counts)
+            },
+        }
+
+
+class _Series:
+    """一组维度下的计数与直方图"""
+
+    def __init__(self):
+        self.counters = {name: 0 for name in COUNTERS}
+        self.histograms = {
+            name: Histogram(bounds) for name, bounds in HISTOGRAMS.items()
+        }
+
+    def merge(self, other: "_Series"):
+        for name, n in other.counters.items():
+            self.counters[name] += n
+        for name, hist in other.histograms.items():
+            self.histograms[name].merge(hist)
+
+
+class CallRecord:
+    """一次 LLM 调用的遥测记录（跨重试与提供商切换）"""
+
+    def __init__(self, telemetry: "LLMTelemetry", agent_type: Optional[str]):
+        self.telemetry = telemetry
+        self.agent_type = agent_type
+        self.started = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.retries = 0
+        self.provider: Optional[str] = None
+        self.model: Optional[str] = None
+        self.usage: Dict = {}
+
+    def mark_first_token(self):
+        if self.first_token is None:
+            self.first_token = time.monotonic()
+
+    def wrap_stream(self, stream: Any) -> Any:
+        """包装流式解析器，记录首个文本块到达的时间"""
+        return _TimedStream(stream, self) if stream is not None else None
+
+
+class _TimedStream:
+    def __init__(self, stream: Any, record: CallRecord):
+        self._stream = stream
+        self._record = record
+
+    def feed(self, text: str):
+        if text:
+            self._record.mark_first_token()
+        return self._stream.feed(text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class LLMTelemetry:
+    """进程内 LLM 调用遥测"""
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, ...]]] = None):
+        self.prices: Dict[str, Tuple[float, ...]] = dict(DEFAULT_PRICES)
+        path = os.getenv("PROTEUS_LLM_PRICES")
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.prices.update({k: tuple(v) for k, v in json.load(f).items()})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 价格表读取失败 {path}: {e}")
+        self.prices.update(prices or {})
+
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], _Series] = {}
+
+    def _get(
+        self, provider: Optional[str], model: Optional[str], agent_type: Optional[str]
+    ) -> _Series:
+        key = (provider or "unknown", model or "unknown", agent_type or "unknown")
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series()
+        return series
+
+    def start(self, agent_type: Optional[str]) -> CallRecord:
+        return CallRecord(self, agent_type)
+
+    def cost(
+        self,
+        model: Optional[str],
+        input_tokens: int,
+        output_tokens: int,
+        cached_tokens: int = 0,
+    ) -> Optional[float]:
+        """估算费用；input_tokens 包含命中缓存的部分"""
+        price = self.prices.get(model) if model else None
+        if not price:
+            return None
+        cached_price = price[2] if len(price) > 2 else price[0]
+        return (
+            (input_tokens - cached_tokens) * price[0]
+            + cached_tokens * cached_price
+            + output_tokens * price[1]
+        ) / 1_000_000
+
+    def finish(
+        self,
+        record: CallRecord,
+        error: Optional[Exception] = None,
+        cache_hit: bool = False,
+    ):
+        """记录一次调用结束（成功、缓存命中或最终失败）"""
+        now = time.monotonic()
+        with self._lock:
+            series = self._get(record.provider, record.model, record.agent_type)
+            series.counters["calls"] += 1
+            series.counters["retries"] += record.retries
+            if cache_hit:
+                series.counters["cache_hits"] += 1
+                return
+            if error is not None:
+                series.counters["errors"] += 1
+                return
+
+            series.histograms["wall_time"].record(now - record.started)
+            # 非流式调用没有首 token 时间，不计入 ttft（否则记录的是整次耗时）
+            if record.first_token is not None:
+                series.histograms["ttft"].record(record.first_token - record.started)
+            input_tokens = record.usage.get("input_tokens", 0)
+            output_tokens = record.usage.get("output_tokens", 0)
+            cached_tokens = record.usage.get("cached_tokens", 0)
+            if input_tokens or output_tokens:
+                series.histograms["input_tokens"].record(input_tokens)
+                series.histograms["output_tokens"].record(output_tokens)
+                series.histograms["cached_tokens"].record(cached_tokens)
+                if cached_tokens:
+                    series.counters["prompt_cache_hits"] += 1
+                cost = self.cost(
+                    record.model, input_tokens, output_tokens, cached_tokens
+                )
+                if cost is not None:
+                    series.histograms["cost_usd"].record(cost)
+
+    def count(self, event: str, provider: str, model: str, agent_type: str, n: int = 1):
+        """记录 fallback / parse_failures 等事件"""
+        with self._lock:
+            self._get(provider, model, agent_type).counters[event] += n
+
+    def snapshot(self, group_by: Sequence[str] = DIMENSIONS) -> List[Dict]:
+        """
+        按维度聚合
+
+        Args:
+            group_by: provider / model / agent_type 的任意子集（空序列为总计）
+        """
+        indexes = [DIMENSIONS.index(d) for d in group_by]
+        groups: Dict[Tuple, _Series] = {}
+        with self._lock:
+            for key, series in self._series.items():
+                group = tuple(key[i] for i in indexes)
+                merged = groups.get(group)
+                if merged is None:
+                    merged = groups[group] = _Series()
+                merged.merge(series)
+
+        rows = []
+        for group, series in sorted(groups.items()):
+            row = dict(zip(group_by, group))
+            row.update(series.counters)
+            row.update(
+                {name: hist.to_dict() for name, hist in series.histograms.items()}
+            )
+            rows.append(row)
+        return rows
+
+    def export(self, path: Path, group_by: Sequence[str] = DIMENSIONS) -> Path:
+        """写出 JSON 快照"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "exported_at": datetime.now().isoformat(),
+                    "group_by": list(group_by),
+                    "series": self.snapshot(group_by),
+                },
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
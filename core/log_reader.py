@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+🔎 Proteus Log Reader - 流式读取 JSONL 日志
+
+- iter_lines(): 逐行读取，不把整个文件读入内存
+- reverse_lines(): 从文件末尾按块反向读取，tail(n) 只读最后几块
+- LogFilter: 事件类型 / 时间范围过滤；事件类型先在原始字节上粗筛，
+  不可能匹配的行不做 JSON 解析
+- open_log(): 透明读取 gzip / zstd 压缩的轮转段（见 log_rotation）；
+  传入未压缩的路径时，文件若已被后台压缩则自动改读压缩后的文件
+
+时间范围为 [since, until)，可以是 datetime 或 ISO 格式字符串（与日志中的 timestamp 同格式比较）。
+
+日志组件（写入线程、后台维护）的故障统一经 warn_once() 以 LogWarning 发出，
+同一类故障只警告一次，可用 warnings 过滤器屏蔽或升级为异常。
+"""
+
+import gzip
+import io
+import json
+import threading
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Set, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TimeBound = Union[datetime, str, None]
+
+BLOCK_SIZE = 8192
+
+# 压缩方式 -> 文件后缀
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+
+class LogWarning(RuntimeWarning):
+    """日志写入 / 维护失败"""
+
+
+_warned: Set[str] = set()
+_warned_lock = threading.Lock()
+
+
+def warn_once(kind: str, message: str):
+    """发出 LogWarning；同一 kind 只发出一次（之后的失败计入各组件的 errors 统计）"""
+    with _warned_lock:
+        if kind in _warned:
+            return
+        _warned.add(kind)
+    warnings.warn(message, LogWarning, stacklevel=2)
+
+
+def _iso(value: TimeBound) -> Optional[str]:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def is_compressed(path: Path) -> bool:
+    return path.suffix in COMPRESSED_SUFFIXES.values()
+
+
+def resolve_log(path: Path) -> Optional[Path]:
+    """实际存在的文件：原路径，或后台压缩后的 .gz / .zst"""
+    path = Path(path)
+    candidates = (
+        [path]
+        if is_compressed(path)
+        else [path]
+        + [
+            path.with_name(path.name + suffix)
+            for suffix in COMPRESSED_SUFFIXES.values()
+        ]
+    )
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def open_log(path: Path) -> io.BufferedIOBase:
+    """以二进制只读方式打开日志（压缩文件透明解压）；不存在时抛出 FileNotFoundError"""
+    for _ in range(2):
+        resolved = resolve_log(path)
+        if resolved is None:
+            break
+        try:
+            if resolved.suffix == ".gz":
+                return gzip.open(resolved, "rb")
+            if resolved.suffix == ".zst":
+                if zstandard is None:
+                    raise ImportError(
+                        f"读取 {resolved.name} 需要 zstandard 库：pip install zstandard"
+                    )
+                return io.BufferedReader(
+                    zstandard.ZstdDecompressor().stream_reader(open(resolved, "rb"))
+                )
+            return open(resolved, "rb")
+        except FileNotFoundError:
+            # 解析之后恰好被压缩替换，重新解析一次
+            continue
+    raise FileNotFoundError(str(path))
+
+
+def iter_lines(path: Path) -> Iterator[bytes]:
+    """逐行读取（跳过末尾不完整的行）"""
+    try:
+        f = open_log(path)
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if line.endswith(b"\n"):
+                yield line
+
+
+def reverse_lines(path: Path, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """从文件末尾开始逐行反向读取（跳过末尾不完整的行；压缩文件整段解压后反向）"""
+    resolved = resolve_log(path)
+    if resolved is None:
+        return
+    try:
+        if is_compressed(resolved):
+            raise FileNotFoundError(str(resolved))
+        f = open(resolved, "rb")
+    except FileNotFoundError:
+        # 压缩文件不能按块向前 seek，整段解压后反向
+        yield from reversed(list(iter_lines(path)))
+        return
+    with f:
+        position = f.seek(0, 2)
+        buffer = b""
+        trailing = True  # 最后一个换行符之后的内容（空或写了一半的行）尚未丢弃
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            lines = (f.read(step) + buffer).split(b"\n")
+            # 第一段可能不完整，留到读入前一块后再拼接
+            buffer = lines.pop(0)
+            if trailing and lines:
+                lines.pop()
+                trailing = False
+            for line in reversed(lines):
+                if line:
+                    yield line + b"\n"
+        if buffer and not trailing:
+            yield buffer + b"\n"
+
+
+class LogFilter:
+    """事件类型与时间范围过滤"""
+
+    def __init__(
+        self,
+        events: Optional[Union[str, Iterable[str]]] = None,
+        since: TimeBound = None,
+        until: TimeBound = None,
+    ):
+        if isinstance(events, str):
+            events = [events]
+        self.events = set(events) if events else None
+        self.since = _iso(since)
+        self.until = _iso(until)
+        # json.dumps 默认分隔符下事件字段的原始字节
+        self._needles = (
+            [
+                json.dumps({"event": e}, ensure_ascii=False)[1:-1].encode("utf-8")
+                for e in self.events
+            ]
+            if self.events
+            else None
+        )
+
+    def since_timestamp(self) -> Optional[float]:
+        """since 对应的 Unix 时间（用于按文件修改时间跳过整个文件）"""
+        if self.since is None:
+            return None
+        try:
+            return datetime.fromisoformat(self.since).timestamp()
+        except ValueError:
+            return None
+
+    def accepts(self, entry: Dict) -> bool:
+        if self.events is not None and entry.get("event") not in self.events:
+            return False
+        if self.since is not None or self.until is not None:
+            timestamp = entry.get("timestamp") or ""
+            if self.since is not None and timestamp < self.since:
+                return False
+            if self.until is not None and timestamp >= self.until:
+                return False
+        return True
+
+    def parse(self, line: bytes) -> Optional[Dict]:
+        """解析一行；不满足条件时返回 None"""
+        if self._needles is not None and not any(
+            needle in line for needle in self._needles
+        ):
+            return None
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        return entry if self.accepts(entry) else None
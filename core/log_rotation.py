@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+🗜️ Proteus Log Rotation - 日志轮转、压缩与保留
+
+追加写入的 JSONL 日志（进化日志、执行日志）按大小或时间轮转：
+- 活动文件超过 max_bytes，或其第一条记录早于 max_age 秒时，改名为带序号的轮转段
+  （evolution_log.jsonl → evolution_log.00000001.jsonl）
+- 轮转段在后台线程压缩为 .gz（或 .zst），压缩后保留原修改时间
+- 保留策略：删除修改时间超过 retention_days 天、或超出 retention_files 个的最旧轮转段
+- RotatingLog 的读取按时间顺序依次跨越轮转段与活动文件，压缩段透明解压（见 log_reader）
+
+环境变量:
+    PROTEUS_LOG_ROTATE_BYTES: 活动文件大小上限 (default: 16777216)
+    PROTEUS_LOG_ROTATE_AGE: 活动文件最长时间跨度（秒） (default: 86400)
+    PROTEUS_LOG_COMPRESSION: gzip | zstd | none，zstd 需要 zstandard 库，未安装时退回 gzip (default: gzip)
+    PROTEUS_LOG_RETENTION_DAYS: 轮转段保留天数，0 为不限 (default: 30)
+    PROTEUS_LOG_RETENTION_FILES: 轮转段最多保留个数，0 为不限 (default: 0)
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from log_reader import (
+    COMPRESSED_SUFFIXES,
+    iter_lines,
+    resolve_log,
+    reverse_lines,
+    warn_once,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_METHODS = ("gzip", "zstd", "none")
+
+COPY_BLOCK = 1024 * 1024
+
+
+def resolve_compression(method: str) -> str:
+    """实际可用的压缩方式（zstandard 未安装时 zstd 退回 gzip）"""
+    method = (method or "gzip").lower()
+    if method not in COMPRESSION_METHODS:
+        raise ValueError(f"未知的压缩方式：{method}")
+    if method == "zstd" and zstandard is None:
+        warn_once(
+            "zstd", "未安装 zstandard，日志压缩改用 gzip（pip install zstandard）"
+        )
+        return "gzip"
+    return method
+
+
+class RotationPolicy:
+    """轮转与保留策略"""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        compression: Optional[str] = None,
+        retention_days: Optional[float] = None,
+        retention_files: Optional[int] = None,
+    ):
+        self.max_bytes = max_bytes or int(
+            os.getenv("PROTEUS_LOG_ROTATE_BYTES", str(16 * 1024 * 1024))
+        )
+        self.max_age = (
+            max_age
+            if max_age is not None
+            else float(os.getenv("PROTEUS_LOG_ROTATE_AGE", "86400"))
+        )
+        self.compression = resolve_compression(
+            compression or os.getenv("PROTEUS_LOG_COMPRESSION") or "gzip"
+        )
+        self.retention_days = (
+            retention_days
+            if retention_days is not None
+            else float(os.getenv("PROTEUS_LOG_RETENTION_DAYS", "30"))
+        )
+        self.retention_files = (
+            retention_files
+            if retention_files is not None
+            else int(os.getenv("PROTEUS_LOG_RETENTION_FILES", "0"))
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"RotationPolicy(max_bytes={self.max_bytes}, max_age={self.max_age}, "
+            f"compression={self.compression}, retention_days={self.retention_days}, "
+            f"retention_files={self.retention_files})"
+        )
+
+    def due(
+        self, size: int, started: Optional[float], now: Optional[float] = None
+    ) -> bool:
+        """活动文件是否应当轮转"""
+        if size <= 0:
+            return False
+        if size >= self.max_bytes:
+            return True
+        now = now if now is not None else time.time()
+        return (
+            bool(self.max_age) and started is not None and now - started >= self.max_age
+        )
+
+    def expired(self, mtime: float, now: Optional[float] = None) -> bool:
+        """修改时间是否超过保留天数"""
+        if not self.retention_days:
+            return False
+        now = now if now is not None else time.time()
+        return now - mtime > self.retention_days * 86400
+
+    def select_expired(
+        self, paths: Iterable[Path], now: Optional[float] = None
+    ) -> List[Path]:
+        """按保留策略应删除的文件（超期的，以及超出个数上限的最旧文件）"""
+        dated = []
+        for path in paths:
+            try:
+                dated.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        dated.sort(key=lambda item: item[0], reverse=True)
+        doomed = []
+        for position, (mtime, path) in enumerate(dated):
+            if self.expired(mtime, now) or (
+                self.retention_files and position >= self.retention_files
+            ):
+                doomed.append(path)
+        return doomed
+
+
+def first_timestamp(path: Path) -> Optional[float]:
+    """日志第一条记录的时间（Unix 时间）；没有记录或无法解析时返回 None"""
+    for line in iter_lines(path):
+        try:
+            return datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+        except (ValueError, KeyError, TypeError):
+            return None
+    return None
+
+
+def _compressed_writer(path: Path, method: str) -> io.BufferedIOBase:
+    if method == "zstd":
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    return gzip.open(path, "wb")
+
+
+def compress_file(path: Path, method: str = "gzip") -> Optional[Path]:
+    """
+    压缩一个不再写入的日志文件，完成后删除原文件
+
+    压缩内容先写入临时文件再改名，中途退出时原文件完好。目标文件已存在时
+    追加为新的压缩帧（gzip / zstd 均支持多帧拼接）。压缩后的文件保留原修改时间，
+    保留策略与按时间跳过文件的查询不受压缩时刻影响。
+
+    Returns:
+        压缩后的路径；不压缩或原文件不存在时返回 None
+    """
+    method = resolve_compression(method)
+    if method == "none":
+        return None
+    path = Path(path)
+    target = path.with_name(path.name + COMPRESSED_SUFFIXES[method])
+    tmp = path.with_name(path.name + COMPRESSED_SUFFIXES[method] + ".tmp")
+    try:
+        stat = path.stat()
+        with open(path, "rb") as src, _compressed_writer(tmp, method) as dst:
+            shutil.copyfileobj(src, dst, COPY_BLOCK)
+    except FileNotFoundError:
+        return None
+    if target.exists():
+        with open(target, "ab") as out, open(tmp, "rb") as part:
+            shutil.copyfileobj(part, out, COPY_BLOCK)
+        tmp.unlink()
+    else:
+        os.replace(tmp, target)
+    os.utime(target, (stat.st_atime, stat.st_mtime))
+    path.unlink()
+    return target
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _guarded(fn, *args):
+    try:
+        return fn(*args)
+    except OSError as e:
+        name = getattr(fn, "__name__", fn)
+        warn_once(f"maintenance:{name}", f"日志维护失败 {name}: {e}")
+
+
+def submit_background(fn, *args) -> Future:
+    """在共享的日志维护线程上执行（压缩、保留清理；按提交顺序逐个执行）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="log-maintenance"
+            )
+        return _executor.submit(_guarded, fn, *args)
+
+
+def drain_background(timeout: Optional[float] = None) -> bool:
+    """等待此前提交的维护任务全部完成；超时返回 False"""
+    future = submit_background(lambda: None)
+    try:
+        future.result(timeout)
+    except FutureTimeoutError:
+        # Python 3.11 之前与内置 TimeoutError 不是同一个类
+        return False
+    return True
+
+
+class RotatingLog:
+    """按大小 / 时间轮转的追加日志，读取透明跨越轮转段"""
+
+    def __init__(self, path: Path, policy: Optional[RotationPolicy] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.policy = policy or RotationPolicy()
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._pattern = re.compile(
+            rf"^{re.escape(self.path.stem)}\.(\d+){re.escape(self.path.suffix)}(\.gz|\.zst)?$"
+        )
+
+    def __repr__(self) -> str:
+        return f"RotatingLog({self.path})"
+
+    def rotated_path(self, number: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.{number:08d}{self.path.suffix}")
+
+    def rotated(self) -> List[Tuple[int, Path]]:
+        """[(序号, 实际文件)]，从旧到新"""
+        numbers = set()
+        for path in self.path.parent.iterdir():
+            match = self._pattern.match(path.name)
+            if match:
+                numbers.add(int(match.group(1)))
+        segments = []
+        for number in sorted(numbers):
+            resolved = resolve_log(self.rotated_path(number))
+            if resolved is not None:
+                segments.append((number, resolved))
+        return segments
+
+    def segments(self) -> List[Path]:
+        """全部段（轮转段从旧到新，最后是活动文件）"""
+        paths = [path for _, path in self.rotated()]
+        if self.path.exists():
+            paths.append(self.path)
+        return paths
+
+    def append(self, line: str):
+        """追加一行（含换行符）；需要时先轮转"""
+        with self._lock:
+            self._maybe_rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            if self._started is None:
+                self._started = time.time()
+
+    def rotate(self) -> Optional[Path]:
+        """立即轮转活动文件；返回轮转段路径（活动文件为空时返回 None）"""
+        with self._lock:
+            return self._rotate()
+
+    def _maybe_rotate(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            self._started = None
+            return
+        if self._started is None:
+            self._started = first_timestamp(self.path) or stat.st_mtime
+        if self.policy.due(stat.st_size, self._started):
+            self._rotate()
+
+    def _rotate(self) -> Optional[Path]:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return None
+        rotated = self.rotated()
+        target = self.rotated_path(rotated[-1][0] + 1 if rotated else 1)
+        os.replace(self.path, target)
+        self._started = None
+        submit_background(self._seal, target)
+        return target
+
+    def _seal(self, path: Path):
+        compress_file(path, self.policy.compression)
+        self.apply_retention()
+
+    def apply_retention(self) -> List[Path]:
+        """按保留策略删除轮转段；返回删除的文件"""
+        doomed = self.policy.select_expired(path for _, path in self.rotated())
+        for path in doomed:
+            path.unlink(missing_ok=True)
+        return doomed
+
+    def iter_lines(self) -> Iterator[bytes]:
+        """按时间顺序逐行读取全部段"""
+        for path in self.segments():
+            yield from iter_lines(path)
+
+    def reverse_lines(self) -> Iterator[bytes]:
+        """从最新一行开始反向读取全部段"""
+        for path in reversed(self.segments()):
+            yield from reverse_lines(path)
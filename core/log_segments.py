@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+🗂️ Proteus Log Segments - 共享分段执行日志
+
+所有任务的事件追加到共享的段文件，而不是每个任务一个文件：
+    segment-00000001.jsonl   事件（一行一条，含 task_id）
+    segment-00000001.idx     该段的索引：每条事件 28 字节 (task 键哈希 16B, 偏移 8B, 长度 4B)
+当前段超过 segment_bytes、或第一条事件早于轮转策略的 max_age 时切换到新段。
+文件数只随数据量增长，与任务数无关。
+
+最近封存的 raw_segments 个段保持未压缩；更早的段在后台压缩为 segment-00000001.jsonl.gz
+（索引不压缩，偏移指向解压后的内容）。maintain() 按保留策略删除最旧的段及其索引（见 log_rotation）。
+
+启动时读取各段的索引建立内存中的 task → [(段号, 偏移, 长度)] 映射。
+未压缩的段（当前段与最近封存的段）按偏移直接读取某个任务的事件，不扫描整个段；
+压缩段无法随机访问，读取要从段首解压到该任务最后一条事件，代价与段大小成正比，
+因此只用于较旧、很少读取的数据。
+索引落后于段文件时（写入中途退出）扫描段尾补建，末尾不完整的行被截掉。
+
+环境变量:
+    PROTEUS_LOG_SEGMENT_BYTES: 单个段文件大小上限 (default: 67108864)
+    PROTEUS_LOG_SEGMENT_RAW: 保持未压缩的最近封存段个数 (default: 2)
+"""
+
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from log_reader import open_log, resolve_log
+from log_rotation import (
+    RotationPolicy,
+    compress_file,
+    first_timestamp,
+    submit_background,
+)
+
+INDEX_RECORD = struct.Struct("<16sQI")
+
+# 索引中的一条位置：(段号, 偏移, 长度)
+Location = Tuple[int, int, int]
+
+SEGMENT_NAME = re.compile(r"^segment-(\d+)\.jsonl(\.gz|\.zst)?$")
+
+
+class SegmentedLogStore:
+    """共享分段日志 + task 索引"""
+
+    def __init__(
+        self,
+        root: Path,
+        segment_bytes: Optional[int] = None,
+        policy: Optional[RotationPolicy] = None,
+        raw_segments: Optional[int] = None,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes or int(
+            os.getenv("PROTEUS_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024))
+        )
+        self.raw_segments = (
+            raw_segments
+            if raw_segments is not None
+            else int(os.getenv("PROTEUS_LOG_SEGMENT_RAW", "2"))
+        )
+        self.policy = policy or RotationPolicy()
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, List[Location]] = {}
+        self._segments: List[int] = []
+        self._active: Optional[IO] = None
+        self._active_index: Optional[IO] = None
+        self._size = 0
+        self._started: Optional[float] = None
+        self.stats = {
+            "appends": 0,
+            "entries": 0,
+            "repaired": 0,
+            "compressed": 0,
+            "expired": 0,
+        }
+
+        numbers = set()
+        for path in self.root.iterdir():
+            match = SEGMENT_NAME.match(path.name)
+            if match:
+                numbers.add(int(match.group(1)))
+        self._segments = sorted(numbers)
+        for number in self._segments:
+            self._load_segment(number, last=number == self._segments[-1])
+
+    def __repr__(self) -> str:
+        return f"SegmentedLogStore({self.root})"
+
+    @staticmethod
+    def task_key(task_id: str) -> bytes:
+        return hashlib.blake2b(task_id.encode("utf-8"), digest_size=16).digest()
+
+    def segment_path(self, number: int) -> Path:
+        return self.root / f"segment-{number:08d}.jsonl"
+
+    def index_path(self, number: int) -> Path:
+        return self.root / f"segment-{number:08d}.idx"
+
+    def _load_segment(self, number: int, last: bool = False):
+        """读取一个段的索引；索引落后时扫描段尾补建"""
+        segment = self.segment_path(number)
+        index = self.index_path(number)
+        data = index.read_bytes() if index.exists() else b""
+        if not segment.exists():
+            # 已压缩的段在压缩前封存，索引完整
+            for key, offset, length in INDEX_RECORD.iter_unpack(
+                data[: len(data) - len(data) % INDEX_RECORD.size]
+            ):
+                self._index.setdefault(key, []).append((number, offset, length))
+                self.stats["entries"] += 1
+            return
+        size = segment.stat().st_size
+        covered = 0
+        valid = 0
+
+        for key, offset, length in INDEX_RECORD.iter_unpack(
+            data[: len(data) - len(data) % INDEX_RECORD.size]
+        ):
+            if offset + length > size:
+                break
+            self._index.setdefault(key, []).append((number, offset, length))
+            covered = offset + length
+            valid += 1
+            self.stats["entries"] += 1
+        if valid * INDEX_RECORD.size != len(data):
+            with open(index, "r+b") as f:
+                f.truncate(valid * INDEX_RECORD.size)
+
+        if covered >= size:
+            return
+        records = []
+        offset = covered
+        with open(segment, "rb") as f:
+            f.seek(covered)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    task_id = json.loads(line)["task_id"]
+                except (ValueError, KeyError, TypeError):
+                    offset += len(line)
+                    continue
+                key = self.task_key(task_id)
+                records.append(INDEX_RECORD.pack(key, offset, len(line)))
+                self._index.setdefault(key, []).append((number, offset, len(line)))
+                offset += len(line)
+        if records:
+            with open(index, "ab") as f:
+                f.write(b"".join(records))
+            self.stats["repaired"] += len(records)
+            self.stats["entries"] += len(records)
+        if last and offset < size:
+            # 末尾不完整的行（写入中途退出），截掉后才能继续追加
+            with open(segment, "r+b") as f:
+                f.truncate(offset)
+
+    def _open_active(self):
+        last = self.segment_path(self._segments[-1]) if self._segments else None
+        if (
+            last is not None
+            and last.exists()
+            and last.stat().st_size < self.segment_bytes
+        ):
+            number = self._segments[-1]
+            self._started = first_timestamp(last) or last.stat().st_mtime
+        else:
+            number = (self._segments[-1] + 1) if self._segments else 1
+            self._segments.append(number)
+            self._started = time.time()
+        self._active = open(self.segment_path(number), "ab")
+        self._active_index = open(self.index_path(number), "ab")
+        self._size = self._active.tell()
+        # 上次运行遗留的、已超出未压缩窗口的封存段
+        self._seal()
+
+    def _roll(self):
+        """切换到新段，超出未压缩窗口的旧段在后台压缩"""
+        self._close_active()
+        number = self._segments[-1] + 1
+        self._segments.append(number)
+        self._active = open(self.segment_path(number), "ab")
+        self._active_index = open(self.index_path(number), "ab")
+        self._size = 0
+        self._started = time.time()
+        self._seal()
+
+    def _aged(self) -> bool:
+        """当前段的第一条事件是否早于 max_age"""
+        return (
+            bool(self.policy.max_age)
+            and self._size > 0
+            and self._started is not None
+            and time.time() - self._started >= self.policy.max_age
+        )
+
+    def _compressible(self) -> List[int]:
+        """应当压缩的封存段：除当前段与最近 raw_segments 个封存段外仍未压缩的段"""
+        sealed = self._segments[:-1]
+        if self.raw_segments > 0:
+            sealed = sealed[: -self.raw_segments]
+        return [number for number in sealed if self.segment_path(number).exists()]
+
+    def _seal(self):
+        if self.policy.compression != "none":
+            for number in self._compressible():
+                submit_background(self._compress, number)
+
+    def _compress(self, number: int):
+        if (
+            compress_file(self.segment_path(number), self.policy.compression)
+            is not None
+        ):
+            self.stats["compressed"] += 1
+
+    def _close_active(self):
+        for handle in (self._active, self._active_index):
+            if handle is not None:
+                handle.close()
+        self._active = self._active_index = None
+
+    def append_batch(self, items: Iterable[Tuple[str, str, bool]]):
+        """
+        追加一批事件（段文件与索引各一次 write）
+
+        Args:
+            items: [(task_id, 行, final), ...]
+        """
+        with self._lock:
+            if self._active is None:
+                self._open_active()
+            elif self._size >= self.segment_bytes or self._aged():
+                self._roll()
+            number = self._segments[-1]
+            active, active_index = self._active, self._active_index
+            assert active is not None and active_index is not None
+
+            chunks = []
+            records = []
+            locations = []
+            offset = self._size
+            for task_id, line, _ in items:
+                data = line.encode("utf-8")
+                key = self.task_key(task_id)
+                chunks.append(data)
+                records.append(INDEX_RECORD.pack(key, offset, len(data)))
+                locations.append((key, (number, offset, len(data))))
+                offset += len(data)
+
+            # 先写段再写索引：中途退出时索引只会落后，启动时补建
+            active.write(b"".join(chunks))
+            active.flush()
+            active_index.write(b"".join(records))
+            active_index.flush()
+            for key, location in locations:
+                self._index.setdefault(key, []).append(location)
+            self._size = offset
+            self.stats["appends"] += 1
+            self.stats["entries"] += len(locations)
+
+    def sync(self):
+        with self._lock:
+            for handle in (self._active, self._active_index):
+                if handle is not None:
+                    os.fsync(handle.fileno())
+
+    def read(self, task_id: str, reverse: bool = False) -> Iterator[bytes]:
+        """按索引读取某个任务的事件行（写入顺序，reverse=True 时从最新开始）"""
+        with self._lock:
+            locations = list(self._index.get(self.task_key(task_id), []))
+        groups: List[Tuple[int, List[Location]]] = []
+        for location in locations:
+            if groups and groups[-1][0] == location[0]:
+                groups[-1][1].append(location)
+            else:
+                groups.append((location[0], [location]))
+        if reverse:
+            groups.reverse()
+
+        for number, group in groups:
+            try:
+                handle = open_log(self.segment_path(number))
+            except FileNotFoundError:
+                # 已按保留策略删除
+                continue
+            # 段内按偏移升序读取，需要时再反转；压缩段只能向前 seek（从段首解压），一次遍历读完整组
+            with handle:
+                lines = []
+                for _, offset, length in group:
+                    handle.seek(offset)
+                    lines.append(handle.read(length))
+            yield from (reversed(lines) if reverse else lines)
+
+    def has_task(self, task_id: str) -> bool:
+        with self._lock:
+            return self.task_key(task_id) in self._index
+
+    def segments(self) -> List[Path]:
+        """各段的实际文件（含已压缩的段）"""
+        with self._lock:
+            numbers = list(self._segments)
+        return [
+            path
+            for path in (resolve_log(self.segment_path(n)) for n in numbers)
+            if path is not None
+        ]
+
+    def maintain(self) -> List[Path]:
+        """压缩超出未压缩窗口的封存段，并按保留策略删除最旧的段及其索引；返回删除的段"""
+        with self._lock:
+            # 当前段（最后一段）仍在追加，不压缩也不删除
+            sealed = self._segments[:-1]
+            compressible = self._compressible()
+        if self.policy.compression != "none":
+            for number in compressible:
+                self._compress(number)
+
+        paths = {}
+        for number in sealed:
+            path = resolve_log(self.segment_path(number))
+            if path is not None:
+                paths[path] = number
+        removed = self.policy.select_expired(paths)
+        if not removed:
+            return []
+        doomed = {paths[path] for path in removed}
+        with self._lock:
+            for number in doomed:
+                for path in (
+                    resolve_log(self.segment_path(number)),
+                    self.index_path(number),
+                ):
+                    if path is not None:
+                        path.unlink(missing_ok=True)
+            self._segments = [n for n in self._segments if n not in doomed]
+            for key in list(self._index):
+                kept = [
+                    location
+                    for location in self._index[key]
+                    if location[0] not in doomed
+                ]
+                if kept:
+                    self._index[key] = kept
+                else:
+                    del self._index[key]
+            self.stats["expired"] += len(doomed)
+            return removed
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            numbers = list(self._segments)
+            stats = dict(self.stats, segments=len(numbers), tasks=len(self._index))
+        stats["bytes"] = sum(
+            path.stat().st_size for path in self.segments() if path.exists()
+        )
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._close_active()
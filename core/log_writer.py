@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+🖊️ Proteus Log Writer - 缓冲异步日志写入
+
+执行日志原本每条事件都 open / 追加 / close 一次文件。这里改为：
+- write() 只把序列化好的行放入内存队列，执行路径上不做系统调用
+- 后台线程攒批（组提交）：达到 max_batch 条、距批首超过 flush_interval 秒、
+  或遇到任务结束事件（final）时提交；同一文件的多行合并为一次 write
+- 打开的文件句柄保存在有界 LRU 中，任务结束后立即关闭
+- fsync 策略：never（交给操作系统）、task（任务结束时）、batch（每次提交）
+- flush() 等待此前写入的事件全部提交，读取日志前调用
+- 写入目标可以是文件路径，也可以是实现 append_batch / sync 的存储（如 log_segments 的共享分段日志）
+
+环境变量:
+    PROTEUS_LOG_ASYNC: on | off，off 时在调用线程同步写入 (default: on)
+    PROTEUS_LOG_FLUSH_INTERVAL: 最长攒批秒数 (default: 0.2)
+    PROTEUS_LOG_BATCH: 每批最多事件数 (default: 256)
+    PROTEUS_LOG_OPEN_FILES: 最多同时打开的文件数 (default: 64)
+    PROTEUS_LOG_FSYNC: never | task | batch (default: never)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from log_reader import warn_once
+
+FSYNC_POLICIES = ("never", "task", "batch")
+
+# (写入目标, 键, 行, 是否为该键的最后一条)
+Entry = Tuple[Any, Optional[str], str, bool]
+
+_STOP = object()
+
+
+class BufferedLogWriter:
+    """后台线程组提交的 JSONL 追加写入器"""
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_open_files: Optional[int] = None,
+        fsync: Optional[str] = None,
+        asynchronous: Optional[bool] = None,
+    ):
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else float(os.getenv("PROTEUS_LOG_FLUSH_INTERVAL", "0.2"))
+        )
+        self.max_batch = max_batch or int(os.getenv("PROTEUS_LOG_BATCH", "256"))
+        self.max_open_files = max_open_files or int(
+            os.getenv("PROTEUS_LOG_OPEN_FILES", "64")
+        )
+        self.fsync = fsync or os.getenv("PROTEUS_LOG_FSYNC", "never").lower()
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"未知的 fsync 策略：{self.fsync}")
+        if asynchronous is None:
+            asynchronous = os.getenv("PROTEUS_LOG_ASYNC", "on").lower() not in (
+                "0",
+                "off",
+                "false",
+                "no",
+            )
+        self.asynchronous = asynchronous
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._handles: "OrderedDict[Path, IO]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "events": 0,
+            "commits": 0,
+            "writes": 0,
+            "fsyncs": 0,
+            "opens": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    def write(
+        self, target: Any, line: str, final: bool = False, key: Optional[str] = None
+    ):
+        """
+        追加一行（异步模式下立即返回）
+
+        Args:
+            target: 目标文件路径，或实现 append_batch(items) / sync() 的存储
+            line: 完整的一行（含换行符）
+            final: 该文件（或存储中该键）的最后一条：立即提交、按策略 fsync，文件句柄随即关闭
+            key: 写入存储时的键（如 task_id）
+        """
+        if isinstance(target, str):
+            target = Path(target)
+        entry = (target, key, line, final)
+        if not self.asynchronous:
+            with self._lock:
+                self._commit([entry])
+            return
+        self._ensure_thread()
+        self._queue.put(entry)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待此前写入的事件全部提交；超时返回 False"""
+        if not self.asynchronous or self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """提交剩余事件，停止后台线程并关闭全部句柄"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    @contextmanager
+    def detach(self, path: Path):
+        """
+        暂停提交并关闭某个文件的句柄（如压缩、删除该文件时）
+
+        期间到达的事件在退出后提交，文件不存在时重新创建。
+        """
+        with self._lock:
+            handle = self._handles.pop(Path(path), None)
+            if handle is not None:
+                handle.close()
+            yield
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self.stats,
+                open_files=len(self._handles),
+                pending=self._queue.qsize(),
+                fsync=self.fsync,
+                asynchronous=self.asynchronous,
+            )
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="log-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        batch: List[Entry] = []
+        waiters: List[threading.Event] = []
+        commit_at = 0.0
+        while True:
+            timeout = max(0.0, commit_at - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            due = item is None or stop
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                due = True
+            elif isinstance(item, tuple):
+                if not batch:
+                    commit_at = time.monotonic() + self.flush_interval
+                batch.append(item)
+                due = item[3] or len(batch) >= self.max_batch
+
+            if due or stop:
+                try:
+                    if batch:
+                        with self._lock:
+                            self._commit(batch)
+                except Exception as e:
+                    # 写入线程不能退出：否则之后的事件无人提交，flush() 永远等待
+                    with self._lock:
+                        self.stats["errors"] += 1
+                    warn_once("commit", f"日志提交失败，丢弃 {len(batch)} 条事件：{e}")
+                finally:
+                    batch = []
+                    for waiter in waiters:
+                        waiter.set()
+                    waiters = []
+            if stop:
+                return
+
+    def _commit(self, batch: List[Entry]):
+        """一次提交：按目标合并写入（调用方持有 _lock）"""
+        groups: "OrderedDict[Any, List[Tuple[Optional[str], str, bool]]]" = (
+            OrderedDict()
+        )
+        for target, key, line, final in batch:
+            groups.setdefault(target, []).append((key, line, final))
+
+        self.stats["events"] += len(batch)
+        self.stats["commits"] += 1
+        for target, items in groups.items():
+            if isinstance(target, Path):
+                self._commit_file(
+                    target,
+                    [line for _, line, _ in items],
+                    any(final for _, _, final in items),
+                )
+            else:
+                self._commit_store(target, items)
+
+    def _commit_store(self, store: Any, items: List[Tuple[Optional[str], str, bool]]):
+        try:
+            store.append_batch(items)
+            self.stats["writes"] += 1
+            if self.fsync == "batch" or (
+                self.fsync == "task" and any(final for _, _, final in items)
+            ):
+                store.sync()
+                self.stats["fsyncs"] += 1
+        except OSError as e:
+            self.stats["errors"] += 1
+            warn_once("write", f"日志写入失败 {store}: {e}")
+
+    def _commit_file(self, path: Path, chunk: List[str], final: bool):
+        try:
+            handle = self._handle(path)
+            handle.write("".join(chunk))
+            handle.flush()
+            self.stats["writes"] += 1
+            if self.fsync == "batch" or (self.fsync == "task" and final):
+                os.fsync(handle.fileno())
+                self.stats["fsyncs"] += 1
+        except OSError as e:
+            self.stats["errors"] += 1
+            warn_once("write", f"日志写入失败 {path.name}: {e}")
+            final = True
+        if final:
+            if path in self._handles:
+                self._handles.pop(path).close()
+
+    def _handle(self, path: Path) -> IO:
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            return handle
+        while len(self._handles) >= self.max_open_files:
+            _, oldest = self._handles.popitem(last=False)
+            oldest.close()
+            self.stats["evictions"] += 1
+        handle = open(path, "a", encoding="utf-8")
+        self._handles[path] = handle
+        self.stats["opens"] += 1
+        return handle
+
+
+_writer: Optional[BufferedLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> BufferedLogWriter:
+    """获取进程内共享的日志写入器"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BufferedLogWriter()
+        return _writer
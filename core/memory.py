@@ -9,9 +9,15 @@
 
 import json
 import uuid
+from collections import deque
+from collections.abc import Mapping
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import IO, Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from context_snapshot import ContextSnapshot
+from log_reader import reverse_lines
+from memory_accounting import layer_stats
 
 class MemoryLayer:
     """记忆层基类"""
@@ -23,7 +29,7 @@ class MemoryLayer:
     def save(self, key: str, data: Dict) -> str:
         raise NotImplementedError
     
-    def load(self, key: str) -> Optional[Dict]:
+    def load(self, key: str) -> Optional[Mapping[str, Any]]:
         raise NotImplementedError
     
     def clear(self):
@@ -37,24 +43,45 @@ class WorkingMemory(MemoryLayer):
     - Agent 间通信消息
     - 临时状态
     - 任务结束后清空
+
+    消息日志有上限：内存中只保留最近 max_messages 条，
+    更早的消息追加写入 <task_id>.messages.jsonl 溢出文件。
+
+    挂接 EpisodeStream 后，消息、上下文增量和子任务结果实时写入场景记忆，
+    此时不再需要溢出文件，导出时只写页脚。
+
+    上下文是不可变的 ContextSnapshot，每次 update_context 生成新快照，
+    get_context()/snapshot() 返回的对象可以放心地长期持有或跨线程传递。
     """
     
-    def __init__(self, storage_path: Path):
+    DEFAULT_MAX_MESSAGES = 200
+    
+    def __init__(self, storage_path: Path, max_messages: int = DEFAULT_MAX_MESSAGES):
         super().__init__(storage_path)
+        self.max_messages = max_messages
         self.current_task_id: Optional[str] = None
-        self.context: Dict[str, Any] = {}
-        self.messages: List[Dict] = []
-    
-    def init_task(self, task_id: str, task_desc: str):
-        """初始化新任务的工作记忆"""
+        self.context: ContextSnapshot = ContextSnapshot()
+        self.messages: Deque[Dict] = deque(maxlen=max_messages)
+        self.message_count = 0
+        self.results: Dict[str, Dict] = {}
+        self._spill_file: Optional[IO[str]] = None
+        self._stream: Optional[EpisodeStream] = None
+    
+    def init_task(self, task_id: str, task_desc: str, stream: Optional['EpisodeStream'] = None):
+        """初始化新任务的工作记忆（上一个任务未完成时关闭其场景记录文件）"""
+        self._close_spill()
+        if self._stream:
+            self._stream.close()
         self.current_task_id = task_id
-        self.context = {
-            "task_id": task_id,
-            "task_desc": task_desc,
-            "created_at": datetime.now().isoformat(),
-            "status": "active"
-        }
-        self.messages = []
+        self._stream = stream
+        self.context = ContextSnapshot()
+        self.messages = deque(maxlen=self.max_messages)
+        self.message_count = 0
+        self.results = {}
+        self.update_context("task_id", task_id)
+        self.update_context("task_desc", task_desc)
+        self.update_context("created_at", datetime.now().isoformat())
+        self.update_context("status", "active")
         print(f"🧠 [WorkingMemory] 任务 {task_id[:8]} 已初始化")
     
     def add_message(self, sender: str, receiver: str, content: str, metadata: Dict = None):
@@ -66,72 +93,394 @@ class WorkingMemory(MemoryLayer):
             "content": content,
             "metadata": metadata or {}
         }
+        if self._stream:
+            self._stream.write_message(msg)
+        elif len(self.messages) == self.max_messages:
+            self._spill(self.messages[0])
         self.messages.append(msg)
+        self.message_count += 1
+    
+    def iter_messages(self) -> Iterator[Dict]:
+        """按时间顺序遍历全部消息（溢出文件 + 内存中的最近消息）"""
+        if self._stream:
+            yield from self._stream.iter_messages()
+            return
+        spill_path = self._spill_path()
+        if spill_path and spill_path.exists():
+            if self._spill_file:
+                self._spill_file.flush()
+            with open(spill_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+        yield from list(self.messages)
+    
+    def _spill_path(self) -> Optional[Path]:
+        if not self.current_task_id:
+            return None
+        return self.storage_path / f"{self.current_task_id}.messages.jsonl"
+    
+    def _spill(self, msg: Dict):
+        """把即将被挤出环形缓冲区的消息追加到溢出文件"""
+        if self._spill_file is None:
+            path = self._spill_path()
+            if path is None:
+                # 没有当前任务时不会挤出消息
+                return
+            self._spill_file = open(path, 'a', encoding='utf-8')
+        self._spill_file.write(json.dumps(msg, ensure_ascii=False) + '\n')
+    
+    def _close_spill(self, remove: bool = False):
+        if self._spill_file:
+            self._spill_file.close()
+            self._spill_file = None
+        spill_path = self._spill_path()
+        if remove and spill_path and spill_path.exists():
+            spill_path.unlink()
     
     def update_context(self, key: str, value: Any):
-        """更新上下文"""
-        self.context[key] = value
+        """更新上下文（生成新快照，已发出的快照不受影响）"""
+        self.context = self.context.set(key, value)
+        if self._stream:
+            self._stream.write_context(key, self.context[key])
+    
+    def update_subtask(self, subtask_id: str, changes: Dict):
+        """
+        更新上下文中单个子任务的字段（生成新快照，其余子任务在快照之间共享）
+
+        场景记忆只追加该子任务的增量；result 由 record_result 写入 results 区段，不重复写入上下文。
+        """
+        subtasks = self.context.get("subtasks") or ()
+        self.context = self.context.set("subtasks", [
+            dict(st, **changes) if st.get("subtask_id") == subtask_id else st
+            for st in subtasks
+        ])
+        if self._stream:
+            self._stream.write_subtask(subtask_id, {k: v for k, v in changes.items() if k != "result"})
+    
+    def record_result(self, subtask_id: str, result: Dict):
+        """记录子任务执行结果"""
+        if self._stream:
+            self._stream.write_result(subtask_id, result)
+        else:
+            self.results[subtask_id] = result
     
     def get_context(self, key: str = None) -> Any:
-        """获取上下文"""
+        """获取上下文（整体获取时返回不可变快照）"""
         if key:
             return self.context.get(key)
         return self.context
     
+    def snapshot(self) -> ContextSnapshot:
+        """获取当前上下文快照（O(1)，无拷贝）"""
+        return self.context
+    
     def clear(self):
         """清空工作记忆（任务完成后调用）"""
         task_id = self.current_task_id
+        self._close_spill(remove=True)
+        if self._stream:
+            self._stream.close()
+            self._stream = None
         self.current_task_id = None
-        self.context = {}
-        self.messages = []
+        self.context = ContextSnapshot()
+        self.messages = deque(maxlen=self.max_messages)
+        self.message_count = 0
+        self.results = {}
         print(f"🧠 [WorkingMemory] 任务 {task_id[:8] if task_id else 'N/A'} 已清空")
     
     def export_to_episodic(self, episodic_memory: 'EpisodicMemory'):
-        """导出到场景记忆（任务完成时）"""
-        if self.current_task_id:
+        """导出到场景记忆（任务完成时，消息从溢出文件流式写出）"""
+        if self._stream:
+            # 轨迹已实时写入，只需追加页脚
+            self._stream.close({"completed_at": datetime.now().isoformat()})
+            print(f"🧠 [WorkingMemory] 已写入场景记忆页脚")
+        elif self.current_task_id:
             episodic_data = {
                 "task_id": self.current_task_id,
                 "context": self.context,
-                "messages": self.messages,
+                "messages": self.iter_messages(),
+                "results": self.results,
                 "completed_at": datetime.now().isoformat()
             }
             episodic_memory.save(self.current_task_id, episodic_data)
             print(f"🧠 [WorkingMemory] 已导出到场景记忆")
 
 
+class LazyEpisode(Mapping):
+    """
+    惰性场景记录
+
+    按区段读取任务轨迹，只在首次访问时解析：
+    - header.json：task_id、context（已剥离子任务 result）、completed_at
+      （流式写入的记录没有 header.json，由 context.jsonl 的增量、子任务状态增量与页脚重放得到）
+    - messages.jsonl：Agent 间通信消息
+    - results.jsonl：子任务执行结果
+
+    只读取 context 的扫描（如模式发现）不会解析 messages 和 results。
+    """
+
+    SECTIONS = ("messages", "results")
+
+    def __init__(self, episode_dir: Path):
+        self.episode_dir = episode_dir
+        self._header: Optional[Dict] = None
+        self._sections: Dict[str, Any] = {}
+
+    @property
+    def task_id(self) -> str:
+        return self.episode_dir.name
+
+    @property
+    def header(self) -> Dict:
+        """头部区段（首次访问时解析）"""
+        if self._header is None:
+            header_path = self.episode_dir / "header.json"
+            if header_path.exists():
+                with open(header_path, 'r', encoding='utf-8') as f:
+                    self._header = json.load(f)
+            else:
+                self._header = self._replay_context_journal()
+        return self._header
+
+    def _replay_context_journal(self) -> Dict:
+        """重放 context.jsonl 中的上下文与子任务增量；页脚字段（如 completed_at）并入头部"""
+        header: Dict[str, Any] = {"task_id": self.task_id, "context": {}}
+        for record in self._iter_jsonl(self.episode_dir / "context.jsonl"):
+            if record.get("op") == "set":
+                header["context"][record["key"]] = record["value"]
+            elif record.get("op") == "subtask":
+                header["context"]["subtasks"] = [
+                    dict(st, **record["changes"])
+                    if isinstance(st, dict) and st.get("subtask_id") == record["subtask_id"] else st
+                    for st in header["context"].get("subtasks", [])
+                ]
+            elif record.get("op") == "footer":
+                header.update({k: v for k, v in record.items() if k != "op"})
+        return header
+
+    def iter_messages(self) -> Iterator[Dict]:
+        """逐条读取消息，不在内存中保留完整列表"""
+        if "messages" in self._sections:
+            yield from self._sections["messages"]
+            return
+        yield from self._iter_jsonl(self.episode_dir / "messages.jsonl")
+
+    def _iter_jsonl(self, filepath: Path) -> Iterator[Dict]:
+        if not filepath.exists():
+            return
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _load_section(self, name: str) -> Any:
+        if name not in self._sections:
+            if name == "messages":
+                self._sections[name] = list(self.iter_messages())
+            else:
+                self._sections[name] = {
+                    entry["subtask_id"]: entry["result"]
+                    for entry in self._iter_jsonl(self.episode_dir / "results.jsonl")
+                }
+        return self._sections[name]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.SECTIONS:
+            return self._load_section(key)
+        if key == "sections":
+            raise KeyError(key)
+        return self.header[key]
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.header:
+            if key != "sections":
+                yield key
+        yield from self.SECTIONS
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        """还原为完整记录（子任务 result 重新挂回 context）"""
+        data = {key: self[key] for key in self if key != "results"}
+        results = self["results"]
+        context = dict(data.get("context", {}))
+        if results and context.get("subtasks"):
+            context["subtasks"] = [
+                dict(st, result=results[st.get("subtask_id")])
+                if isinstance(st, dict) and st.get("subtask_id") in results else st
+                for st in context["subtasks"]
+            ]
+        data["context"] = context
+        return data
+
+
+class EpisodeStream:
+    """
+    场景记录流式写入器
+
+    任务执行过程中把消息、上下文增量和子任务结果逐条追加到场景记忆，
+    完成时只追加一条页脚记录。进程中途崩溃时已写入的轨迹仍然保留。
+    """
+
+    def __init__(self, episode_dir: Path):
+        self.episode_dir = episode_dir
+        self.episode_dir.mkdir(parents=True, exist_ok=True)
+        self.message_count = 0
+        self.result_count = 0
+        self.closed = False
+        # 行缓冲：每条记录写入即交给操作系统
+        self._files = {
+            name: open(self.episode_dir / f"{name}.jsonl", 'a', encoding='utf-8', buffering=1)
+            for name in ("context", "messages", "results")
+        }
+
+    def _append(self, section: str, record: Dict):
+        if self.closed:
+            # 任务已结束（如取消后仍在返回的执行结果），不再写入
+            return
+        self._files[section].write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_context(self, key: str, value: Any):
+        self._append("context", {"op": "set", "key": key, "value": value})
+
+    def write_subtask(self, subtask_id: str, changes: Dict):
+        self._append("context", {"op": "subtask", "subtask_id": subtask_id, "changes": changes})
+
+    def write_message(self, msg: Dict):
+        self._append("messages", msg)
+        self.message_count += 1
+
+    def write_result(self, subtask_id: str, result: Dict):
+        self._append("results", {"subtask_id": subtask_id, "result": result})
+        self.result_count += 1
+
+    def iter_messages(self) -> Iterator[Dict]:
+        """读取已写入的全部消息"""
+        return LazyEpisode(self.episode_dir).iter_messages()
+
+    def close(self, footer: Optional[Dict] = None):
+        """写入页脚（可选）并关闭文件"""
+        if self.closed:
+            return
+        if footer is not None:
+            record: Dict[str, Any] = {"op": "footer"}
+            record.update(footer)
+            record["sections"] = {"messages": self.message_count, "results": self.result_count}
+            self._append("context", record)
+        for f in self._files.values():
+            f.close()
+        self.closed = True
+
+
 class EpisodicMemory(MemoryLayer):
     """
     场景记忆层
     - 以任务 ID 为单位存储完整执行轨迹
     - 记录决策点、Agent 调用序列、协作记录
     - 用于复盘和学习
+
+    存储布局（每个任务一个目录）：
+        <task_id>/header.json     头部与上下文
+        <task_id>/messages.jsonl  通信消息
+        <task_id>/results.jsonl   子任务结果
+    流式写入（open_stream）的记录用 <task_id>/context.jsonl 替代 header.json。
+    旧版 <task_id>.json 单文件记录仍可读取。
     """
     
+    def open_stream(self, task_id: str) -> EpisodeStream:
+        """打开任务记录的流式写入器"""
+        return EpisodeStream(self.storage_path / task_id)
+    
+    def _has_episode(self, episode_dir: Path) -> bool:
+        return (episode_dir / "header.json").exists() or (episode_dir / "context.jsonl").exists()
+    
+    def _is_finished(self, episode_dir: Path) -> bool:
+        """记录是否已写完（header.json 最后写入；流式记录以页脚结尾）"""
+        if (episode_dir / "header.json").exists():
+            return True
+        last = next(reverse_lines(episode_dir / "context.jsonl"), None)
+        try:
+            return last is not None and json.loads(last).get("op") == "footer"
+        except ValueError:
+            return False
+    
     def save(self, task_id: str, data: Dict) -> str:
-        """保存任务记录"""
-        filepath = self.storage_path / f"{task_id}.json"
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """保存任务记录（按区段写入，header.json 最后写入作为完成标记）"""
+        episode_dir = self.storage_path / task_id
+        episode_dir.mkdir(parents=True, exist_ok=True)
+        
+        context, results = self._split_results(data.get("context", {}), data.get("results"))
+        
+        message_count = self._write_jsonl(episode_dir / "messages.jsonl", data.get("messages", []))
+        self._write_jsonl(
+            episode_dir / "results.jsonl",
+            ({"subtask_id": sid, "result": result} for sid, result in results.items())
+        )
+        
+        header = {key: value for key, value in data.items() if key not in ("context", "messages", "results")}
+        header["context"] = context
+        header["sections"] = {"messages": message_count, "results": len(results)}
+        with open(episode_dir / "header.json", 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2, ensure_ascii=False)
+        
         print(f"🧠 [EpisodicMemory] 任务 {task_id[:8]} 已保存")
         return task_id
     
-    def load(self, task_id: str) -> Optional[Dict]:
-        """加载任务记录"""
+    def _split_results(self, context: Dict, results: Optional[Dict] = None):
+        """把子任务 result 从上下文中剥离到独立的 results 区段"""
+        context = dict(context)
+        results = dict(results or {})
+        subtasks = []
+        for st in context.get("subtasks", []) or []:
+            if isinstance(st, dict) and "result" in st:
+                st = dict(st)
+                results.setdefault(st.get("subtask_id"), st.pop("result"))
+            subtasks.append(st)
+        if "subtasks" in context:
+            context["subtasks"] = subtasks
+        return context, results
+    
+    def _write_jsonl(self, filepath: Path, entries: Iterable[Dict]) -> int:
+        count = 0
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                count += 1
+        return count
+    
+    def load(self, task_id: str) -> Optional[Union[LazyEpisode, Dict]]:
+        """加载任务记录（区段惰性解析）"""
+        episode_dir = self.storage_path / task_id
+        if self._has_episode(episode_dir):
+            return LazyEpisode(episode_dir)
+        
+        # 兼容旧版单文件记录
         filepath = self.storage_path / f"{task_id}.json"
         if filepath.exists():
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return None
     
-    def list_tasks(self) -> List[str]:
-        """列出所有任务 ID"""
-        return [f.stem for f in self.storage_path.glob("*.json")]
+    def list_tasks(self, include_unfinished: bool = False) -> List[str]:
+        """
+        列出已完成任务的 ID
+        
+        Args:
+            include_unfinished: 同时列出仍在流式写入（或中途中断、没有页脚）的记录
+        """
+        task_ids = [
+            d.name for d in self.storage_path.iterdir()
+            if self._has_episode(d) and (include_unfinished or self._is_finished(d))
+        ]
+        task_ids.extend(f.stem for f in self.storage_path.glob("*.json"))
+        return task_ids
     
-    def get_similar_tasks(self, task_desc: str, limit: int = 5) -> List[Dict]:
+    def get_similar_tasks(self, task_desc: str, limit: int = 5) -> List[Mapping[str, Any]]:
         """获取相似任务（用于模式匹配）"""
         # TODO: 实现语义相似度搜索
         # 当前简单返回最近的任务
-        tasks = []
+        tasks: List[Mapping[str, Any]] = []
         for task_id in self.list_tasks()[:limit]:
             task_data = self.load(task_id)
             if task_data:
@@ -259,14 +608,44 @@ class SemanticMemory(MemoryLayer):
                 return json.load(f)
         return None
     
-    def match_pattern(self, task_desc: str) -> Optional[Dict]:
-        """匹配相似任务模式"""
-        # TODO: 实现语义匹配
-        # 当前简单返回第一个模式
+    @staticmethod
+    def _bigrams(text: str) -> set:
+        """去空白、小写后的字符二元组（中英文通用）"""
+        text = "".join((text or "").lower().split())
+        return {text[i:i + 2] for i in range(len(text) - 1)}
+    
+    def score_patterns(self, task_desc: str) -> List[Tuple[float, Dict]]:
+        """
+        给所有任务模式打分（高分在前）
+        
+        分数 = 任务描述的字符二元组中，出现在模式名称、描述、输入模板里的比例（0~1）
+        """
+        query = self._bigrams(task_desc)
+        scored = []
         for filepath in self.patterns_path.glob("*.json"):
             with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
+                pattern = json.load(f)
+            template = pattern.get("task_template") or {}
+            text = " ".join([pattern.get("name", ""), pattern.get("description", ""), template.get("input", "")])
+            score = len(query & self._bigrams(text)) / len(query) if query else 0.0
+            scored.append((score, pattern))
+        scored.sort(key=lambda x: -x[0])
+        return scored
+    
+    def best_pattern(self, task_desc: str) -> Tuple[Optional[Dict], float]:
+        """最相似的任务模式及其分数（没有模式时为 (None, 0.0)）"""
+        scored = self.score_patterns(task_desc)
+        if not scored:
+            return None, 0.0
+        score, pattern = scored[0]
+        return pattern, score
+    
+    def match_pattern(self, task_desc: str, min_score: float = 0.0) -> Optional[Dict]:
+        """匹配最相似的任务模式（分数低于 min_score 时返回 None）"""
+        pattern, score = self.best_pattern(task_desc)
+        if pattern is None or score < min_score:
+            return None
+        return pattern
     
     # ========== 规则库 ==========
     
@@ -319,19 +698,24 @@ class MemorySystem:
     三层记忆系统总控
     """
     
-    def __init__(self, base_path: Path = None):
+    def __init__(self, base_path: Optional[Path] = None, max_messages: int = WorkingMemory.DEFAULT_MAX_MESSAGES,
+                 stream_episodes: bool = True):
         if base_path is None:
             base_path = Path(__file__).parent / "memory"
         
-        self.working = WorkingMemory(base_path / "working")
+        self.working = WorkingMemory(base_path / "working", max_messages=max_messages)
         self.episodic = EpisodicMemory(base_path / "episodic")
         self.semantic = SemanticMemory(base_path / "semantic")
         
+        # 任务轨迹实时写入场景记忆（关闭时在任务完成后一次性导出）
+        self.stream_episodes = stream_episodes
+        
         print("🧠 Proteus Memory System 已初始化")
     
     def start_task(self, task_id: str, task_desc: str):
         """开始新任务"""
-        self.working.init_task(task_id, task_desc)
+        stream = self.episodic.open_stream(task_id) if self.stream_episodes else None
+        self.working.init_task(task_id, task_desc, stream=stream)
     
     def complete_task(self, success: bool, feedback: str = None):
         """完成任务"""
@@ -347,6 +731,19 @@ class MemorySystem:
         # 清空工作记忆
         self.working.clear()
     
+    def get_memory_stats(self) -> Dict[str, Dict]:
+        """各记忆层的内存占用估算（条目数 + 字节数）"""
+        working = self.working
+        return {
+            "working_messages": dict(
+                layer_stats(working.messages),
+                total=working.message_count,
+                spilled=working.message_count - len(working.messages)
+            ),
+            "working_context": layer_stats(working.context),
+            "working_results": layer_stats(working.results)
+        }
+    
     def initialize_default_agents(self):
         """初始化默认 Agent 画像"""
         agents = [
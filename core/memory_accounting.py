@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+📏 Proteus Memory Accounting - 内存占用统计
+
+功能：
+1. 估算各层内存结构的字节数与条目数
+2. 可选的 tracemalloc 模式：按流水线阶段（parse/form/execute/deliver）
+   记录新增内存最多的分配位置，用于排查长期运行进程的泄漏
+
+启用 tracemalloc：
+    PROTEUS_TRACEMALLOC=1 或 ProteusHub(trace_memory=True)
+"""
+
+import functools
+import os
+import sys
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    估算对象及其引用的容器/字符串的总字节数
+
+    共享对象只计算一次；非容器对象只计算 __dict__ 中的内容。
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__"):
+            stack.append(vars(current))
+    return total
+
+
+def layer_stats(obj: Any) -> Dict[str, int]:
+    """单层统计：条目数 + 估算字节数"""
+    try:
+        items = len(obj)
+    except TypeError:
+        items = 1
+    return {"items": items, "bytes": deep_sizeof(obj)}
+
+
+class StageTracer:
+    """
+    流水线阶段内存追踪器
+
+    未启用时 stage() 为空操作，不产生任何开销。
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, top_n: int = 10):
+        if enabled is None:
+            enabled = os.getenv("PROTEUS_TRACEMALLOC", "0").lower() in (
+                "1",
+                "true",
+                "yes",
+            )
+        self.enabled = enabled
+        self.top_n = top_n
+        self.reports: Dict[str, Dict] = {}
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """追踪一个阶段的内存增量"""
+        if not self.enabled:
+            yield
+            return
+
+        before = tracemalloc.take_snapshot()
+        try:
+            yield
+        finally:
+            after = tracemalloc.take_snapshot()
+            self._record(name, after.compare_to(before, "lineno"))
+
+    def _record(self, name: str, diffs: List[tracemalloc.StatisticDiff]):
+        report = self.reports.setdefault(
+            name, {"runs": 0, "size_diff": 0, "top_sites": []}
+        )
+        report["runs"] += 1
+        report["size_diff"] += sum(d.size_diff for d in diffs)
+        report["top_sites"] = [
+            {
+                "site": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+                "size_diff": d.size_diff,
+                "count_diff": d.count_diff,
+            }
+            for d in diffs[: self.top_n]
+            if d.size_diff > 0
+        ]
+
+    def get_report(self) -> Dict:
+        """获取各阶段的追踪报告"""
+        if not self.enabled:
+            return {"enabled": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "enabled": True,
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "stages": self.reports,
+        }
+
+
+def traced_stage(stage: str):
+    """方法装饰器：用实例上的 self.tracer 追踪该阶段"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.tracer.stage(stage):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+🧭 Olympus Model Routing - 按子任务复杂度选择模型档位
+
+根据 estimated_time、required_skills、agent_type 与提示词大小，
+为每次调用选择模型档位（fast / standard / deep）及输出 token 上限：
+
+1. 预估时间：<= fast_max_minutes 为 fast，>= deep_min_minutes 为 deep，其余 standard
+2. 含重型技能（架构、编码实现等）时提升一档
+3. agent_floors 规定某些 Agent 的最低档位
+4. 提示词超过 large_prompt_tokens 时至少 standard
+5. 任务分解固定使用 decompose_tier
+
+档位中未配置某提供商的模型时使用该提供商的默认模型。
+
+环境变量:
+    PROTEUS_MODEL_ROUTING: off 关闭路由（全部使用 standard）；
+                           或 JSON 配置文件路径，覆盖默认配置中的同名字段
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional
+
+TIER_ORDER = ["fast", "standard", "deep"]
+
+DEFAULT_CONFIG = {
+    "tiers": {
+        "fast": {
+            "max_tokens": 800,
+            "models": {
+                "openai": "gpt-4o-mini",
+                "anthropic": "claude-3-5-haiku-20241022",
+            },
+        },
+        "standard": {"max_tokens": 2000, "models": {}},
+        "deep": {"max_tokens": 4000, "models": {}},
+    },
+    "fast_max_minutes": 30,
+    "deep_min_minutes": 90,
+    "heavy_skills": [
+        "architecture",
+        "coding",
+        "implementation",
+        "backend",
+        "database",
+        "synthesis",
+    ],
+    "agent_floors": {"daedalus": "standard"},
+    "large_prompt_tokens": 3000,
+    "decompose_tier": "standard",
+}
+
+
+class ModelRoute(dict):
+    """一次路由决策：tier / max_tokens / reasons，以及按提供商解析模型"""
+
+    def model_for(self, provider: str, default_model: str) -> str:
+        return self["models"].get(provider) or default_model
+
+
+class ModelRoutingPolicy:
+    """模型路由策略"""
+
+    def __init__(self, config: Optional[Dict] = None, enabled: bool = True):
+        self.config = json.loads(json.dumps(DEFAULT_CONFIG))
+        for key, value in (config or {}).items():
+            if key == "tiers":
+                for tier, spec in value.items():
+                    self.config["tiers"].setdefault(tier, {}).update(spec)
+            else:
+                self.config[key] = value
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.stats = {tier: 0 for tier in TIER_ORDER}
+        self.recent: Deque[Dict] = deque(maxlen=50)
+
+    @classmethod
+    def from_env(cls) -> "ModelRoutingPolicy":
+        setting = os.getenv("PROTEUS_MODEL_ROUTING", "on")
+        if setting.lower() in ("0", "off", "false", "no"):
+            return cls(enabled=False)
+        if setting.lower() not in ("1", "on", "true", "yes"):
+            try:
+                with open(Path(setting), "r", encoding="utf-8") as f:
+                    return cls(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 模型路由配置读取失败 {setting}: {e}，使用默认配置")
+        return cls()
+
+    def _raise(self, tier: str, floor: str) -> str:
+        return max(tier, floor, key=TIER_ORDER.index)
+
+    def route(
+        self,
+        agent_type: Optional[str] = None,
+        subtask: Optional[Dict] = None,
+        prompt_tokens: int = 0,
+        purpose: str = "execute",
+    ) -> ModelRoute:
+        """
+        为一次调用选择模型档位
+
+        Args:
+            agent_type: Agent 类型
+            subtask: 子任务（读取 estimated_time 与 required_skills）
+            prompt_tokens: 提示词估算 token 数
+            purpose: execute | decompose
+        """
+        reasons: List[str] = []
+        if not self.enabled:
+            tier = "standard"
+            reasons.append("路由已关闭")
+        elif purpose == "decompose":
+            tier = self.config["decompose_tier"]
+            reasons.append("任务分解")
+        else:
+            tier = "standard"
+            minutes = (subtask or {}).get("estimated_time")
+            if isinstance(minutes, (int, float)):
+                if minutes <= self.config["fast_max_minutes"]:
+                    tier = "fast"
+                elif minutes >= self.config["deep_min_minutes"]:
+                    tier = "deep"
+                reasons.append(f"预估 {minutes} 分钟")
+
+            heavy = set((subtask or {}).get("required_skills", [])) & set(
+                self.config["heavy_skills"]
+            )
+            if heavy:
+                tier = TIER_ORDER[min(TIER_ORDER.index(tier) + 1, len(TIER_ORDER) - 1)]
+                reasons.append(f"重型技能 {sorted(heavy)}")
+
+            floor = self.config["agent_floors"].get(agent_type)
+            if floor and self._raise(tier, floor) != tier:
+                tier = floor
+                reasons.append(f"{agent_type} 最低 {floor}")
+
+            if prompt_tokens > self.config["large_prompt_tokens"] and tier == "fast":
+                tier = "standard"
+                reasons.append(f"提示词 {prompt_tokens} tokens")
+
+        spec = self.config["tiers"][tier]
+        route = ModelRoute(
+            tier=tier,
+            max_tokens=spec.get("max_tokens", 2000),
+            models=dict(spec.get("models", {})),
+            reasons=reasons,
+        )
+
+        with self._lock:
+            self.stats[tier] = self.stats.get(tier, 0) + 1
+            self.recent.append(
+                {
+                    "agent_type": agent_type,
+                    "purpose": purpose,
+                    "tier": tier,
+                    "reasons": reasons,
+                }
+            )
+        return route
+
+    def combine(self, routes: List[ModelRoute]) -> ModelRoute:
+        """合并批量调用中各子任务的路由：取最高档位，token 上限累加"""
+        top = max(routes, key=lambda r: TIER_ORDER.index(r["tier"]))
+        return ModelRoute(
+            tier=top["tier"],
+            max_tokens=sum(r["max_tokens"] for r in routes),
+            models=dict(top["models"]),
+            reasons=[f"批量 {len(routes)} 个子任务"] + top["reasons"],
+        )
+
+    def get_stats(self) -> Dict:
+        """各档位调用次数与最近的路由决策"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "tiers": dict(self.stats),
+                "recent": list(self.recent)[-10:],
+            }
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+🚦 Olympus Rate Limit - 提供商限流与退避重试
+
+- 令牌桶：每个 provider 分别限制 请求/分钟 与 token/分钟
+- 请求前按预估 token 扣减，响应后按实际用量结算
+- 被限流时优先遵循 Retry-After，并暂停整个 provider 的令牌桶，
+  避免所有并发调用同时重试
+- 其余可重试错误使用带抖动的指数退避
+
+- local / replay 默认不在客户端限流（替身服务与回放的吞吐不受令牌桶限制），
+  服务端返回 429 时仍按 Retry-After 退避
+
+环境变量（<PROVIDER> 为 OPENAI / ANTHROPIC / LOCAL 等）:
+    PROTEUS_<PROVIDER>_RPM: 每分钟请求数上限，0 为不限
+    PROTEUS_<PROVIDER>_TPM: 每分钟 token 上限，0 为不限
+    PROTEUS_LLM_MAX_RETRIES: 最大重试次数 (default: 5)
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+# 默认配额（可用环境变量覆盖；0 为不限）
+DEFAULT_LIMITS = {
+    "openai": (500, 300000),
+    "anthropic": (50, 80000),
+    "local": (0, 0),
+    "replay": (0, 0),
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_NAMES = ("RateLimit", "Timeout", "Connection", "Overloaded", "InternalServer")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日文字符约 1 token/字，其余约 4 字符/token"""
+    cjk = sum(
+        1 for ch in text if "\u4e00" <= ch <= "\u9fff" or "\u3000" <= ch <= "\u30ff"
+    )
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenBucket:
+    """令牌桶（线程安全）；rate_per_minute 为 0 时不限速，只遵循 pause"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.unlimited = rate_per_minute <= 0
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(
+        self, amount: float = 1, sleep: Callable[[float], None] = time.sleep
+    ) -> float:
+        """阻塞直到获得 amount 个令牌，返回等待秒数（sleep 可替换为可取消的等待）"""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.unlimited:
+                    return waited
+                elif self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                else:
+                    wait = (amount - self.tokens) / self.rate
+            sleep(wait)
+            waited += wait
+
+    def adjust(self, delta: float):
+        """结算预估与实际用量的差额（正数为退还，负数为补扣）"""
+        if self.unlimited:
+            return
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + delta)
+
+    def pause(self, seconds: float):
+        """暂停发放令牌（用于 Retry-After）"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class ProviderRateLimiter:
+    """单个 provider 的 请求/分钟 + token/分钟 限流器"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0}
+
+    def acquire(
+        self, estimated_tokens: int, sleep: Callable[[float], None] = time.sleep
+    ) -> float:
+        """请求前获取配额，返回等待秒数"""
+        waited = self.requests.acquire(1, sleep) + self.tokens.acquire(
+            estimated_tokens, sleep
+        )
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["wait_seconds"] += waited
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """响应后按实际 token 用量结算"""
+        if actual_tokens is not None:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def throttled(self, retry_after: Optional[float]):
+        """记录一次限流；有 Retry-After 时暂停整个 provider"""
+        with self._lock:
+            self.stats["throttled"] += 1
+        if retry_after:
+            self.requests.pause(retry_after)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+
+class RetryPolicy:
+    """带抖动的指数退避"""
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        if max_retries is None:
+            max_retries = int(os.getenv("PROTEUS_LLM_MAX_RETRIES", "5"))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次重试前的等待时间（attempt 从 0 开始）"""
+        if retry_after is not None:
+            # 遵循服务端要求，加少量抖动错开并发重试
+            return min(self.max_delay, retry_after) + random.uniform(
+                0, self.base_delay * 0.1
+            )
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2**attempt)))
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error: Exception) -> bool:
+    """判断错误是否值得重试（限流、超时、服务端错误）"""
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return any(name in type(error).__name__ for name in RETRYABLE_NAMES)
+
+
+def is_throttle(error: Exception) -> bool:
+    return _status_code(error) == 429 or "RateLimit" in type(error).__name__
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """从错误响应头中解析 Retry-After（支持 retry-after-ms、秒数与 HTTP 日期）"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+_limiters_lock = threading.Lock()
+_limiters: Dict[str, ProviderRateLimiter] = {}
+
+
+def _limits_from_env(provider: str) -> Tuple[float, float]:
+    default_rpm, default_tpm = DEFAULT_LIMITS.get(provider, (60, 100000))
+    prefix = f"PROTEUS_{provider.upper()}"
+    return (
+        float(os.getenv(f"{prefix}_RPM", default_rpm)),
+        float(os.getenv(f"{prefix}_TPM", default_tpm)),
+    )
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """获取进程内共享的 provider 限流器"""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderRateLimiter(*_limits_from_env(provider))
+        return _limiters[provider]
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+🌊 Olympus Stream JSON - 增量 JSON 数组解析
+
+流式响应逐块到达时，每当顶层数组中的一个元素完整，立即解析并回调，
+不必等待整个响应结束。
+
+- 跳过第一个 '[' 之前的内容（如 ```json 代码块标记）
+- 正确处理字符串中的括号、逗号与转义
+- 重试时调用 restart()：已回调过的元素不会重复产出；新响应的内容可能不同，
+  consistent() 检查已回调的元素是否仍是当前响应的前缀
+- 元素无法解析时不抛出（记录在 error 中并停止增量解析），由调用方对完整响应再做一次解析
+"""
+
+import json
+from typing import Any, Callable, List, Optional
+
+
+class JSONArrayStream:
+    """增量 JSON 数组解析器"""
+
+    def __init__(self, on_item: Optional[Callable[[Any], None]] = None):
+        self.on_item = on_item
+        self.emitted = 0
+        self._emitted_items: List[Any] = []
+        self.restart()
+
+    def restart(self):
+        """重置解析状态（新的响应流开始时调用）"""
+        self.items: List[Any] = []  # 当前响应中已解析的元素
+        self.error: Optional[ValueError] = None
+        self._buf: List[str] = []
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._index = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def consistent(self) -> bool:
+        """已回调的元素是否与当前响应的前几个元素一致（重试后的新响应可能不同）"""
+        return self.items[: len(self._emitted_items)] == self._emitted_items
+
+    def feed(self, chunk: str) -> List[Any]:
+        """输入一段文本，返回本次新完成的元素"""
+        items: List[Any] = []
+        for ch in chunk:
+            if self._done:
+                break
+            if not self._started:
+                self._started = ch == "["
+                continue
+
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._buf.append(ch)
+            elif ch in "{[":
+                self._depth += 1
+                self._buf.append(ch)
+            elif ch in "}]":
+                if self._depth == 0:
+                    # 顶层数组结束
+                    self._flush(items)
+                    self._done = True
+                    continue
+                self._depth -= 1
+                self._buf.append(ch)
+                if self._depth == 0:
+                    self._flush(items)
+            elif ch == "," and self._depth == 0:
+                self._flush(items)
+            else:
+                self._buf.append(ch)
+        return items
+
+    def _flush(self, items: List[Any]):
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if not text:
+            return
+        try:
+            item = json.loads(text)
+        except ValueError as e:
+            self.error = e
+            self._done = True
+            return
+        self.items.append(item)
+        index = self._index
+        self._index += 1
+        if index < self.emitted:
+            return
+        self.emitted += 1
+        self._emitted_items.append(item)
+        items.append(item)
+        if self.on_item:
+            self.on_item(item)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+⏱️ Proteus Hub 压测脚本
+
+启动本地 LLM 替身服务（scripts/llm_standin_server.py），
+让 Hub 通过 local 提供商走完整的 HTTP 调用链，对比不同执行模式的耗时。
+数据写入临时目录，不影响项目内的记忆与日志。
+
+使用方式：
+python3 scripts/benchmark_hub.py --tasks 5 --latency 0.5 --error-rate 0.05
+
+录制与回放（同一份磁带比较不同版本的 Hub 吞吐，不再受提供商波动影响）：
+python3 scripts/benchmark_hub.py --record /tmp/bench.jsonl
+python3 scripts/benchmark_hub.py --replay /tmp/bench.jsonl --replay-scale 0.5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from llm_standin_server import StandinConfig, start_server
+
+MODES = {
+    "serial": {},
+    "parallel": {"parallel": True},
+    "batch": {"batch": True},
+    "parallel+batch": {"parallel": True, "batch": True},
+}
+
+
+def run_mode(hub, mode: str, tasks: int) -> float:
+    started = time.perf_counter()
+    for i in range(tasks):
+        task_id = hub.receive_task(f"压测任务 {mode} #{i}：为团队制定一周的内容计划")
+        hub.parse_task(task_id)
+        hub.form_claw(task_id)
+        hub.execute_task(task_id, **MODES[mode])
+        hub.deliver_task(task_id, "压测完成")
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proteus Hub 压测")
+    parser.add_argument("--tasks", type=int, default=3, help="每种模式执行的任务数")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="替身服务延迟中位数（秒）"
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--modes", default=",".join(MODES), help="逗号分隔的执行模式")
+    parser.add_argument("--record", help="把 LLM 调用录制到该磁带文件")
+    parser.add_argument("--replay", help="按该磁带回放 LLM 调用（不启动替身服务）")
+    parser.add_argument("--replay-scale", type=float, default=1.0, help="回放耗时倍数")
+    args = parser.parse_args()
+
+    server = None
+    if args.replay:
+        os.environ["PROTEUS_LLM_PROVIDER"] = "replay"
+        os.environ["PROTEUS_REPLAY_CASSETTE"] = args.replay
+        os.environ["PROTEUS_REPLAY_LATENCY_SCALE"] = str(args.replay_scale)
+    else:
+        server = start_server(
+            config=StandinConfig(
+                latency=args.latency,
+                latency_sigma=args.latency_sigma,
+                error_rate=args.error_rate,
+                rpm=args.rpm,
+                seed=42,
+            )
+        )
+        host, port = server.server_address
+        os.environ["PROTEUS_LLM_PROVIDER"] = "local"
+        os.environ["PROTEUS_LOCAL_BASE_URL"] = f"http://{host}:{port}/v1"
+    os.environ["PROTEUS_LLM_CACHE"] = "off"
+    if args.record:
+        os.environ["PROTEUS_LLM_RECORD"] = args.record
+
+    from hub import ProteusHub
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        hub = ProteusHub(base_path=Path(tmp))
+        for mode in args.modes.split(","):
+            timings[mode] = run_mode(hub, mode.strip(), args.tasks)
+        cassette_stats = hub.llm.get_cassette_stats()
+
+    if server:
+        server.shutdown()
+        server.server_close()
+
+    print("\n" + "=" * 50)
+    source = (
+        f"回放 {args.replay} ×{args.replay_scale}"
+        if args.replay
+        else f"延迟中位数 {args.latency}s"
+    )
+    print(f"⏱️  压测结果（{args.tasks} 个任务/模式，{source}）")
+    print("=" * 50)
+    for mode, seconds in timings.items():
+        print(f"   {mode:<16} {seconds:7.2f}s  ({seconds / args.tasks:.2f}s/任务)")
+    if server:
+        print(f"   替身服务统计：{server.state.stats}")
+    if cassette_stats:
+        print(f"   录制 / 回放统计：{cassette_stats}")
+    misses = cassette_stats.get("replay", {}).get("misses", 0)
+    if misses:
+        # 未命中的子任务按失败处理，耗时与录制时不可比
+        print(f"   ❌ 回放未命中 {misses} 次，请用当前版本重新录制磁带")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+🎭 Olympus LLM 替身服务 - 本地 OpenAI 兼容接口
+
+不访问网络、不消耗额度，用接近真实的 I/O 特征压测 Hub：
+- POST /v1/chat/completions（支持 stream=true 的 SSE 响应）
+- 延迟服从对数正态分布（中位数 + 离散度），流式响应先等待首 token 时间
+- 按比例随机返回 500 错误
+- 令牌桶限流（每分钟请求数 + 突发容量），超出时返回 429 与计算出的 Retry-After
+- 根据提示词生成结构正确的响应（任务分解 / Agent 执行 / 批量执行）
+- 模拟前缀缓存：重复出现的系统提示词计入 usage.prompt_tokens_details.cached_tokens，
+  并按命中比例缩短首 token 时间
+- GET /stats 查看请求统计
+
+使用方式：
+python3 scripts/llm_standin_server.py --port 8765 --latency 1.5 --error-rate 0.02 --rpm 120 --burst 10
+
+然后：
+PROTEUS_LLM_PROVIDER=local PROTEUS_LOCAL_BASE_URL=http://127.0.0.1:8765/v1 python3 demo.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+AGENT_TYPES = ["athena", "hermes", "apollo", "hephaestus", "themis", "daedalus"]
+
+
+class StandinConfig:
+    """替身服务配置"""
+
+    def __init__(
+        self,
+        latency: float = 1.0,
+        latency_sigma: float = 0.5,
+        ttft: float = 0.3,
+        error_rate: float = 0.0,
+        rpm: int = 0,
+        burst: int = None,
+        chunk_chars: int = 16,
+        seed: int = None,
+    ):
+        self.latency = latency  # 完整响应延迟中位数（秒）
+        self.latency_sigma = latency_sigma  # 对数正态分布离散度（0 为固定延迟）
+        self.ttft = ttft  # 流式响应首 token 时间占比上限（秒）
+        self.error_rate = error_rate  # 500 错误比例
+        self.rpm = rpm  # 每分钟请求上限（0 为不限流）
+        self.burst = burst or rpm  # 突发容量
+        self.chunk_chars = chunk_chars  # 流式响应每块字符数
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            if self.latency_sigma <= 0:
+                return self.latency
+            return self.random.lognormvariate(
+                math.log(max(self.latency, 1e-6)), self.latency_sigma
+            )
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+
+class StandinState:
+    """限流令牌桶与统计"""
+
+    def __init__(self, config: StandinConfig):
+        self.lock = threading.Lock()
+        self.rate = config.rpm / 60.0
+        self.capacity = config.burst
+        self.tokens = float(config.burst)
+        self.last = time.monotonic()
+        self.stats = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "throttled": 0,
+            "streamed": 0,
+            "prompt_cache_hits": 0,
+        }
+        self.prefixes = set()
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def admit(self) -> Optional[float]:
+        """取一个令牌；成功返回 None，否则返回需要等待的秒数"""
+        if self.rate <= 0:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.last) * self.rate
+            )
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate
+
+    def cached_prefix(self, system_prompt: str) -> bool:
+        """系统提示词之前出现过时视为命中前缀缓存"""
+        digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        with self.lock:
+            if digest in self.prefixes:
+                self.stats["prompt_cache_hits"] += 1
+                return True
+            self.prefixes.add(digest)
+            return False
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+
+def generate_content(system_prompt: str, user_prompt: str) -> str:
+    """根据提示词生成结构正确的 JSON 响应"""
+    if "任务规划" in system_prompt:
+        match = re.search(r"任务：(.+)", user_prompt)
+        task = match.group(1).strip()[:30] if match else "任务"
+        steps = ["需求分析", "方案设计", "核心实现", "质量审核"]
+        return json.dumps(
+            [
+                {
+                    "desc": f"{step}：{task}",
+                    "required_skills": ["analysis"] if i == 0 else ["execution"],
+                    "agent_type": AGENT_TYPES[i % len(AGENT_TYPES)],
+                    "estimated_time": 20 + 20 * i,
+                }
+                for i, step in enumerate(steps)
+            ],
+            ensure_ascii=False,
+        )
+
+    def result(desc: str) -> Dict:
+        return {
+            "success": True,
+            "output": f"已完成：{desc[:40]}",
+            "execution_time": 30,
+            "artifacts": [f"{uuid.uuid4().hex[:6]}.md"],
+            "logs": [f"执行 {desc[:20]}"],
+            "confidence": 0.85,
+        }
+
+    if "多个相互独立的任务" in system_prompt:
+        tasks = re.findall(r"^(\d+)\. (.+)$", user_prompt, flags=re.MULTILINE)
+        return json.dumps(
+            [dict(result(desc), index=int(index)) for index, desc in tasks],
+            ensure_ascii=False,
+        )
+
+    match = re.search(r"任务描述：(.+)", user_prompt)
+    return json.dumps(result(match.group(1) if match else "任务"), ensure_ascii=False)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """OpenAI 兼容请求处理"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    @property
+    def config(self) -> StandinConfig:
+        return self.server.config
+
+    @property
+    def state(self) -> StandinState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: Dict, headers: Dict = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.state.lock:
+                stats = dict(self.state.stats)
+            self._send_json(200, stats)
+        else:
+            self._send_json(200, {"status": "ok"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        self.state.count("requests")
+        wait = self.state.admit()
+        if wait is not None:
+            self.state.count("throttled")
+            self._send_json(
+                429,
+                {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                {
+                    "Retry-After": str(math.ceil(wait)),
+                    "Retry-After-Ms": str(int(wait * 1000) + 1),
+                },
+            )
+            return
+
+        latency = self.config.sample_latency()
+        if self.config.should_fail():
+            time.sleep(latency * 0.2)
+            self.state.count("errors")
+            self._send_json(
+                500,
+                {
+                    "error": {
+                        "message": "standin injected error",
+                        "type": "server_error",
+                    }
+                },
+            )
+            return
+
+        system_prompt, user_prompt = _split_messages(request.get("messages", []))
+        content = generate_content(system_prompt, user_prompt)
+        usage = {
+            "prompt_tokens": _estimate_tokens(system_prompt + user_prompt),
+            "completion_tokens": _estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        cached = (
+            _estimate_tokens(system_prompt)
+            if self.state.cached_prefix(system_prompt)
+            else 0
+        )
+        usage["prompt_tokens_details"] = {"cached_tokens": cached}
+
+        if request.get("stream"):
+            self._stream(request, content, usage, latency)
+        else:
+            time.sleep(latency)
+            self._send_json(
+                200,
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "standin"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+        self.state.count("completed")
+
+    def _stream(self, request: Dict, content: str, usage: Dict, latency: float):
+        """SSE 流式响应：首 token 等待后按块均匀输出"""
+        self.state.count("streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        # 命中前缀缓存的部分不需要重新预填充
+        cached_ratio = (
+            usage["prompt_tokens_details"]["cached_tokens"] / usage["prompt_tokens"]
+        )
+        ttft = min(self.config.ttft * (1 - 0.5 * cached_ratio), latency)
+        pieces = [
+            content[i : i + self.config.chunk_chars]
+            for i in range(0, len(content), self.config.chunk_chars)
+        ]
+        interval = (latency - ttft) / max(len(pieces), 1)
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def event(payload: Dict):
+            self._write_chunk(
+                f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+            )
+
+        time.sleep(ttft)
+        for piece in pieces:
+            event(
+                {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "model": request.get("model", "standin"),
+                    "choices": [
+                        {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                    ],
+                }
+            )
+            time.sleep(interval)
+
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event(
+                {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "choices": [],
+                    "usage": usage,
+                }
+            )
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class StandinServer(ThreadingHTTPServer):
+    """客户端中止请求（取消、超时）时不打印异常"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def _split_messages(messages: List[Dict]) -> Tuple[str, str]:
+    system = "\n".join(
+        m.get("content", "") for m in messages if m.get("role") == "system"
+    )
+    user = "\n".join(
+        m.get("content", "") for m in messages if m.get("role") != "system"
+    )
+    return system, user
+
+
+def start_server(
+    host: str = "127.0.0.1", port: int = 0, config: StandinConfig = None
+) -> ThreadingHTTPServer:
+    """
+    在后台线程启动替身服务
+
+    Returns:
+        服务实例（server.server_address 为实际地址，server.shutdown() 停止）
+    """
+    server = StandinServer((host, port), StandinHandler)
+    server.config = config or StandinConfig()
+    server.state = StandinState(server.config)
+    threading.Thread(
+        target=server.serve_forever, name="olympus-standin", daemon=True
+    ).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Olympus LLM 替身服务（OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=1.0, help="响应延迟中位数（秒）"
+    )
+    parser.add_argument(
+        "--latency-sigma", type=float, default=0.5, help="对数正态离散度，0 为固定延迟"
+    )
+    parser.add_argument(
+        "--ttft", type=float, default=0.3, help="流式首 token 时间（秒）"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 错误比例")
+    parser.add_argument("--rpm", type=int, default=0, help="每分钟请求上限，0 为不限流")
+    parser.add_argument(
+        "--burst", type=int, default=None, help="限流突发容量，默认等于 rpm"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = StandinConfig(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        ttft=args.ttft,
+        error_rate=args.error_rate,
+        rpm=args.rpm,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    server = StandinServer((args.host, args.port), StandinHandler)
+    server.config = config
+    server.state = StandinState(config)
+
+    print(f"🎭 LLM 替身服务已启动：http://{args.host}:{args.port}/v1")
+    print(
+        f"   延迟中位数 {args.latency}s (σ={args.latency_sigma})，错误率 {args.error_rate:.0%}，"
+        f"限流 {args.rpm or '无'} rpm"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
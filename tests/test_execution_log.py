@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+🧪 Proteus System - 执行日志测试
+
+测试场景：
+1. 缓冲异步写入、组提交与 fsync 策略
+2. 共享分段日志与 task 索引
+3. 流式过滤读取、tail 与跨任务查询
+4. 轮转、压缩与保留，读取跨越轮转段
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# 添加核心模块路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
+
+from evolution import EvolutionEngine
+import log_reader
+from execution_log import ExecutionLogger
+from log_reader import LogWarning
+from log_rotation import RotationPolicy, drain_background
+from log_writer import BufferedLogWriter
+
+
+def test_buffered_writer_group_commits_and_closes_finished_tasks(tmp_path):
+    writer = BufferedLogWriter(
+        flush_interval=30, max_batch=100, max_open_files=2, fsync="task"
+    )
+    logger = ExecutionLogger(tmp_path / "tasks", writer=writer)
+    try:
+        for task_id in ("a", "b", "c"):
+            logger.start_task(task_id, f"任务 {task_id}", {})
+            logger.log_decision(task_id, "plan", "分解", "测试")
+        # 事件仍在内存中攒批，执行路径上没有写文件
+        assert not list((tmp_path / "tasks").glob("*.jsonl"))
+
+        # 任务结束事件立即提交整批，该任务的文件 fsync 后关闭
+        logger.complete_task("a", {"success": True})
+        for _ in range(100):
+            if writer.get_stats()["commits"]:
+                break
+            time.sleep(0.01)
+        stats = writer.get_stats()
+        assert stats["commits"] == 1 and stats["events"] == 7
+        assert stats["writes"] == 3 and stats["fsyncs"] == 1
+        assert stats["open_files"] == 2
+
+        # 读取前等待已记录的事件落盘；句柄超过上限时关闭最久未用的
+        logger.log_exception("b", "出错")
+        logger.start_task("d", "任务 d", {})
+        assert [e["event"] for e in logger.get_task_logs("b")] == [
+            "task_start",
+            "decision",
+            "exception",
+        ]
+        assert [e["event"] for e in logger.get_task_logs("a")][-1] == "task_complete"
+        assert writer.get_stats()["evictions"] == 1
+    finally:
+        writer.close()
+    assert writer.get_stats()["open_files"] == 0
+
+
+def test_writer_thread_survives_failing_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_reader, "_warned", set())
+
+    class BrokenStore:
+        def append_batch(self, items):
+            raise RuntimeError("store bug")
+
+        def sync(self):
+            pass
+
+    writer = BufferedLogWriter(flush_interval=0.01)
+    try:
+        # 写入线程中的故障以 LogWarning 发出，同类故障只警告一次
+        with pytest.warns(LogWarning, match="store bug") as caught:
+            for key in ("a", "b"):
+                writer.write(BrokenStore(), "{}\n", final=True, key=key)
+                assert writer.flush(timeout=2)
+        assert len(caught) == 1
+        # 提交失败后后台线程仍在工作
+        writer.write(tmp_path / "b.jsonl", "{}\n", final=True)
+        assert writer.flush(timeout=2)
+        assert (tmp_path / "b.jsonl").read_text() == "{}\n"
+        assert writer.get_stats()["errors"] == 2
+    finally:
+        writer.close()
+
+
+def test_segmented_layout_shares_files_and_rebuilds_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTEUS_LOG_SEGMENT_BYTES", "2048")
+    # 只检查段与索引文件本身，封存的段不压缩
+    monkeypatch.setenv("PROTEUS_LOG_COMPRESSION", "none")
+    log_path = tmp_path / "tasks"
+    writer = BufferedLogWriter(flush_interval=0.01)
+    try:
+        logger = ExecutionLogger(log_path, writer=writer, layout="segments")
+        task_ids = [f"task-{i}" for i in range(30)]
+        for task_id in task_ids:
+            logger.start_task(task_id, "分段日志", {})
+            logger.log_decision(task_id, "plan", "分解", "测试")
+            logger.complete_task(task_id, {"success": True})
+        logger.close()
+
+        # 文件数只随数据量增长（每段一个日志 + 一个索引）
+        segments = sorted(log_path.glob("segment-*.jsonl"))
+        assert 1 < len(segments) < len(task_ids)
+        assert len(list(log_path.iterdir())) == 2 * len(segments)
+        assert [e["event"] for e in logger.get_task_logs("task-7")] == [
+            "task_start",
+            "decision",
+            "task_complete",
+        ]
+
+        # 模拟写入中途退出：最后一段的索引丢失、段尾留下半行
+        last = segments[-1]
+        last.with_suffix(".idx").write_bytes(b"")
+        with open(last, "ab") as f:
+            f.write(b'{"event": "decision", "task_id": "task-29"')
+
+        restarted = ExecutionLogger(log_path, writer=writer, layout="segments")
+        assert restarted.store.get_stats()["repaired"] > 0
+        for task_id in ("task-0", "task-29"):
+            assert [e["event"] for e in restarted.get_task_logs(task_id)] == [
+                "task_start",
+                "decision",
+                "task_complete",
+            ]
+        assert last.read_bytes().endswith(b"\n")
+        restarted.close()
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("layout", ["files", "segments"])
+def test_filtered_streaming_reads_tail_and_query(tmp_path, layout):
+    writer = BufferedLogWriter(flush_interval=0.01)
+    logger = ExecutionLogger(tmp_path / "tasks", writer=writer, layout=layout)
+    try:
+        for task_id in ("a", "b"):
+            logger.start_task(task_id, "流式读取", {})
+            for i in range(300):
+                logger.log_subtask_complete(task_id, f"st_{i}", {"output": "x" * 40})
+        logger.flush()
+        midpoint = datetime.now()
+        logger.log_exception("a", "Agent unavailable")
+        logger.log_exception("b", "timeout")
+        logger.log_decision("b", "retry", "重试", "超时")
+
+        assert [
+            e["error"] for e in logger.iter_task_logs("a", events=["exception"])
+        ] == ["Agent unavailable"]
+        assert [e["event"] for e in logger.get_task_logs("b", since=midpoint)] == [
+            "exception",
+            "decision",
+        ]
+        assert len(logger.get_task_logs("b", until=midpoint)) == 301
+
+        # tail 从末尾反向读取
+        assert [e["event"] for e in logger.tail("b", 2)] == ["exception", "decision"]
+        assert [
+            e["subtask_id"] for e in logger.tail("a", 2, events="subtask_complete")
+        ] == ["st_298", "st_299"]
+
+        errors = {
+            (e["task_id"], e["error"]) for e in logger.query(events=["exception"])
+        }
+        assert errors == {("a", "Agent unavailable"), ("b", "timeout")}
+        assert len(list(logger.query(since=midpoint, limit=2))) == 2
+        assert [e["event"] for e in logger.query(task_ids=["b"], since=midpoint)] == [
+            "exception",
+            "decision",
+        ]
+    finally:
+        logger.close()
+        writer.close()
+
+
+def test_rotation_compresses_and_expires_while_reads_span_segments(
+    tmp_path, monkeypatch
+):
+    # 进化日志：按大小轮转，轮转段后台压缩，只保留最新 3 段
+    engine = EvolutionEngine(
+        tmp_path / "memory",
+        tmp_path / "evolution",
+        rotation=RotationPolicy(max_bytes=512, compression="gzip", retention_files=3),
+    )
+    for i in range(40):
+        engine._log_evolution("pattern_discovered", {"i": i})
+    drain_background()
+    rotated = sorted((tmp_path / "evolution").glob("evolution_log.*.jsonl*"))
+    assert len(rotated) == 3 and all(path.suffix == ".gz" for path in rotated)
+    assert [e["data"]["i"] for e in engine.get_evolution_history(limit=15)] == list(
+        range(25, 40)
+    )
+    history = [e["data"]["i"] for e in engine.get_evolution_history(limit=0)]
+    assert history == list(range(history[0], 40)) and history[0] > 0
+
+    # 执行日志（files）：空闲任务压缩，过期任务删除，之后的追加与压缩部分连续读取
+    writer = BufferedLogWriter(flush_interval=0.01)
+    logger = ExecutionLogger(
+        tmp_path / "tasks",
+        writer=writer,
+        rotation=RotationPolicy(max_age=60, compression="gzip", retention_days=1),
+    )
+    try:
+        for task_id in ("old", "idle", "fresh"):
+            logger.start_task(task_id, "轮转", {})
+            logger.complete_task(task_id, {"success": True})
+        logger.flush()
+        drain_background()
+        now = time.time()
+        os.utime(tmp_path / "tasks" / "old.jsonl", (now - 2 * 86400, now - 2 * 86400))
+        os.utime(tmp_path / "tasks" / "idle.jsonl", (now - 120, now - 120))
+        assert logger.maintain() == {"compressed": 1, "removed": 1}
+        assert sorted(path.name for path in (tmp_path / "tasks").iterdir()) == [
+            "fresh.jsonl",
+            "idle.jsonl.gz",
+        ]
+
+        logger.log_exception("idle", "late")
+        assert [e["event"] for e in logger.get_task_logs("idle")] == [
+            "task_start",
+            "task_complete",
+            "exception",
+        ]
+        assert [e["event"] for e in logger.tail("idle", 2)] == [
+            "task_complete",
+            "exception",
+        ]
+        assert {e["task_id"] for e in logger.query(events=["task_start"])} == {
+            "idle",
+            "fresh",
+        }
+        assert logger.get_task_logs("old") == []
+    finally:
+        logger.close()
+
+    # 执行日志（segments）：封存的段压缩后仍按索引读取，超出保留个数的段连同索引删除
+    monkeypatch.setenv("PROTEUS_LOG_SEGMENT_BYTES", "1024")
+    log_path = tmp_path / "segments"
+    logger = ExecutionLogger(
+        log_path,
+        writer=writer,
+        layout="segments",
+        rotation=RotationPolicy(compression="gzip"),
+    )
+    try:
+        for i in range(20):
+            logger.start_task(f"task-{i}", "分段轮转", {})
+            logger.log_decision(f"task-{i}", "plan", "分解", "测试")
+            logger.complete_task(f"task-{i}", {"success": True})
+        logger.flush()
+        drain_background()
+        # 当前段与最近 2 个封存段保持未压缩，可按偏移直接读取；更早的段已压缩
+        raw = sorted(log_path.glob("segment-*.jsonl"))
+        assert len(raw) == 3
+        compressed = sorted(log_path.glob("segment-*.jsonl.gz"))
+        assert compressed and compressed[-1].name < raw[0].name
+        assert [e["event"] for e in logger.get_task_logs("task-0")] == [
+            "task_start",
+            "decision",
+            "task_complete",
+        ]
+        assert [e["event"] for e in logger.tail("task-0", 2)] == [
+            "decision",
+            "task_complete",
+        ]
+
+        logger.rotation.retention_files = 2
+        assert logger.maintain()["removed"] > 0
+        assert (
+            len(list(log_path.glob("segment-*.jsonl*"))) == 3
+        )  # 保留 2 个封存段 + 当前段
+        assert logger.get_task_logs("task-0") == []
+        assert [e["event"] for e in logger.get_task_logs("task-19")] == [
+            "task_start",
+            "decision",
+            "task_complete",
+        ]
+        assert len(list(log_path.glob("segment-*.idx"))) == 3
+    finally:
+        logger.close()
+        writer.close()
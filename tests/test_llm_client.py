@@ -0,0 +1,927 @@
+#!/usr/bin/env python3
+"""
+🧪 Proteus System - LLM 客户端测试
+
+测试场景：
+1. 持久化响应缓存
+2. 并发调度与共享客户端
+3. 限流与 Retry-After 退避重试
+4. 多提供商熔断与对冲请求
+5. 上下文按 token 预算压缩
+6. 相同在途请求合并
+7. 流式分解与增量 JSON 解析
+8. 同一 Agent 子任务批量执行
+9. local 提供商插件与本地替身服务（客户端不限流）
+10. 按子任务复杂度路由模型
+11. 调用遥测直方图
+12. 系统提示词前缀缓存
+13. 截止时间、超时与取消
+14. 推测分解与模式匹配竞速
+15. 调用录制与回放
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# 添加核心模块路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from context_compactor import ContextCompactor
+from deadline import Cancelled, Deadline, DeadlineExceeded
+from llm_cache import LLMResponseCache
+from llm_cassette import Cassette, CassetteMiss
+from llm_integration import LLMClient
+from llm_pool import LLMDispatcher, get_shared_client
+from llm_providers import AnthropicProvider, OpenAIProvider
+from llm_standin_server import StandinConfig, start_server
+from llm_router import CircuitBreaker, ProviderRouter
+from llm_telemetry import LLMTelemetry
+from model_routing import ModelRoutingPolicy
+from rate_limit import RetryPolicy, TokenBucket, retry_after_seconds
+from stream_json import JSONArrayStream
+
+SUBTASKS_JSON = json.dumps(
+    [
+        {
+            "desc": "调研",
+            "required_skills": ["research"],
+            "agent_type": "athena",
+            "estimated_time": 30,
+        },
+        {
+            "desc": "撰写",
+            "required_skills": ["writing"],
+            "agent_type": "apollo",
+            "estimated_time": 60,
+        },
+    ],
+    ensure_ascii=False,
+)
+
+RESULT_JSON = json.dumps(
+    {"success": True, "output": "完成", "artifacts": ["a.md"]}, ensure_ascii=False
+)
+
+
+class FakeOpenAI:
+    """模拟 openai.OpenAI 客户端，记录调用次数"""
+
+    def __init__(self, content: str = SUBTASKS_JSON, delay: float = 0.0):
+        self.content = content
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if kwargs.get("stream"):
+            return self._stream()
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _stream(self):
+        for i in range(0, len(self.content), 7):
+            delta = SimpleNamespace(content=self.content[i : i + 7])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+class FakeAnthropic:
+    """模拟 anthropic.Anthropic 客户端"""
+
+    def __init__(self, content: str = SUBTASKS_JSON, delay: float = 0.0):
+        self.content = content
+        self.delay = delay
+        self.calls = []
+        self.usage = None
+        self.messages = SimpleNamespace(create=self._create)
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=self.content)], usage=self.usage
+        )
+
+
+def make_client(tmp_path, fake=None, cache=True, dispatcher=None) -> LLMClient:
+    client = LLMClient(provider="mock", dispatcher=dispatcher)
+    client.provider = "openai"
+    client.api_key = "test-key"
+    client.openai_client = fake or FakeOpenAI()
+    client.cache = LLMResponseCache(tmp_path / "cache") if cache else None
+    return client
+
+
+def test_response_cache_hits_and_survives_restart(tmp_path):
+    client = make_client(tmp_path)
+    first = client.decompose_task("生成内容计划")
+    second = client.decompose_task("生成内容计划")
+
+    assert len(client.openai_client.calls) == 1
+    assert [st["desc"] for st in first] == [st["desc"] for st in second]
+    assert first[0]["subtask_id"] != second[0]["subtask_id"]
+    assert client.get_cache_stats()["hits"] == 1
+
+    client.decompose_task("生成内容计划", use_cache=False)
+    assert len(client.openai_client.calls) == 2
+
+    restarted = make_client(tmp_path)
+    restarted.decompose_task("生成内容计划")
+    assert restarted.openai_client.calls == []
+    assert restarted.get_cache_stats()["entries"] == 1
+
+    # 无法解析的响应不写入缓存，下次仍请求提供商
+    broken = make_client(tmp_path / "broken", FakeOpenAI(content="抱歉，无法生成"))
+    assert broken.execute_agent_task("apollo", "撰写")["output"] != "完成"
+    broken.openai_client.content = RESULT_JSON
+    assert broken.execute_agent_task("apollo", "撰写")["output"] == "完成"
+    assert len(broken.openai_client.calls) == 2
+    assert broken.get_cache_stats()["entries"] == 1
+
+    # 备用提供商的响应按主提供商的键缓存，之后直接命中
+    failover = make_client(tmp_path / "failover")
+    failover.openai_client.chat.completions.create = lambda **kwargs: (
+        _ for _ in ()
+    ).throw(ValueError("bad request"))
+    failover.anthropic_client = FakeAnthropic(RESULT_JSON)
+    failover.fallback_providers = ["anthropic"]
+    failover.execute_agent_task("apollo", "撰写")
+    failover.execute_agent_task("apollo", "撰写")
+    assert len(failover.anthropic_client.calls) == 1
+    assert failover.get_cache_stats()["hits"] == 1
+
+
+def test_response_cache_ttl_and_lru_limits(tmp_path):
+    cache = LLMResponseCache(tmp_path / "cache", max_entries=3, ttl_seconds=-1)
+    cache.put("a" * 64, "expired")
+    assert cache.get("a" * 64) is None
+    assert cache.get_stats()["expired"] == 1
+
+    cache = LLMResponseCache(tmp_path / "lru", max_entries=3)
+    for i in range(5):
+        cache.put(f"{i:064d}", f"value {i}")
+    stats = cache.get_stats()
+    assert stats["entries"] <= 3
+    assert stats["evictions"] >= 2
+
+
+def test_map_agent_tasks_overlaps_calls_within_provider_limit(tmp_path):
+    fake = FakeOpenAI(RESULT_JSON, delay=0.1)
+    client = make_client(
+        tmp_path,
+        fake,
+        cache=False,
+        dispatcher=LLMDispatcher(max_workers=8, per_provider_limit=2),
+    )
+
+    calls = [
+        {"agent_type": "apollo", "task_desc": f"撰写第 {i} 天文案"} for i in range(4)
+    ]
+    started = time.time()
+    results = client.map_agent_tasks(calls)
+    elapsed = time.time() - started
+
+    assert [r["output"] for r in results] == ["完成"] * 4
+    assert fake.max_active == 2
+    assert elapsed < 0.35
+
+
+def test_shared_client_is_reused_per_provider_and_key():
+    created = []
+    factory = lambda: created.append(object()) or created[-1]
+    first = get_shared_client("test_provider", "key-1", factory)
+    assert get_shared_client("test_provider", "key-1", factory) is first
+    assert get_shared_client("test_provider", "key-2", factory) is not first
+    assert len(created) == 2
+
+
+class ThrottleError(Exception):
+    """模拟 SDK 的 429 错误"""
+
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(
+            status_code=429, headers={"retry-after": retry_after}
+        )
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate_per_minute=600, capacity=5)
+    started = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_throttled_call_retries_after_retry_after(tmp_path):
+    fake = FakeOpenAI(RESULT_JSON)
+    original = fake._create
+    failures = [ThrottleError("0.05")]
+
+    def flaky_create(**kwargs):
+        if failures:
+            raise failures.pop()
+        return original(**kwargs)
+
+    fake.chat.completions.create = flaky_create
+    client = make_client(tmp_path, fake, cache=False)
+    client.retry_policy = RetryPolicy(max_retries=2, base_delay=0.01)
+
+    result = client.execute_agent_task("apollo", "撰写文案")
+    assert result["output"] == "完成"
+    assert len(fake.calls) == 1
+    assert client.get_rate_limit_stats()["throttled"] >= 1
+    assert retry_after_seconds(ThrottleError("2")) == 2.0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_router_fails_over_and_hedges_slow_provider(tmp_path):
+    client = make_client(tmp_path, FakeOpenAI(RESULT_JSON, delay=0.3), cache=False)
+    client.anthropic_client = FakeAnthropic(RESULT_JSON.replace("完成", "备用完成"))
+    client.fallback_providers = ["anthropic"]
+    client.router = ProviderRouter(["openai", "anthropic"], hedge_after=0.05)
+    for _ in range(5):
+        client.router.latencies["openai"].record(1.0)
+
+    started = time.time()
+    result = client.execute_agent_task("apollo", "撰写文案")
+    assert result["output"] == "备用完成"
+    assert time.time() - started < 0.25
+    assert client.get_provider_stats()["anthropic"]["hedge_wins"] == 1
+
+    client.router = ProviderRouter(["openai", "anthropic"])
+    client.openai_client.chat.completions.create = lambda **kwargs: (
+        _ for _ in ()
+    ).throw(ValueError("bad request"))
+    assert client.execute_agent_task("apollo", "撰写文案")["output"] == "备用完成"
+    assert client.get_provider_stats()["openai"]["failures"] == 1
+
+
+def test_context_compaction_keeps_prompt_size_flat(tmp_path):
+    fake = FakeOpenAI(content=RESULT_JSON)
+    client = make_client(tmp_path, fake=fake, cache=False)
+    client.compactor = ContextCompactor(token_budget=200)
+
+    subtasks = [
+        {
+            "desc": f"子任务 {i}",
+            "agent_type": "apollo",
+            "status": "completed",
+            "result": {"output": "很长的输出" * 200},
+        }
+        for i in range(40)
+    ]
+    context = {
+        "task_id": "t1",
+        "task_desc": "生成内容计划",
+        "subtasks": subtasks,
+        "claw": {
+            "lead_agent": "apollo",
+            "members": [
+                {"agent_id": f"agent-{i}", "skills": ["x"] * 50} for i in range(10)
+            ],
+        },
+    }
+
+    compacted = client.compactor.compact(context, focus="子任务 20")
+    assert compacted["task_desc"] == "生成内容计划"
+    assert compacted["progress"] == "21/40"
+    assert [st["desc"] for st in compacted.get("related_subtasks", [])] in (
+        [],
+        ["子任务 19", "子任务 21"],
+    )
+    assert "task_id" not in compacted
+
+    # 统计不序列化完整上下文：未选入的子任务不会被读取
+    subtasks[0]["result"]["raw"] = object()
+    assert client.compactor.compact(context, focus="子任务 20")["progress"] == "21/40"
+    del subtasks[0]["result"]["raw"]
+
+    for i in (1, 20, 39):
+        client.execute_agent_task("apollo", f"子任务 {i}", context=context)
+
+    stats = client.get_prompt_stats()
+    assert stats["calls"] == 3
+    assert stats["max_tokens"] < 500
+    assert stats["context"]["reduction"] > 0.9
+
+
+def test_identical_inflight_decompositions_are_coalesced(tmp_path):
+    fake = FakeOpenAI(delay=0.2)
+    client = make_client(tmp_path, fake=fake, cache=False)
+
+    barrier = threading.Barrier(5)
+
+    def decompose(desc):
+        barrier.wait()
+        return client.decompose_task(desc)
+
+    futures = [
+        client.submit(
+            decompose, "生成  一周内容计划 " if i % 2 else "生成 一周内容计划"
+        )
+        for i in range(5)
+    ]
+    results = [f.result() for f in futures]
+
+    assert len(fake.calls) == 1
+    assert client.get_inflight_stats()["coalesced"] == 4
+    assert all([st["desc"] for st in r] == ["调研", "撰写"] for r in results)
+    # 每个调用方拿到独立副本
+    results[0][0]["status"] = "completed"
+    assert results[1][0]["status"] == "pending"
+    assert len({r[0]["subtask_id"] for r in results}) == 5
+
+
+def test_json_array_stream_emits_items_as_they_complete():
+    items = []
+    stream = JSONArrayStream(items.append)
+    text = '```json\n[{"desc": "含 ] 和 , 的\\"描述\\"", "n": [1, 2]}, {"desc": "b"}, 3]\n```'
+
+    stream.feed(text[:40])
+    assert items == []
+    stream.feed(text[40:60])
+    assert items == [{"desc": '含 ] 和 , 的"描述"', "n": [1, 2]}]
+    stream.feed(text[60:])
+    assert items[1:] == [{"desc": "b"}, 3] and stream.done
+
+    # 重试时不重复产出已回调的元素；新响应内容不同时不再一致
+    stream.restart()
+    stream.feed('[{"desc": "x"}, {"desc": "y"}, {"desc": "z"}, 4]')
+    assert items[3:] == [4] and not stream.consistent()
+
+    # 元素无法解析时不抛出，停止增量解析
+    broken = JSONArrayStream(items.append)
+    assert broken.feed('[{"desc": "a"}, {desc: b}, {"desc": "c"}]') == [{"desc": "a"}]
+    assert broken.done and isinstance(broken.error, ValueError)
+
+
+def test_streaming_decomposition_calls_back_per_subtask(tmp_path):
+    fake = FakeOpenAI()
+    client = make_client(tmp_path, fake=fake)
+    seen = []
+
+    subtasks = client.decompose_task("流式分解", on_subtask=seen.append)
+
+    assert fake.calls[0]["stream"] is True
+    assert [st["desc"] for st in seen] == ["调研", "撰写"]
+    assert [st["subtask_id"] for st in seen] == [st["subtask_id"] for st in subtasks]
+
+    # 命中缓存时同样逐个回调
+    seen.clear()
+    client.decompose_task("流式分解", on_subtask=seen.append)
+    assert len(fake.calls) == 1 and len(seen) == 2
+
+    # 流中断后重试得到不同的响应：返回最终响应的分解，不混入上次已回调的子任务
+    class Timeout(Exception):
+        pass
+
+    retried = FakeOpenAI()
+    first_stream = retried._stream
+
+    def interrupted():
+        yield from list(first_stream())[:15]
+        retried.content = SUBTASKS_JSON.replace("调研", "检索").replace("撰写", "编辑")
+        retried._stream = first_stream
+        raise Timeout("stream interrupted")
+
+    retried._stream = interrupted
+    client = make_client(tmp_path / "retry", fake=retried, cache=False)
+    client.retry_policy.base_delay = 0
+    seen.clear()
+    subtasks = client.decompose_task("流式重试", on_subtask=seen.append)
+    assert [st["desc"] for st in seen] == ["调研", "编辑"]
+    assert [st["desc"] for st in subtasks] == ["检索", "编辑"]
+    assert (
+        len(retried.calls) == 2
+        and client.get_provider_stats()["openai"]["failures"] == 0
+    )
+
+    # 响应中的 JSON 无法解析：回退到模拟分解，不计入提供商失败
+    client = make_client(
+        tmp_path / "malformed",
+        fake=FakeOpenAI(content='[{"desc": "a"}, {desc: b}]'),
+        cache=False,
+    )
+    assert not any(
+        st["llm_generated"]
+        for st in client.decompose_task("坏响应", on_subtask=lambda st: None)
+    )
+    assert client.get_provider_stats()["openai"]["failures"] == 0
+
+
+def test_agent_batch_splits_response_and_falls_back(tmp_path):
+    batch_json = json.dumps(
+        [
+            {"index": 2, "success": True, "output": "文案二"},
+            {"index": 1, "success": True, "output": "文案一"},
+        ],
+        ensure_ascii=False,
+    )
+    fake = FakeOpenAI(content=batch_json)
+    client = make_client(tmp_path, fake=fake, cache=False)
+
+    results = client.execute_agent_batch("apollo", ["撰写周一文案", "撰写周二文案"])
+    assert [r["output"] for r in results] == ["文案一", "文案二"]
+    assert len(fake.calls) == 1
+    assert fake.calls[0]["max_tokens"] == 2 * LLMClient.MAX_TOKENS
+
+    # 响应无法拆分时逐个调用
+    fake.content = RESULT_JSON
+    results = client.execute_agent_batch("apollo", ["撰写周三文案", "撰写周四文案"])
+    assert [r["output"] for r in results] == ["完成", "完成"]
+    assert len(fake.calls) == 4
+    assert client.get_batch_stats() == {
+        "batches": 1,
+        "batched_subtasks": 2,
+        "fallbacks": 1,
+    }
+
+
+def test_local_provider_against_standin_server(tmp_path, monkeypatch):
+    server = start_server(
+        config=StandinConfig(latency=0.05, latency_sigma=0, ttft=0.01, rpm=300, burst=2)
+    )
+    try:
+        host, port = server.server_address
+        monkeypatch.setenv("PROTEUS_LOCAL_BASE_URL", f"http://{host}:{port}/v1")
+        client = LLMClient(provider="local", cache_dir=tmp_path / "cache")
+        assert client.provider == "local" and client._is_live()
+        # 旧环境变量名仍可选择提供商
+        monkeypatch.delenv("PROTEUS_LLM_PROVIDER", raising=False)
+        monkeypatch.setenv("OLYMPUS_LLM_PROVIDER", "local")
+        assert LLMClient(cache=False).provider == "local"
+
+        seen = []
+        subtasks = client.decompose_task("压测任务", on_subtask=seen.append)
+        assert len(subtasks) == 4 and all(st["llm_generated"] for st in subtasks)
+        assert [st["subtask_id"] for st in seen] == [
+            st["subtask_id"] for st in subtasks
+        ]
+
+        results = client.execute_agent_batch("apollo", ["撰写 A", "撰写 B"])
+        assert [r["output"] for r in results] == ["已完成：撰写 A", "已完成：撰写 B"]
+
+        # 第 3 个请求被限流（429 + Retry-After），重试后成功
+        result = client.execute_agent_task("themis", "审核")
+        assert result["output"] == "已完成：审核"
+        assert server.state.stats["throttled"] >= 1
+        assert client.get_rate_limit_stats()["throttled"] >= 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_local_provider_is_not_throttled_client_side(tmp_path, monkeypatch):
+    server = start_server(config=StandinConfig(latency=0, latency_sigma=0, ttft=0))
+    try:
+        host, port = server.server_address
+        monkeypatch.setenv("PROTEUS_LOCAL_BASE_URL", f"http://{host}:{port}/v1")
+        client = LLMClient(provider="local", cache=False)
+
+        # 超过通用默认配额（60 RPM / 100k TPM）的调用量
+        for i in range(70):
+            assert (
+                client.execute_agent_task("apollo", f"撰写 {i}")["output"]
+                == f"已完成：撰写 {i}"
+            )
+        stats = client.get_rate_limit_stats()
+        assert stats["requests"] >= 70
+        assert stats["wait_seconds"] == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_model_routing_by_subtask_complexity(tmp_path):
+    fake = FakeOpenAI(content=RESULT_JSON)
+    client = make_client(tmp_path, fake=fake, cache=False)
+
+    client.execute_agent_task(
+        "themis",
+        "质量检查",
+        subtask={"estimated_time": 20, "required_skills": ["review"]},
+    )
+    client.execute_agent_task(
+        "hephaestus",
+        "核心功能实现",
+        subtask={"estimated_time": 120, "required_skills": ["coding"]},
+    )
+    client.execute_agent_task("daedalus", "接口说明", subtask={"estimated_time": 20})
+
+    assert [(c["model"], c["max_tokens"]) for c in fake.calls] == [
+        ("gpt-4o-mini", 800),
+        ("gpt-4o", 4000),
+        ("gpt-4o", 2000),
+    ]
+    stats = client.get_routing_stats()
+    assert stats["tiers"] == {"fast": 1, "standard": 1, "deep": 1}
+    assert "daedalus 最低 standard" in stats["recent"][-1]["reasons"]
+
+    # 配置覆盖与关闭
+    policy = ModelRoutingPolicy(
+        {"tiers": {"fast": {"models": {"openai": "tiny"}}}, "fast_max_minutes": 60}
+    )
+    assert (
+        policy.route("apollo", {"estimated_time": 45}).model_for("openai", "gpt-4o")
+        == "tiny"
+    )
+    assert (
+        ModelRoutingPolicy(enabled=False).route("apollo", {"estimated_time": 5})["tier"]
+        == "standard"
+    )
+
+
+def test_telemetry_histograms_by_provider_model_and_agent(tmp_path):
+    fake = FakeOpenAI(content=RESULT_JSON)
+    client = make_client(tmp_path, fake=fake)
+
+    client.execute_agent_task("themis", "质量检查", subtask={"estimated_time": 20})
+    client.execute_agent_task("themis", "质量检查", subtask={"estimated_time": 20})
+    fake.content = "不是 JSON"
+    result = client.execute_agent_task("apollo", "撰写文案", use_cache=False)
+    assert result["artifacts"]  # fallback 到模拟执行
+
+    rows = {(r["model"], r["agent_type"]): r for r in client.get_telemetry()}
+    themis = rows[("gpt-4o-mini", "themis")]
+    assert (themis["calls"], themis["cache_hits"], themis["wall_time"]["count"]) == (
+        2,
+        1,
+        1,
+    )
+    # 非流式调用不记录首 token 时间
+    assert themis["ttft"]["count"] == 0
+    assert rows[("gpt-4o", "apollo")]["parse_failures"] == 1
+    assert rows[("mock", "apollo")]["fallbacks"] == 1
+
+    by_agent = {r["agent_type"]: r for r in client.get_telemetry(["agent_type"])}
+    assert set(by_agent) == {"themis", "apollo"} and by_agent["apollo"]["calls"] == 1
+
+    # 流式调用记录 ttft
+    fake.content = SUBTASKS_JSON
+    client.decompose_task("流式分解", on_subtask=lambda st: None)
+    by_agent = {r["agent_type"]: r for r in client.get_telemetry(["agent_type"])}
+    assert by_agent["decompose"]["ttft"]["count"] == 1
+
+    # token 与费用直方图
+    telemetry = LLMTelemetry(prices={"m": (1.0, 2.0)})
+    record = telemetry.start("athena")
+    record.provider, record.model = "openai", "m"
+    record.usage = {"input_tokens": 1000, "output_tokens": 500}
+    telemetry.finish(record)
+    row = telemetry.snapshot([])[0]
+    assert row["input_tokens"]["sum"] == 1000 and row["cost_usd"]["sum"] == 0.002
+    assert row["input_tokens"]["buckets"]["1024"] == 1
+
+    path = telemetry.export(tmp_path / "telemetry.json")
+    assert (
+        json.loads(path.read_text(encoding="utf-8"))["series"][0]["agent_type"]
+        == "athena"
+    )
+
+
+def test_system_prompt_prefix_is_stable_and_cached(tmp_path, monkeypatch):
+    profile = {
+        "role": "内容专家",
+        "skills": ["writing"],
+        "description": "文案",
+        "stats": {"total": 0},
+    }
+    server = start_server(
+        config=StandinConfig(latency=0.01, latency_sigma=0, ttft=0.01)
+    )
+    try:
+        host, port = server.server_address
+        monkeypatch.setenv("PROTEUS_LOCAL_BASE_URL", f"http://{host}:{port}/v1")
+        client = LLMClient(
+            provider="local", cache=False, profile_source=lambda agent_id: dict(profile)
+        )
+
+        client.execute_agent_task("apollo", "撰写周一文案")
+        profile["stats"] = {"total": 1}  # 统计变化不影响前缀
+        client.execute_agent_task("apollo", "撰写周二文案")
+        client.execute_agent_task("themis", "审核")
+
+        apollo = client._system_prompt("execute", "apollo")
+        assert apollo.startswith(LLMClient.SYSTEM_PROMPTS["execute"])
+        assert apollo.endswith("擅长：文案") and "total" not in apollo
+
+        stats = client.get_prompt_cache_stats()
+        assert stats["prefixes"]["built"] == 2
+        assert (stats["calls"], stats["hits"]) == (3, 1) and stats["cached_tokens"] > 0
+        assert server.state.stats["prompt_cache_hits"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Anthropic 系统提示词标记 cache_control，并合并缓存读写的用量
+    fake = FakeAnthropic(content=RESULT_JSON)
+    fake.usage = SimpleNamespace(
+        input_tokens=10,
+        output_tokens=5,
+        cache_read_input_tokens=90,
+        cache_creation_input_tokens=0,
+    )
+    provider = AnthropicProvider(client=fake)
+    _, usage = provider.complete("前缀", "任务")
+    assert fake.calls[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert usage == {"input_tokens": 100, "output_tokens": 5, "cached_tokens": 90}
+
+
+def test_deadline_and_cancel_abort_inflight_calls(tmp_path, monkeypatch):
+    from hub import ProteusHub
+
+    # SDK 请求：剩余时间作为 timeout；不限时则不传（保留 SDK 默认超时）
+    fake = FakeOpenAI(content=RESULT_JSON)
+    provider = OpenAIProvider(client=fake)
+    provider.complete("系统", "任务", deadline=Deadline(None))
+    provider.complete("系统", "任务", deadline=Deadline(5))
+    assert "timeout" not in fake.calls[0] and 0 < fake.calls[1]["timeout"] <= 5
+
+    # SDK 普通请求：取消时关闭响应，调用立即返回
+    class HangingResponse:
+        def __init__(self):
+            self.closed = threading.Event()
+
+        def __iter__(self):
+            self.closed.wait(5)
+            return iter([])
+
+        def close(self):
+            self.closed.set()
+
+    hanging = HangingResponse()
+    provider = OpenAIProvider(
+        client=SimpleNamespace(
+            chat=SimpleNamespace(
+                completions=SimpleNamespace(create=lambda **kwargs: hanging)
+            )
+        )
+    )
+    deadline = Deadline(None)
+    threading.Timer(0.2, deadline.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(Cancelled):
+        provider.complete("系统", "任务", deadline=deadline)
+    assert time.monotonic() - started < 1.0 and hanging.closed.is_set()
+
+    # 子截止时间用完后从父级注销取消回调
+    parent = Deadline(None)
+    for _ in range(3):
+        parent.child(1).release()
+    assert parent._callbacks == []
+
+    server = start_server(config=StandinConfig(latency=3.0, latency_sigma=0))
+    try:
+        host, port = server.server_address
+        monkeypatch.setenv("PROTEUS_LLM_PROVIDER", "local")
+        monkeypatch.setenv("PROTEUS_LOCAL_BASE_URL", f"http://{host}:{port}/v1")
+        monkeypatch.setenv("PROTEUS_LLM_CACHE", "off")
+        monkeypatch.setenv("PROTEUS_LLM_MAX_RETRIES", "0")
+
+        # 单次调用：剩余时间作为请求超时
+        client = LLMClient(provider="local", cache=False)
+        started = time.monotonic()
+        try:
+            client.execute_agent_task("apollo", "撰写", deadline=Deadline(0.3))
+            raise AssertionError("应当超时")
+        except DeadlineExceeded:
+            pass
+        assert time.monotonic() - started < 1.5
+
+        hub = ProteusHub(base_path=tmp_path)
+
+        def prepared_task() -> str:
+            task_id = hub.receive_task("压测任务")
+            hub.active_tasks[task_id].update(
+                status="parsed",
+                subtasks=[
+                    {
+                        "subtask_id": f"st{i}",
+                        "desc": f"撰写 {i}",
+                        "agent_type": "apollo",
+                        "required_skills": ["writing"],
+                        "estimated_time": 30,
+                        "status": "pending",
+                    }
+                    for i in range(3)
+                ],
+            )
+            hub.form_claw(task_id)
+            return task_id
+
+        # 执行阶段截止
+        task_id = prepared_task()
+        result = hub.execute_task(task_id, parallel=True, timeout=0.3)
+        assert [st["status"] for st in hub.active_tasks[task_id]["subtasks"]] == [
+            "timeout"
+        ] * 3
+
+        # 另一线程取消：并行调用立即中止
+        task_id = prepared_task()
+        canceller = threading.Timer(0.3, hub.cancel_task, args=(task_id, "测试取消"))
+        canceller.start()
+        started = time.monotonic()
+        result = hub.execute_task(task_id, parallel=True)
+        assert time.monotonic() - started < 1.5
+        assert result["status"] == "cancelled"
+        assert {st["status"] for st in hub.active_tasks[task_id]["subtasks"]} == {
+            "cancelled"
+        }
+        # 取消后不再保留截止时间，工作记忆随即结束；之后的执行直接视为已取消
+        canceller.join()
+        assert (
+            task_id not in hub.deadlines and hub.memory.working.current_task_id is None
+        )
+        assert hub.execute_task(task_id, parallel=True)["status"] == "cancelled"
+        # 工作线程随即退出，释放并发名额
+        for _ in range(50):
+            if not hub.llm.dispatcher.get_stats()["in_flight"].get("local"):
+                break
+            time.sleep(0.02)
+        assert hub.llm.dispatcher.get_stats()["in_flight"].get("local", 0) == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_cancelled_task_stops_writing_working_memory(tmp_path):
+    from hub import ProteusHub
+
+    hub = ProteusHub(base_path=tmp_path)
+    task_id = hub.receive_task("为一个小型创业团队生成一周的社交媒体内容计划")
+    hub.parse_task(task_id)
+    hub.form_claw(task_id)
+    execute = hub.llm.execute_agent_task
+    started = []
+
+    def cancelled_midway(agent_type, task_desc, **kwargs):
+        # 无法中止的调用：取消并开始下一个任务之后才返回
+        if not started:
+            hub.cancel_task(task_id, "测试取消")
+            started.append(hub.receive_task("下一个任务"))
+        return execute(agent_type, task_desc, **kwargs)
+
+    hub.llm.execute_agent_task = cancelled_midway
+    assert hub.execute_task(task_id)["status"] == "cancelled"
+    assert {st["status"] for st in hub.active_tasks[task_id]["subtasks"][1:]} == {
+        "cancelled"
+    }
+    assert hub.memory.working.current_task_id == started[0]
+
+    # 下一个任务的工作记忆与场景记录没有被写入
+    assert hub.memory.working.get_context("subtasks") is None
+    assert hub.memory.working.get_context("status") == "active"
+    episode = tmp_path / "memory" / "episodic" / started[0]
+    assert (episode / "results.jsonl").read_text(encoding="utf-8") == ""
+    assert '"op": "subtask"' not in (episode / "context.jsonl").read_text(
+        encoding="utf-8"
+    )
+    assert task_id not in hub.deadlines
+
+
+def test_speculative_decompose_races_pattern_match(tmp_path, monkeypatch):
+    from hub import ProteusHub
+
+    server = start_server(config=StandinConfig(latency=1.0, latency_sigma=0))
+    try:
+        host, port = server.server_address
+        monkeypatch.setenv("PROTEUS_LLM_PROVIDER", "local")
+        monkeypatch.setenv("PROTEUS_LOCAL_BASE_URL", f"http://{host}:{port}/v1")
+        monkeypatch.setenv("PROTEUS_LLM_CACHE", "off")
+
+        hub = ProteusHub(base_path=tmp_path)
+        hub.PATTERN_THRESHOLD = 0.5
+        hub.memory.semantic.save_pattern(
+            "weekly_plan",
+            {
+                "pattern_id": "weekly_plan",
+                "name": "社交媒体内容计划",
+                "description": "生成一周的社交媒体内容计划",
+                "subtasks": [
+                    {
+                        "subtask_id": "p1",
+                        "desc": "按模式执行",
+                        "required_skills": ["writing"],
+                    }
+                ],
+            },
+        )
+
+        # 高匹配度：采用模式，推测中的 LLM 调用被取消
+        seen = []
+        task_id = hub.receive_task("生成一周的社交媒体内容计划")
+        started = time.monotonic()
+        result = hub.parse_task(task_id, on_subtask=seen.append, speculative=True)
+        assert time.monotonic() - started < 0.8
+        assert [st["subtask_id"] for st in result["subtasks"]] == ["p1"]
+        assert [st["subtask_id"] for st in seen] == ["p1"]
+        for _ in range(50):
+            if not hub.llm.dispatcher.get_stats()["in_flight"].get("local"):
+                break
+            time.sleep(0.02)
+        assert hub.llm.dispatcher.get_stats()["in_flight"].get("local", 0) == 0
+
+        # 低匹配度：采用已在进行中的 LLM 分解，流式子任务照常回调
+        seen = []
+        task_id = hub.receive_task("重构支付服务的数据库访问层")
+        result = hub.parse_task(task_id, on_subtask=seen.append, speculative=True)
+        assert result["subtasks"] and "p1" not in [
+            st["subtask_id"] for st in result["subtasks"]
+        ]
+        assert [st["subtask_id"] for st in seen] == [
+            st["subtask_id"] for st in result["subtasks"]
+        ]
+        assert set(hub.active_tasks[task_id]["skill_matches"]) == {
+            st["subtask_id"] for st in result["subtasks"]
+        }
+
+        assert hub.get_parse_stats() == {
+            "pattern": 1,
+            "llm": 1,
+            "speculative": 2,
+            "speculation_cancelled": 1,
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_cassette_records_and_replays_with_scaled_latency(tmp_path, monkeypatch):
+    path = tmp_path / "cassette.jsonl"
+    recorder = make_client(
+        tmp_path, fake=FakeOpenAI(content=RESULT_JSON, delay=0.3), cache=False
+    )
+    recorder.cassette = Cassette(path)
+    recorder.execute_agent_task(
+        "apollo",
+        "撰写文案",
+        context={"task_id": "7f0c8a52-9d1e-4c7b-8a43-2b6f0e1d9c35"},
+    )
+    recorder.execute_agent_task(
+        "apollo", "审核子任务 1f3a9c0e 的产出", context={"claw_id": "claw_7f0c8a52"}
+    )
+    assert recorder.get_cassette_stats()["record"]["recorded"] == 2
+
+    monkeypatch.setenv("PROTEUS_REPLAY_CASSETTE", str(path))
+    monkeypatch.setenv("PROTEUS_REPLAY_LATENCY_SCALE", "0.5")
+    replayer = LLMClient(provider="replay")
+    assert replayer.cache is None
+
+    # 任务 ID 不同的同一请求仍命中，耗时按倍数缩放
+    started = time.monotonic()
+    result = replayer.execute_agent_task(
+        "apollo",
+        "撰写文案",
+        context={"task_id": "0b9e4a1c-5d2f-4e8a-9c7b-3a1d6f2e8b40"},
+    )
+    elapsed = time.monotonic() - started
+    assert result["output"] == "完成"
+    assert 0.12 <= elapsed < 0.3
+
+    # 子任务 / Claw 的 8 位 ID 不同也能命中
+    result = replayer.execute_agent_task(
+        "apollo", "审核子任务 a4b5c6d7 的产出", context={"claw_id": "claw_0b9e4a1c"}
+    )
+    assert result["output"] == "完成"
+
+    # 未录制的请求：抛出 CassetteMiss，不重试、不打开熔断器、不退回模拟结果
+    for _ in range(7):
+        with pytest.raises(CassetteMiss):
+            replayer.execute_agent_task("apollo", "从未录制的任务")
+    assert replayer.get_provider_stats()["replay"]["state"] == "closed"
+    assert replayer.get_provider_stats()["replay"]["failures"] == 0
+    assert replayer.get_cassette_stats()["replay"]["misses"] == 7
+    assert replayer.execute_agent_task("apollo", "撰写文案")["output"] == "完成"
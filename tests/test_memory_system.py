@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+🧪 Proteus System - 记忆系统测试
+
+测试场景：
+1. 场景记忆区段化存储与惰性读取
+2. 工作记忆消息上限与溢出
+3. 工作记忆实时流式写入场景记忆
+4. 上下文快照不可变且结构共享
+5. 分层内存统计与阶段 tracemalloc 报告
+6. 关键词分类规则表与语义记忆加载
+7. 执行中的上下文快照包含已完成子任务的结果
+"""
+
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+# 添加核心模块路径
+sys.path.insert(0, str(Path(__file__).parent.parent / "core"))
+
+from keyword_classifier import KeywordClassifier, load_classifier, save_classifier
+from memory import EpisodicMemory, LazyEpisode, MemorySystem, SemanticMemory
+from hub import ProteusHub
+
+
+def _episode_data(task_id: str) -> dict:
+    return {
+        "task_id": task_id,
+        "context": {
+            "task_desc": "测试任务",
+            "success": True,
+            "subtasks": [
+                {
+                    "subtask_id": "st_1",
+                    "desc": "调研",
+                    "result": {"output": "调研完成"},
+                },
+                {"subtask_id": "st_2", "desc": "撰写"},
+            ],
+        },
+        "messages": [
+            {"sender": "hub", "receiver": "claw", "content": f"消息 {i}"}
+            for i in range(20)
+        ],
+        "completed_at": "2026-01-01T00:00:00",
+    }
+
+
+def test_episode_header_read_does_not_parse_sections(tmp_path):
+    episodic = EpisodicMemory(tmp_path / "episodic")
+    episodic.save("task_a", _episode_data("task_a"))
+
+    episode = episodic.load("task_a")
+    assert isinstance(episode, LazyEpisode)
+    assert episode["context"]["task_desc"] == "测试任务"
+    assert episode.get("context", {}).get("success") is True
+    assert "result" not in episode["context"]["subtasks"][0]
+    assert episode._sections == {}
+
+    assert len(episode["messages"]) == 20
+    assert episode["results"] == {"st_1": {"output": "调研完成"}}
+
+
+def test_episode_roundtrip_and_legacy_records(tmp_path):
+    episodic = EpisodicMemory(tmp_path / "episodic")
+    data = _episode_data("task_a")
+    episodic.save("task_a", data)
+
+    with open(tmp_path / "episodic" / "task_b.json", "w", encoding="utf-8") as f:
+        json.dump(_episode_data("task_b"), f, ensure_ascii=False)
+
+    assert sorted(episodic.list_tasks()) == ["task_a", "task_b"]
+    assert episodic.load("task_a").to_dict() == data
+    assert episodic.load("task_b")["messages"][0]["content"] == "消息 0"
+    assert episodic.load("missing") is None
+
+
+def test_working_memory_spills_old_messages(tmp_path):
+    memory = MemorySystem(tmp_path / "memory", max_messages=3, stream_episodes=False)
+    memory.start_task("task_c", "长对话任务")
+    for i in range(10):
+        memory.working.add_message("agent", "hub", f"消息 {i}")
+
+    assert len(memory.working.messages) == 3
+    assert memory.working.message_count == 10
+    spill_path = tmp_path / "memory" / "working" / "task_c.messages.jsonl"
+    assert spill_path.exists()
+
+    memory.complete_task(success=True)
+
+    contents = [m["content"] for m in memory.episodic.load("task_c")["messages"]]
+    assert contents == [f"消息 {i}" for i in range(10)]
+    assert not spill_path.exists()
+
+
+def test_working_memory_streams_to_episodic(tmp_path):
+    memory = MemorySystem(tmp_path / "memory", max_messages=3)
+    memory.start_task("task_d", "流式任务")
+    memory.working.update_context("subtasks", [{"subtask_id": "st_1", "desc": "调研"}])
+    for i in range(5):
+        memory.working.add_message("agent", "hub", f"消息 {i}")
+    memory.working.record_result("st_1", {"output": "调研完成"})
+
+    # 任务未完成时轨迹已落盘
+    episode = memory.episodic.load("task_d")
+    assert episode["context"]["task_desc"] == "流式任务"
+    assert "completed_at" not in episode
+    assert len(episode["messages"]) == 5
+    assert not (tmp_path / "memory" / "working" / "task_d.messages.jsonl").exists()
+    assert memory.episodic.list_tasks() == []
+    assert memory.episodic.list_tasks(include_unfinished=True) == ["task_d"]
+
+    memory.complete_task(success=True, feedback="很好")
+    assert memory.episodic.list_tasks() == ["task_d"]
+
+    episode = memory.episodic.load("task_d")
+    assert episode["context"]["success"] is True
+    assert "completed_at" in episode
+    assert episode["results"] == {"st_1": {"output": "调研完成"}}
+    assert episode.to_dict()["context"]["subtasks"][0]["result"] == {
+        "output": "调研完成"
+    }
+
+    # 未完成就开始下一个任务：上一个任务的记录文件随即关闭
+    memory.start_task("task_f", "未完成")
+    unfinished = memory.working._stream
+    memory.start_task("task_g", "下一个任务")
+    assert unfinished.closed and not memory.working._stream.closed
+    memory.complete_task(success=True)
+    assert sorted(memory.episodic.list_tasks()) == ["task_d", "task_g"]
+
+
+def test_context_snapshots_are_immutable_and_shared(tmp_path):
+    memory = MemorySystem(tmp_path / "memory", stream_episodes=False)
+    memory.start_task("task_e", "快照任务")
+    claw = {"claw_id": "claw_1", "members": [{"agent_id": "athena"}]}
+    memory.working.update_context("claw", claw)
+
+    before = memory.working.snapshot()
+    memory.working.update_context("status", "executing")
+    after = memory.working.snapshot()
+
+    claw["members"].append({"agent_id": "apollo"})
+    assert len(after["claw"]["members"]) == 1
+    assert before["status"] == "active"
+    assert after["status"] == "executing"
+    assert before["claw"] is after["claw"]
+    assert json.loads(json.dumps(after))["claw"]["members"] == [{"agent_id": "athena"}]
+
+    with pytest.raises(TypeError):
+        after["status"] = "mutated"
+
+
+def test_hub_memory_stats_and_stage_tracing(tmp_path):
+    hub = ProteusHub(base_path=tmp_path, trace_memory=True)
+    try:
+        task_id = hub.receive_task("为一个小型创业团队生成一周的社交媒体内容计划")
+        hub.parse_task(task_id)
+        hub.form_claw(task_id)
+        hub.execute_task(task_id)
+
+        stats = hub.get_memory_stats()
+        layers = stats["layers"]
+        assert layers["hub_active_tasks"]["items"] == 1
+        assert layers["working_messages"]["items"] > 0
+        assert layers["working_context"]["bytes"] > 0
+        assert stats["total_bytes"] == sum(layer["bytes"] for layer in layers.values())
+        assert set(stats["tracemalloc"]["stages"]) == {"parse", "form", "execute"}
+    finally:
+        tracemalloc.stop()
+
+
+def test_later_subtasks_see_earlier_results_in_context(tmp_path):
+    hub = ProteusHub(base_path=tmp_path)
+    contexts = []
+    execute = hub.llm.execute_agent_task
+
+    def recording_execute(agent_type, task_desc, context=None, **kwargs):
+        contexts.append(context)
+        return execute(agent_type, task_desc, context=context, **kwargs)
+
+    hub.llm.execute_agent_task = recording_execute
+    task_id = hub.receive_task("为一个小型创业团队生成一周的社交媒体内容计划")
+    hub.parse_task(task_id)
+    hub.form_claw(task_id)
+    hub.execute_task(task_id)
+
+    # 最后一个子任务执行时，前面的子任务已完成并带有结果
+    last = contexts[-1]["subtasks"]
+    assert [st["status"] for st in last] == ["completed"] * (len(last) - 1) + [
+        "pending"
+    ]
+    assert all(st["result"]["output"] for st in last[:-1])
+    assert {st["status"] for st in hub.memory.working.get_context("subtasks")} == {
+        "completed"
+    }
+
+    # 场景记忆只追加子任务状态增量，结果只在 results 区段
+    records = [
+        json.loads(line)
+        for line in open(
+            tmp_path / "memory" / "episodic" / task_id / "context.jsonl",
+            encoding="utf-8",
+        )
+    ]
+    assert sum(1 for r in records if r.get("key") == "subtasks") == 1
+    deltas = [r for r in records if r.get("op") == "subtask"]
+    assert [d["changes"] for d in deltas] == [{"status": "completed"}] * len(last)
+    episode = LazyEpisode(tmp_path / "memory" / "episodic" / task_id)
+    assert [st["status"] for st in episode["context"]["subtasks"]] == [
+        "completed"
+    ] * len(last)
+    assert not any("result" in st for st in episode["context"]["subtasks"])
+    assert all(
+        st["result"]["output"] for st in episode.to_dict()["context"]["subtasks"]
+    )
+
+
+def test_keyword_classifier_priority_score_and_semantic_rules(tmp_path):
+    # 与原 if/elif 链一致：多个规则命中时取靠前的规则
+    task_type = load_classifier("task_type")
+    assert task_type.classify("编写代码并发布社交媒体内容计划") == "social_media"
+    assert task_type.classify("网站开发") == "web_development"
+    assert task_type.classify("整理房间") == "generic"
+    assert (
+        load_classifier("failure_type").classify("Agent UNAVAILABLE after TIMEOUT")
+        == "agent_unavailable"
+    )
+
+    # 重叠关键词一次扫描全部命中
+    overlap = KeywordClassifier([{"label": "a", "keywords": ["he", "she", "hers"]}])
+    assert sorted(overlap.match("ushers")["a"]) == ["he", "hers", "she"]
+
+    scored = KeywordClassifier(
+        [
+            {"label": "research", "keywords": ["报告"]},
+            {
+                "label": "coding",
+                "keywords": ["代码", {"keyword": "单元测试", "weight": 2}],
+            },
+        ],
+        mode="score",
+    )
+    assert scored.classify("代码与单元测试报告") == "coding"
+    assert scored.scores("代码与单元测试报告") == {"coding": 3.0, "research": 1.0}
+
+    semantic = SemanticMemory(tmp_path / "semantic")
+    save_classifier(
+        semantic,
+        "failure_type",
+        {
+            "default": "unknown",
+            "rules": [{"label": "quota", "keywords": ["rate limit"]}],
+        },
+    )
+    assert (
+        load_classifier("failure_type", semantic).classify("Rate limit exceeded")
+        == "quota"
+    )
+    assert load_classifier("task_type", semantic).classify("研究报告") == "research"